@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: encoding and decoding ActivityStreams documents with each
+available JSON codec (see settings.RBQ_JSON_CODEC).
+
+    python3 benchmarks/bench_json.py [number_of_rounds]
+"""
+import os
+import sys
+import time
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+
+
+def note(i: int) -> dict:
+    return {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "id": "https://rbq.localdomain/objects/%d" % i,
+        "type": "Note",
+        "attributedTo": "https://rbq.localdomain/users/chuukaku_may",
+        "inReplyTo": "https://misskey.localdomain/notes/%d" % (i - 1),
+        "context": "https://rbq.localdomain/contexts/42",
+        "published": "2019-10-10T12:00:00Z",
+        "content": "<p>Alerta, alerta antifascista! 🏴 <a href=\"https://misskey.localdomain/@ai\">@ai</a></p>",
+        "contentMap": {"zh": "<p>全世界无产者，联合起来！</p>"},
+        "to": [PUBLIC],
+        "cc": ["https://rbq.localdomain/users/chuukaku_may/followers"],
+        "tag": [{"type": "Mention", "href": "https://misskey.localdomain/users/ai", "name": "@ai"}],
+        "attachment": [],
+        "sensitive": False,
+    }
+
+
+def actor() -> dict:
+    from rbq_backend.components import crypto_component
+    return {
+        "@context": ["https://www.w3.org/ns/activitystreams", "https://w3id.org/security/v1"],
+        "id": "https://rbq.localdomain/users/chuukaku_may",
+        "type": "Person",
+        "preferredUsername": "chuukaku_may",
+        "name": "May",
+        "summary": "<p>" + "x" * 300 + "</p>",
+        "url": "https://rbq.localdomain/@chuukaku_may",
+        "inbox": "https://rbq.localdomain/users/chuukaku_may/inbox",
+        "outbox": "https://rbq.localdomain/users/chuukaku_may/outbox",
+        "followers": "https://rbq.localdomain/users/chuukaku_may/followers",
+        "following": "https://rbq.localdomain/users/chuukaku_may/following",
+        "manuallyApprovesFollowers": False,
+        "endpoints": {"sharedInbox": "https://rbq.localdomain/inbox"},
+        "publicKey": {
+            "id": "https://rbq.localdomain/users/chuukaku_may#main-key",
+            "owner": "https://rbq.localdomain/users/chuukaku_may",
+            "publicKeyPem": crypto_component.PrivateKey.generate().public_key().to_pem(),
+        },
+    }
+
+
+def collection() -> dict:
+    return {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "id": "https://rbq.localdomain/users/chuukaku_may/outbox?page=true",
+        "type": "OrderedCollectionPage",
+        "partOf": "https://rbq.localdomain/users/chuukaku_may/outbox",
+        "orderedItems": [{
+            "id": "https://rbq.localdomain/activities/%d" % i,
+            "type": "Create",
+            "actor": "https://rbq.localdomain/users/chuukaku_may",
+            "object": note(i),
+            "to": [PUBLIC],
+        } for i in range(20)],
+    }
+
+
+def main(count: int = 10000):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.test_settings')
+    django.setup()
+
+    from rbq_backend.components import json_component
+
+    documents = (("Note", note(1)), ("Actor", actor()), ("Collection", collection()))
+    for name, document in documents:
+        for codec, (dumps, loads) in json_component.CODECS.items():
+            data = dumps(document)
+            started = time.perf_counter()
+            for _ in range(count):
+                dumps(document)
+            encoded = time.perf_counter() - started
+            started = time.perf_counter()
+            for _ in range(count):
+                loads(data)
+            decoded = time.perf_counter() - started
+            print("%-10s %-6s %6d bytes: dumps %.1f us, loads %.1f us" % (
+                name, codec, len(data), encoded / count * 1e6, decoded / count * 1e6))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: signing outgoing requests with and without the cache of
+loaded private keys.
+
+    python3 benchmarks/bench_signing.py [number_of_requests]
+"""
+import os
+import sys
+import time
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main(count: int = 10000):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.test_settings')
+    django.setup()
+
+    import requests
+    from rbq_ap.components import fetcher_component
+    from rbq_backend.components import crypto_component
+    from rbq_backend.models import Account
+
+    account = Account(username="chuukaku_may@rbq.localdomain")
+    Account.objects.initialize(account)
+    key_id = "%s#main-key" % account.ap_id
+    body = b'{"type": "Create"}'
+
+    def sign(auth):
+        request = requests.Request(
+            "POST", "https://misskey.localdomain/inbox", data=body).prepare()
+        auth(request)
+
+    def uncached():
+        sign(fetcher_component.HTTPSignatureHeaderAuth(
+            crypto_component.PrivateKey.from_pem(account.private_key), key_id))
+
+    def cached():
+        sign(fetcher_component.auth_from_account(account))
+
+    for name, func in (("without cache", uncached), ("with cache", cached)):
+        started = time.perf_counter()
+        for _ in range(count):
+            func()
+        elapsed = time.perf_counter() - started
+        print("%-14s %d requests: %.3fs (%.1f us/request)" % (
+            name, count, elapsed, elapsed / count * 1e6))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
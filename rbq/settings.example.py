@@ -99,6 +99,79 @@ DATABASES = {
 
 RBQ_LOCAL_DOMAINS = ["your_domain"]
 
+# Only verify and store incoming Activities in inboxes, respond 202 and
+# process them in django-q tasks.
+RBQ_ASYNC_INBOX = False
+# Processed Activities are kept this many seconds, so that the same
+# Activity POSTed again isn't processed twice.
+RBQ_INBOX_RETENTION = 86400
+# Seconds before an Activity claimed by a task which didn't finish is processed again.
+RBQ_INBOX_LEASE = 300
+
+# Outgoing HTTP requests: keep-alive connections per host,
+# number of hosts to keep pools for, and (connect, read) timeouts in seconds.
+RBQ_HTTP_POOL_MAXSIZE = 10
+RBQ_HTTP_POOL_CONNECTIONS = 100
+RBQ_HTTP_TIMEOUT = (5, 30)
+# Concurrent POSTs inside one delivery task (one task per remote host).
+RBQ_DELIVERY_CONCURRENCY = 4
+# Failed deliveries are retried with exponential backoff (in seconds),
+# from RBQ_DELIVERY_RETRY_BASE up to RBQ_DELIVERY_RETRY_MAX.
+RBQ_DELIVERY_RETRY_BASE = 60
+RBQ_DELIVERY_RETRY_MAX = 6 * 3600
+RBQ_DELIVERY_MAX_ATTEMPTS = 10
+# Seconds a delivery task may take before its inboxes are tried again.
+RBQ_DELIVERY_LEASE = 300
+# Delivered and failed deliveries are deleted after this many seconds.
+RBQ_DELIVERY_RETENTION = 7 * 86400
+# Stop delivering to a host after this many failed delivery tasks in a row,
+# and probe it again after the cooldown (in seconds, doubled on every failure).
+RBQ_CIRCUIT_BREAKER_THRESHOLD = 5
+RBQ_CIRCUIT_BREAKER_COOLDOWN = 600
+
+# Parsed public keys of remote Actors kept in each process, for verifying
+# HTTP Signatures: maximum number of keys, and seconds before refetching.
+RBQ_PUBLIC_KEY_CACHE_SIZE = 4096
+RBQ_PUBLIC_KEY_CACHE_TTL = 3600
+# A signature failing with a cached key fetches the Actor again, at most
+# once per RBQ_PUBLIC_KEY_REFRESH_INTERVAL seconds for each keyId, and not
+# for RBQ_PUBLIC_KEY_REFRESH_FAILURE_TTL seconds after a failed fetch.
+RBQ_PUBLIC_KEY_REFRESH_INTERVAL = 600
+RBQ_PUBLIC_KEY_REFRESH_FAILURE_TTL = 3600
+# Loaded private keys of local Accounts kept in each process, for signing.
+RBQ_PRIVATE_KEY_CACHE_SIZE = 1024
+
+# Remote fetches running at the same time in each process, e.g. for
+# ancestors of replies.
+RBQ_FETCH_CONCURRENCY = 8
+# Seconds spent on fetching ancestors of a reply while handling an inbox
+# request; the rest of the thread is resolved by a task, with its own budget.
+RBQ_THREAD_RESOLVE_BUDGET = 2.0
+RBQ_THREAD_RESOLVE_BACKGROUND_BUDGET = 30.0
+# Seconds before fetching again a URL that failed, by HTTP status code
+# ("unreachable" applies to the whole host). Stored in the default cache.
+RBQ_FETCH_FAILURE_TTLS = {
+    404: 3600,
+    410: 7 * 86400,
+    "default": 300,
+    "unreachable": 600,
+}
+# Remote Actors are fetched again (with conditional requests) once they are
+# older than this many seconds, by the refresh_stale_actors periodic task;
+# at most RBQ_ACTOR_REFRESH_CONCURRENCY requests at a time to the same host.
+RBQ_ACTOR_REFRESH_INTERVAL = 86400
+RBQ_ACTOR_REFRESH_CONCURRENCY = 2
+# Rendered objects and Actors are kept in this cache (an alias of CACHES),
+# for this many seconds; a shared cache like memcached suits several workers.
+RBQ_RENDER_CACHE = "default"
+RBQ_RENDER_CACHE_TTL = 86400
+# JSON backend of ActivityStreams requests and responses: "orjson", "json"
+# (the standard library) or "auto" to use orjson when it is installed.
+RBQ_JSON_CODEC = "auto"
+# Activities kept in the home timeline of each local Account; longer ones
+# are trimmed by the trim_feeds periodic task.
+RBQ_HOME_FEED_LENGTH = 800
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -18,14 +18,18 @@ from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
 from rbq_cs.controllers.mastodon_api.account_viewset import AccountViewSet
-#from rbq_cs.controllers.mastodon_api.status_viewset import StatusViewSet
+from rbq_cs.controllers.mastodon_api.conversation_viewset import ConversationViewSet
+from rbq_cs.controllers.mastodon_api.timeline_viewset import TimelineViewSet
+from rbq_cs.controllers.mastodon_api.status_viewset import StatusViewSet
 
 from rbq_ap.views import webfinger as webfinger_view
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter(trailing_slash=False)
 router.register(r'accounts', AccountViewSet, basename='account')
-#router.register(r'statuses', StatusViewSet)
+router.register(r'timelines', TimelineViewSet, basename='timeline')
+router.register(r'conversations', ConversationViewSet, basename='conversation')
+router.register(r'statuses', StatusViewSet, basename='status')
 
 urlpatterns = [
     path(".well-known/webfinger", webfinger_view),
@@ -1,8 +1,12 @@
 # rbq_ap/auth.py
 
-from drf_httpsig.authentication import SignatureAuthentication
+import base64
+
+from drf_httpsig.authentication import SignatureAuthentication, FAILED
+from httpsig.utils import generate_message, parse_authorization_header
+from rest_framework import authentication
 from rbq_backend.models import Account
-from rbq_ap.components import account_component
+from rbq_ap.components import account_component, fetcher_component
 
 class APSignatureAuthentication(SignatureAuthentication):
     # The HTTP header used to pass the consumer key ID.
@@ -14,14 +18,14 @@ class APSignatureAuthentication(SignatureAuthentication):
 
     required_headers = ["host"]
 
-    def fetch_user_data(self, key_id, algorithm="rsa-sha256"):
-        # ...
-        # example implementation:
+    def fetch_user_data(self, key_id, algorithm="rsa-sha256", refresh=False):
+        """
+        Returns (Account, parsed PublicKey), or (None, None) if not found.
+        Parsed keys are cached, see account_component.get_public_key.
+        """
         try:
-            ap_id, _key_id = key_id.split("#")
-            user = account_component.get_or_fetch_user(ap_id)
-            return (user, user.public_key)
-        except Account.DoesNotExist:
+            return account_component.get_public_key(key_id, refresh=refresh)
+        except (Account.DoesNotExist, ValueError):
             return (None, None)
 
     def authenticate(self, request):
@@ -32,4 +36,47 @@ class APSignatureAuthentication(SignatureAuthentication):
             request.META["HTTP_CONTENT_LENGTH"] = request.META["CONTENT_LENGTH"]
         if "CONTENT_TYPE" in request.META.keys():
             request.META["HTTP_CONTENT_TYPE"] = request.META["CONTENT_TYPE"]
-        return super().authenticate(request)
+
+        auth_header = authentication.get_authorization_header(request)
+        if not auth_header:
+            return None
+        method, fields = parse_authorization_header(auth_header)
+        if method.lower() != 'signature':
+            return None
+        if set(("keyid", "algorithm", "signature")) - set(fields.keys()):
+            raise FAILED
+
+        user, public_key = self.fetch_user_data(fields["keyid"], algorithm=fields["algorithm"])
+        if not (user and public_key):
+            raise FAILED
+        if not self.verify(request, fields, public_key):
+            # The remote Actor may have rotated its key: fetch it once again.
+            user, public_key = self.fetch_user_data(
+                fields["keyid"], algorithm=fields["algorithm"], refresh=True)
+            if not (user and public_key and self.verify(request, fields, public_key)):
+                raise FAILED
+        # The Actor's host just sent a verified request: it's reachable.
+        fetcher_component.forget_unreachable(fields["keyid"])
+        return (user, fields["keyid"])
+
+    def verify(self, request, fields, public_key) -> bool:
+        "Check the signature of the request headers against a parsed public key."
+        headers = {}
+        for key, value in request.META.items():
+            if key.startswith("HTTP_"):
+                key = key[5:]
+            elif key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                continue
+            headers[key.lower().replace('_', '-')] = value
+        signed_headers = fields.get("headers", "date").split(" ")
+        if set(self.required_headers) - set(signed_headers):
+            return False
+        try:
+            message = generate_message(
+                signed_headers, headers, None,
+                request.method.lower(), request.get_full_path())
+            signature = base64.b64decode(fields["signature"])
+        except Exception:
+            # Missing headers or a malformed signature.
+            return False
+        return public_key.verify(signature, message, fields["algorithm"])
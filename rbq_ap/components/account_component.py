@@ -1,13 +1,30 @@
-from rbq_backend.models import Account
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from rbq_backend.models import Account, Follow
 from urllib.parse import urlparse
-from django.core.paginator import Paginator, EmptyPage
+import requests
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django_q.tasks import async_task
 
 from rbq_ap.serializers.actor import ActorSerializer
 
-from rbq_ap.components import fetcher_component, asactivity_component
+from rbq_ap.components import fetcher_component, asactivity_component, cursor_component, feed_component
+from rbq_backend.components import counter_component, crypto_component
+from rbq_backend.components.cache_component import LRUCache
+from rbq_backend.components.singleflight_component import single_flight
 
-from typing import Optional, List
+from typing import Optional, List, Tuple
+
+
+# keyId => (KEY_ACCOUNT_FIELDS of the Account, parsed PublicKey)
+_public_keys = LRUCache(
+    maxsize=getattr(settings, "RBQ_PUBLIC_KEY_CACHE_SIZE", 4096),
+    ttl=getattr(settings, "RBQ_PUBLIC_KEY_CACHE_TTL", 3600))
 
 
 def fetch_new_user(ap_id: str, account: Optional[Account] = None) -> Account:
@@ -17,7 +34,11 @@ def fetch_new_user(ap_id: str, account: Optional[Account] = None) -> Account:
     ap_id -- the Actor's ActivityPub id.
     account -- another local Account used to authenticate during the HTTP GET req.
     """
-    data = fetcher_component.get(ap_id, account).json()
+    try:
+        response = fetcher_component.get(ap_id, account)
+    except fetcher_component.FetchFailedException:
+        raise Account.DoesNotExist(ap_id)
+    data = response.json()
     domain = urlparse(data["id"]).hostname
     firstname = data["preferredUsername"]
     inbox_uri = None
@@ -38,31 +59,241 @@ def fetch_new_user(ap_id: str, account: Optional[Account] = None) -> Account:
         summary=data.get("summary", ""),
         url=data.get("url", data["id"]),
         is_locked=data["manuallyApprovesFollowers"],
-        public_key=data["publicKey"]["publicKeyPem"]
+        public_key=data["publicKey"]["publicKeyPem"],
+        **_validators(response)
     )
     account.save()
     return account
 
 
 def get_or_fetch_user(ap_id: str, account: Optional[Account] = None) -> Account:
+    """
+    Get an Actor from DB or fetch it from remote.
+    Concurrent callers for the same Actor wait for one fetch.
+    """
     try:
         return Account.objects.get(ap_id=ap_id)
     except Account.DoesNotExist:
-        return fetch_new_user(ap_id, account)
+        with single_flight("account:%s" % ap_id):
+            try:
+                return Account.objects.get(ap_id=ap_id)
+            except Account.DoesNotExist:
+                return fetch_new_user(ap_id, account)
 
 
-def fetch_and_update_user(ap_id: str, account: Optional[Account] = None):
-    user = Account.objects.get(ap_id=ap_id)
+def _validators(response: requests.Response) -> dict:
+    "Fields of an Account recording when and which version of it was fetched."
+    return {
+        "etag": response.headers.get("ETag", ""),
+        "last_modified": response.headers.get("Last-Modified", ""),
+        "fetched_at": timezone.now(),
+    }
+
+
+def conditional_get(user: Account, account: Optional[Account] = None) -> Optional[requests.Response]:
+    """
+    Fetch an Actor again, unless it is unchanged since the last fetch.
+
+    returns the response, with status code 304 if unchanged, or None on errors.
+    user -- the remote Account.
+    account -- another local Account used to authenticate during the HTTP GET req.
+    """
+    headers = {}
+    if user.etag:
+        headers["If-None-Match"] = user.etag
+    if user.last_modified:
+        headers["If-Modified-Since"] = user.last_modified
+    try:
+        return fetcher_component.get(user.ap_id, account, headers)
+    except fetcher_component.FetchFailedException:
+        return None
 
-    data = fetcher_component.get(ap_id, account).json()
-    serializer = ActorSerializer(user, data=data)
+
+def update_user(user: Account, response: requests.Response) -> Optional[Account]:
+    """
+    Update a remote Account from the response of conditional_get().
+
+    returns the updated Account, or None if the Actor document is invalid.
+    """
+    if response.status_code == 304:
+        user.fetched_at = timezone.now()
+        Account.objects.filter(id=user.id).update(fetched_at=user.fetched_at)
+        return user
+    serializer = ActorSerializer(user, data=response.json())
     if serializer.is_valid():
-        return serializer.save()
+        user = serializer.save(**_validators(response))
+        forget_public_key(user.ap_id)
+        return user
+    return None
+
 
+def fetch_and_update_user(ap_id: str, account: Optional[Account] = None) -> Optional[Account]:
+    "Fetch a known Actor again and update it, if it has changed."
+    user = Account.objects.get(ap_id=ap_id)
+    response = conditional_get(user, account)
+    if response is None:
+        return None
+    return update_user(user, response)
+
+
+def refresh_stale_actors(batch_size: int = 500) -> int:
+    """
+    Enqueue refreshes of remote Actors not fetched for
+    settings.RBQ_ACTOR_REFRESH_INTERVAL seconds, one task per remote host.
+    Runs as a django-q scheduled task, see the setup_schedules command.
+
+    returns the number of Actors enqueued.
+    batch_size -- the maximum number of Actors enqueued in one run.
+    """
+    now = timezone.now()
+    interval = timedelta(seconds=getattr(settings, "RBQ_ACTOR_REFRESH_INTERVAL", 86400))
+    stale = list(Account.objects.remote().filter(
+        Q(fetched_at__isnull=True) | Q(fetched_at__lt=now - interval)
+    ).order_by(F('fetched_at').asc(nulls_first=True)).values_list('id', 'ap_id')[:batch_size])
+    if not stale:
+        return 0
+    # Also counts as fetched when the refresh fails, so it's tried once per interval.
+    Account.objects.filter(id__in=[user_id for user_id, _ap_id in stale]).update(fetched_at=now)
+
+    by_host: dict = {}
+    for _id, ap_id in stale:
+        by_host.setdefault(urlparse(ap_id).hostname, []).append(ap_id)
+    for ap_ids in by_host.values():
+        async_task(
+            refresh_actors,
+            ap_ids,
+            q_options={
+                "task_name": "refresh_actors"
+            })
+    return len(stale)
+
+
+def refresh_actors(ap_ids: List[str]) -> int:
+    """
+    Refresh remote Actors on the same host, with at most
+    settings.RBQ_ACTOR_REFRESH_CONCURRENCY requests at a time.
+    Runs as a django-q task.
+
+    returns the number of Actors changed.
+    ap_ids -- the Actors' ActivityPub ids.
+    """
+    users = list(Account.objects.filter(ap_id__in=ap_ids))
+    if not users:
+        return 0
+    concurrency = min(len(users), getattr(settings, "RBQ_ACTOR_REFRESH_CONCURRENCY", 2))
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        responses = list(pool.map(conditional_get, users))
+    changed = 0
+    for user, response in zip(users, responses):
+        if response is not None and response.status_code != 304:
+            changed += update_user(user, response) is not None
+    return changed
+
+
+# Fields of the Account cached with its public key: all that authentication needs.
+KEY_ACCOUNT_FIELDS = ("id", "username", "ap_id")
+
+
+def _key_account(fields: dict) -> Account:
+    """
+    An Account built from the cache without a query.
+    Other fields are deferred: reading one loads it, and save() only writes the loaded ones.
+    """
+    names = [field.attname for field in Account._meta.concrete_fields if field.attname in fields]
+    return Account.from_db(Account.objects.db, names, [fields[name] for name in names])
 
-def _paginator(queryset, page: int) -> List[str]:
-    obj_list = Paginator(queryset, 50).page(page).object_list
-    return [f.ap_id for f in obj_list]
+
+def _refresh_key(key_id: str, suffix: str) -> str:
+    return "rbq:key-%s:%s" % (suffix, hashlib.sha1(key_id.encode('utf-8')).hexdigest())
+
+
+def claim_refresh(key_id: str) -> bool:
+    """
+    Whether the Actor of a keyId may be fetched again now, to look for a rotated key:
+    at most once per settings.RBQ_PUBLIC_KEY_REFRESH_INTERVAL seconds, and not for
+    settings.RBQ_PUBLIC_KEY_REFRESH_FAILURE_TTL seconds after a failed refresh.
+    Shared by all processes through the cache.
+    """
+    if cache.get(_refresh_key(key_id, "refresh-failed")) is not None:
+        return False
+    return cache.add(_refresh_key(key_id, "refreshed"), True,
+                     getattr(settings, "RBQ_PUBLIC_KEY_REFRESH_INTERVAL", 600))
+
+
+def get_public_key(key_id: str, refresh: bool = False) -> Tuple[Account, crypto_component.PublicKey]:
+    """
+    Get the Actor and its parsed public key from a keyId of HTTP Signatures.
+    Keys are cached in this process with the Actor's id, ap_id and username,
+    so a cached key needs no query; Account.save() drops them.
+
+    key_id -- the keyId, "<Actor's ap_id>#<fragment>".
+    refresh -- fetch the Actor again, e.g. when its key may have been rotated;
+               ignored unless claim_refresh() allows it.
+    """
+    ap_id, _fragment = key_id.split("#", 1)
+    if refresh and claim_refresh(key_id):
+        if fetch_and_update_user(ap_id) is None:
+            cache.set(_refresh_key(key_id, "refresh-failed"), True,
+                      getattr(settings, "RBQ_PUBLIC_KEY_REFRESH_FAILURE_TTL", 3600))
+    else:
+        cached = _public_keys.get(key_id)
+        if cached is not None:
+            fields, public_key = cached
+            return _key_account(fields), public_key
+    user = get_or_fetch_user(ap_id)
+    public_key = crypto_component.PublicKey.from_pem(user.public_key)
+    _public_keys.set(key_id, ({name: getattr(user, name) for name in KEY_ACCOUNT_FIELDS}, public_key))
+    return user, public_key
+
+
+def forget_public_key(ap_id: str) -> None:
+    "Drop the cached public keys of an Actor."
+    _public_keys.delete_where(lambda key_id: key_id.split("#", 1)[0] == ap_id)
+
+
+PAGE_SIZE = 50
+
+
+def _follow_page(uri: str,
+                 follows,
+                 column: str,
+                 page: Optional[int] = None,
+                 cursor: Optional[str] = None) -> dict:
+    """
+    Generate a page of a followers or following collection.
+    Follows are ordered by (created_at, id) and a page takes one query.
+
+    uri -- the collection's URI.
+    follows -- the Follow QuerySet of the collection.
+    column -- the Follow field of the listed Accounts.
+    page -- the 1-based page number, for old ?page= URLs.
+    cursor -- where the page starts, from the "next" link of the previous page.
+    """
+    follows = follows.order_by('created_at', 'id')
+    offset = 0
+    if cursor is not None:
+        follows = cursor_component.after(follows, cursor)
+        page_id = "%s?cursor=%s" % (uri, cursor)
+    else:
+        page = page or 1
+        if page < 1:
+            raise ValueError("page must be positive")
+        offset = (page - 1) * PAGE_SIZE
+        page_id = "%s?page=%d" % (uri, page)
+    rows = list(follows.values_list(
+        'created_at', 'id', column + '__ap_id')[offset:offset + PAGE_SIZE + 1])
+    result = {
+        "id": page_id,
+        "type": "OrderedCollectionPage",
+        "partOf": uri,
+        "orderedItems": [ap_id for _created_at, _id, ap_id in rows[:PAGE_SIZE]]
+    }
+    if page is not None and page > 1:
+        result["prev"] = "%s?page=%d" % (uri, page - 1)
+    if len(rows) > PAGE_SIZE:
+        created_at, follow_id, _ap_id = rows[PAGE_SIZE - 1]
+        result["next"] = "%s?cursor=%s" % (uri, cursor_component.encode(created_at, follow_id))
+    return result
 
 
 def gen_followers(account: Optional[Account]) -> dict:
@@ -74,23 +305,13 @@ def gen_followers(account: Optional[Account]) -> dict:
     }
 
 
-def gen_followers_paged(account: Optional[Account], page: int = 1) -> dict:
-    result = {
-        "id": account.followers_uri + "?page=%d" % page,
-        "type": "OrderedCollection",
-        "totalItems": account.followers.count(),
-        "partOf": account.followers_uri,
-        "next": account.followers_uri + "?page=%d" % (page+1),
-        "orderedItems": _paginator(account.followers.all(), page)
-    }
-    if page > 1:
-        result["prev"] = account.followers_uri + "?page=%d" % (page-1)
-    try:
-        _paginator(account.followers.all(), page+1)
-    except EmptyPage:
-        return result
-    result["next"] = account.followers_uri + "?page=%d" % (page+1)
-    return result
+def gen_followers_paged(account: Optional[Account],
+                        page: Optional[int] = None,
+                        cursor: Optional[str] = None) -> dict:
+    # Follow rows are stored with followee as the following side.
+    return _follow_page(
+        account.followers_uri, Follow.objects.filter(follower=account), 'followee',
+        page=page, cursor=cursor)
 
 
 def gen_following(account: Optional[Account]) -> dict:
@@ -102,33 +323,54 @@ def gen_following(account: Optional[Account]) -> dict:
     }
 
 
-def gen_following_paged(account: Optional[Account], page: int = 1) -> dict:
-    result = {
-        "id": account.following_uri + "?page=%d" % page,
-        "type": "OrderedCollection",
-        "totalItems": account.following.count(),
-        "partOf": account.following_uri,
-        "next": account.following_uri + "?page=%d" % (page+1),
-        "orderedItems": _paginator(account.following.all(), page)
-    }
-
-    if page > 1:
-        result["prev"] = account.following_uri + "?page=%d" % (page-1)
-    try:
-        _paginator(account.following.all(), page+1)
-    except EmptyPage:
-        return result
-    result["next"] = account.following_uri + "?page=%d" % (page+1)
-    return result
+def gen_following_paged(account: Optional[Account],
+                        page: Optional[int] = None,
+                        cursor: Optional[str] = None) -> dict:
+    return _follow_page(
+        account.following_uri, Follow.objects.filter(followee=account), 'follower',
+        page=page, cursor=cursor)
 
 
 def local_follow_user(follower: Account, followee: Account) -> None:
-    "Set following relationship locally (Not sending ActivityPub requests)"
-    follower.following.add(followee)
-    follower.following_count = follower.following.count()
-    follower.save()
-    followee.followers_count = followee.followers.count()
-    followee.save()
+    """
+    Set following relationship locally (Not sending ActivityPub requests)
+    Counters are updated in the database only, not on the given instances.
+    A local follower's home timeline is backfilled in a background task.
+    """
+    with transaction.atomic():
+        # Follow rows are stored with followee as the following side.
+        _follow, created = Follow.objects.get_or_create(followee=follower, follower=followee)
+        if created:
+            counter_component.adjust(Account.objects.filter(id=follower.id), following_count=1)
+            counter_component.adjust(Account.objects.filter(id=followee.id), followers_count=1)
+    if created and follower.is_local:
+        async_task(
+            feed_component.backfill,
+            follower.id,
+            followee.id,
+            q_options={
+                "task_name": "backfill_home_feed"
+            })
+
+
+def local_unfollow_user(follower: Account, followee: Account) -> None:
+    """
+    Remove following relationship locally (Not sending ActivityPub requests).
+    A local follower's home timeline is purged in a background task.
+    """
+    with transaction.atomic():
+        deleted, _rows = Follow.objects.filter(followee=follower, follower=followee).delete()
+        if deleted:
+            counter_component.adjust(Account.objects.filter(id=follower.id), following_count=-deleted)
+            counter_component.adjust(Account.objects.filter(id=followee.id), followers_count=-deleted)
+    if deleted and follower.is_local:
+        async_task(
+            feed_component.purge,
+            follower.id,
+            followee.id,
+            q_options={
+                "task_name": "purge_home_feed"
+            })
 
 
 def follow_remote_user(follower: Account, followee: Account) -> None:
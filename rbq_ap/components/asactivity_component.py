@@ -1,65 +1,64 @@
 from typing import Dict, Iterable, List, Optional, Union
 from urllib.parse import urlparse
 
-from django.conf import settings
 from django.db import IntegrityError, transaction
 from django import db
-from django_q.tasks import async_task
 
 from rbq_ap import helpers
-from rbq_ap.components import fetcher_component, account_component
-from rbq_backend.components import asobject_component
-from rbq_backend.components.asobject_component import (
-    ASDict, filter_asobject_for_output)
-from rbq_backend.models import Account, ASActivity, ASObject
+from rbq_ap.components import account_component, delivery_component, feed_component
+from rbq_backend.components import asobject_component, counter_component
+from rbq_backend.components.asobject_component import ASDict
+from rbq_backend.models import Account, ASActivity, ASObject, Follow
+from rbq_backend.models.asactivity import PUBLIC, PUBLIC_IDS, addressed
+from rbq_backend.models.asobject import author_id
 
 
 def send_activity(data: ASDict, recipients: Iterable[str], task_name: str = "send_activity"):
     """
     Save a new Activity to database and POST it to recipients' inboxes.
+    Followers collections of local Accounts are expanded to their followers.
 
     data -- the ActivityStreams Activity dict.
-    recipients -- a list of ActivityPub IDs pointed to recipient Actors.
+    recipients -- a list of ActivityPub IDs pointed to recipient Actors or collections.
     task_name -- the name of task in queue to send the activity.
     """
     actor = Account.objects.get(ap_id=helpers.get_id(data["actor"]))
     recipient_actors = list(Account.objects.filter(ap_id__in=recipients).all())
-    recipient_actors += Account.objects.filter(followers_uri__in=recipients).all()
-    ap_ids = list(set((actor.inbox_uri for actor in recipient_actors)))
+    # Followers of X are stored in the followee column, see local_follow_user.
+    recipient_actors += Account.objects.filter(id__in=Follow.objects.filter(
+        follower__in=Account.objects.local().filter(followers_uri__in=recipients)
+    ).values('followee')).all()
     inboxes = set((actor.inbox_uri for actor in recipient_actors))
 
-    asa = ASActivity(data=data, actor=actor, recipients=ap_ids)
-    if "id" not in data.keys():
-        asa.data["id"] = "https://%s/actvities/%d" % (actor.domain, asa.id)
-        data = asa.data
-    asa.save()
-    for inbox in inboxes:
-        if urlparse(inbox).hostname not in settings.RBQ_LOCAL_DOMAINS + ["www.w3.org"]:
-            async_task(
-                fetcher_component.post,
-                inbox,
-                account=actor,
-                json=filter_asobject_for_output(data),
-                q_options={
-                    "task_name": task_name
-                })
-
-
-def get_recipients(data: dict) -> List[str]:
+    asa = ASActivity(data=data, actor=actor,
+                     recipients=sorted(set(get_recipients(data)) | set(recipients)))
+    with transaction.atomic():
+        asa.save()
+        if "id" not in data.keys():
+            asa.data["id"] = "https://%s/actvities/%d" % (actor.domain, asa.id)
+            data = asa.data
+            asa.save()
+    feed_component.fan_out(asa)
+    delivery_component.enqueue(asa, inboxes, task_name=task_name)
+
+
+def get_recipients(data: dict, depth: int = 1) -> List[str]:
     """
-    Returns recipients of an Activity.
+    Returns recipients of an Activity: its actor and everyone addressed
+    by it or by its object. Stored in ASActivity.recipients, which is
+    GIN-indexed for "addressed to me" queries.
 
-    dict -- the Activity dict.
+    data -- the Activity dict.
+    depth -- how many levels of objects are looked at.
     """
-    to = data.get("to", [])
-    cc = data.get("cc", [])
-    bcc = data.get("bcc", [])
-    actor = data.get("actor", None)
-    try:
-        aso = ASObject.objects.get(data__id=helpers.get_id(data["object"]))
-        return list(set(to + cc + bcc + [actor] + get_recipients(aso.data)) - set([None]))
-    except (KeyError, ASObject.DoesNotExist):
-        return list(set(to + cc + bcc + [actor]) - set([None]))
+    recipients = addressed(data, "to", "cc", "bcc", "audience")
+    recipients.add(helpers.get_id(data.get("actor", None)))
+    obj = data.get("object", None)
+    if depth > 0 and isinstance(obj, str):
+        obj = ASObject.objects.filter(ap_id=obj).values_list('data', flat=True).first()
+    if depth > 0 and isinstance(obj, dict):
+        recipients.update(get_recipients(obj, depth - 1))
+    return sorted(set(PUBLIC if ap_id in PUBLIC_IDS else ap_id for ap_id in recipients) - {None})
 
 
 class ActorNotMatchException(Exception):
@@ -120,10 +119,10 @@ class SaveASActivityMixin:
     def save(self, data: ASDict, actor: Account, recipients: List[str] = None) -> None:
         if not recipients:
             recipients = get_recipients(data)
-        ASActivity.objects.create(
+        feed_component.fan_out(ASActivity.objects.create(
             data=data,
             actor=actor,
-            recipients=recipients)
+            recipients=recipients))
 
 
 class CreateHandlerMixin(ObjectNormalizerMixin):
@@ -152,6 +151,7 @@ def like_or_announce_handler(_self: object, data: ASDict) -> ASDict:
         asobject.save()
         data["rbqInternal"] = data.get("rbqInternal", {})
         data["rbqInternal"]["status"] = "normal"
+        counter_component.adjust_interactions(asobject, data["type"], 1)
     except (KeyError, ASObject.DoesNotExist):
         raise ObjectNotFoundException(data)
     return data
@@ -184,23 +184,58 @@ class UndoHandlerMixin:
         obj_id = helpers.get_id(data["object"])
         obj_data = None
         try:
-            aso = ASObject.objects.get(data__id=obj_id)
+            aso = ASObject.objects.get(ap_id=obj_id)
             obj_data = aso.data
         except ASObject.DoesNotExist:
-            obj_data = ASActivity.objects.get(data__id=obj_id).data
+            obj_data = ASActivity.objects.get(ap_id=obj_id).data
         if obj_data["type"] == "Follow":
             follower = Account.objects.get(
                 ap_id=helpers.get_id(obj_data["actor"]))
             followee = Account.objects.get(
                 ap_id=helpers.get_id(obj_data["object"]))
             print("%s unfollows %s" % (follower, followee))
-            follower.following.remove(followee)
-        elif obj_data["type"] == "Like":
-            like_asa = ASActivity.objects.get(data__id=obj_id)
-            like_asa.data["rbqInternal"] = like_asa.data.get("rbqInternal", {})
-            like_asa.data["rbqInternal"]["status"] = "canceled"
-            like_asa.save()
+            account_component.local_unfollow_user(follower, followee)
+        elif obj_data["type"] in ("Like", "Announce"):
+            asa = ASActivity.objects.get(ap_id=obj_id)
+            if asa.actor_id != self.account.ap_id:
+                raise ActorNotMatchException(asa.actor_id, self.account.ap_id)
+            if asa.status == "normal":
+                try:
+                    counter_component.adjust_interactions(asa.asobject, asa.type, -1)
+                except ASObject.DoesNotExist:
+                    pass
+            asa.data["rbqInternal"] = asa.data.get("rbqInternal", {})
+            asa.data["rbqInternal"]["status"] = "canceled"
+            asa.save()
+            feed_component.withdraw(ASActivity.objects.filter(id=asa.id))
+
+        return data
+
+
+class DeleteHandlerMixin:
+    "Handle Delete Activities of objects."
 
+    def delete_handler(self, data: ASDict) -> ASDict:
+        """
+        Replace the deleted object with a Tombstone, and mark its Create as deleted.
+        Only the author of an object can delete it.
+
+        returns the proccessed Activity to save in database.
+        data -- the incoming Activity dict.
+        """
+        obj_id = helpers.get_id(data["object"])
+        try:
+            aso = ASObject.objects.get(ap_id=obj_id)
+        except ASObject.DoesNotExist:
+            return data
+        if author_id(aso.data) != self.account.ap_id:
+            raise ActorNotMatchException(author_id(aso.data), self.account.ap_id)
+        ASObject.objects.tombstone(aso)
+        for create in ASActivity.objects.filter(object=obj_id, type="Create"):
+            create.data["rbqInternal"] = create.data.get("rbqInternal", {})
+            create.data["rbqInternal"]["status"] = "deleted"
+            create.save()
+        feed_component.withdraw(ASActivity.objects.filter(object=obj_id))
         return data
 
 
@@ -220,7 +255,7 @@ class FollowHandlerMixin(SaveASActivityMixin):
             if followee.is_local:
                 if not followee.is_locked:
                     account_component.local_follow_user(
-                        self.request.user, followee)
+                        self.account, followee)
                     send_activity(
                         data={
                             "@context": "https://www.w3.org/ns/activitystreams",
@@ -231,15 +266,15 @@ class FollowHandlerMixin(SaveASActivityMixin):
                         },
                         recipients=[
                             followee.ap_id,
-                            self.request.user.ap_id
+                            self.account.ap_id
                         ],
                         task_name="send_follow_accept")
                 else:
                     data["rbqInternal"] = data.get("rbqInternal", {})
                     data["rbqInternal"]["status"] = "pending"
-            self.save(data, self.request.user, recipients=[
+            self.save(data, self.account, recipients=[
                 followee.ap_id,
-                self.request.user.ap_id
+                self.account.ap_id
             ])
         except KeyError:
             raise InvalidFormException(data)
@@ -258,7 +293,7 @@ class AcceptHandlerMixin:
         """
         followee = account_component.get_or_fetch_user(
             helpers.get_id(data["actor"]))
-        follow_request = ASActivity.objects.get(helpers.get_id(data["object"]))
+        follow_request = ASActivity.objects.get(ap_id=helpers.get_id(data["object"]))
         follower = follow_request.actor
         account_component.local_follow_user(follower, followee)
         follow_request.delete()
@@ -0,0 +1,36 @@
+"Cursors of keyset-paginated collections, ordered by (created_at, id)."
+
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+
+def encode(created_at: datetime, row_id: int) -> str:
+    "Position of a row in a collection, for the next page to start after it."
+    delta = created_at - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return "%d_%d" % (delta // timedelta(microseconds=1), row_id)
+
+
+def decode(cursor: str) -> Tuple[datetime, int]:
+    "Raises ValueError on malformed cursors."
+    microseconds, row_id = cursor.split("_")
+    created_at = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=int(microseconds))
+    return created_at, int(row_id)
+
+
+def after(queryset: QuerySet, cursor: str, descending: bool = False) -> QuerySet:
+    """
+    Filter and order rows coming after a cursor.
+
+    queryset -- rows with created_at and id fields.
+    cursor -- from encode().
+    descending -- for newest first collections.
+    """
+    created_at, row_id = decode(cursor)
+    if descending:
+        return queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=row_id))
+    return queryset.filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=row_id))
@@ -0,0 +1,255 @@
+"Functions related to delivering Activities to remote inboxes."
+
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django_q.tasks import async_task
+
+from rbq_ap.components import fetcher_component
+from rbq_backend.components import json_component, task_component
+from rbq_backend.components.asobject_component import filter_asobject_for_output
+from rbq_backend.models import ASActivity, Delivery, DomainHealth
+
+Outcome = Union[int, str]
+
+
+def plan(inboxes: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Group remote inboxes by their host.
+
+    returns a dict of hostname => sorted inbox URLs.
+    inboxes -- inbox URLs; local ones are skipped.
+    """
+    result: Dict[str, List[str]] = {}
+    for inbox in set(inboxes):
+        host = urlparse(inbox).hostname
+        if host is None or host in settings.RBQ_LOCAL_DOMAINS + ["www.w3.org"]:
+            continue
+        result.setdefault(host, []).append(inbox)
+    return {host: sorted(urls) for host, urls in result.items()}
+
+
+def render(activity: ASActivity) -> bytes:
+    "Serialize an Activity for delivery, once for all of its recipients."
+    return json_component.dumps(filter_asobject_for_output(activity.data))
+
+
+def enqueue(activity: ASActivity,
+            inboxes: Iterable[str],
+            body: Optional[bytes] = None,
+            task_name: str = "send_activity") -> None:
+    """
+    Record the deliveries of an Activity and enqueue one task per remote host.
+    Hosts with an open circuit breaker are left to retry_deliveries().
+
+    activity -- the saved ASActivity.
+    inboxes -- inbox URLs of the recipients.
+    body -- the serialized Activity, rendered from activity if omitted.
+    task_name -- the name of tasks in queue.
+    """
+    hosts = plan(inboxes)
+    if not hosts:
+        return
+    if body is None:
+        body = render(activity)
+    digest = fetcher_component.body_digest(body)
+    lease_until = timezone.now() + timedelta(
+        seconds=getattr(settings, "RBQ_DELIVERY_LEASE", 300))
+    Delivery.objects.bulk_create([
+        Delivery(activity=activity, inbox=inbox, host=host, next_attempt_at=lease_until)
+        for host, host_inboxes in hosts.items() for inbox in host_inboxes
+    ], ignore_conflicts=True)
+    open_hosts = set(DomainHealth.objects.filter(
+        host__in=hosts.keys(), opened_until__gt=timezone.now()).values_list('host', flat=True))
+    for host, host_inboxes in hosts.items():
+        if host in open_hosts:
+            continue
+        task_component.enqueue_on_commit(
+            deliver,
+            activity.id,
+            body,
+            host_inboxes,
+            digest,
+            q_options={
+                "task_name": task_name
+            })
+
+
+def backoff(attempts: int) -> timedelta:
+    """
+    Delay before the next attempt: exponential, capped, with jitter.
+
+    attempts -- the number of failed attempts so far.
+    """
+    base = getattr(settings, "RBQ_DELIVERY_RETRY_BASE", 60)
+    cap = getattr(settings, "RBQ_DELIVERY_RETRY_MAX", 6 * 3600)
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def is_permanent(outcome: Outcome) -> bool:
+    "The remote server refused the Activity, retrying won't help."
+    return isinstance(outcome, int) and 400 <= outcome < 500 and outcome not in (408, 429)
+
+
+def is_delivered(outcome: Outcome) -> bool:
+    return isinstance(outcome, int) and 200 <= outcome < 300
+
+
+def deliver(activity_id: int,
+            body: bytes,
+            inboxes: List[str],
+            digest: Optional[str] = None) -> Dict[str, Outcome]:
+    """
+    POST one serialized Activity to inboxes on the same host.
+    Runs as a django-q task, one task per host.
+    Only the signature is computed for each inbox.
+
+    returns the HTTP status code, or the error, of every inbox tried.
+    activity_id -- the primary key of the ASActivity; its actor signs the requests.
+    body -- the JSON body, serialized once for all inboxes.
+    inboxes -- inbox URLs, all on one host.
+    digest -- the Digest header of body.
+    """
+    if digest is None:
+        digest = fetcher_component.body_digest(body)
+    activity = ASActivity.objects.select_related('actor').get(id=activity_id)
+    account = activity.actor
+    host = urlparse(inboxes[0]).hostname
+    health, _created = DomainHealth.objects.get_or_create(host=host)
+    inboxes = list(Delivery.objects.filter(
+        activity=activity, inbox__in=inboxes, status="pending"
+    ).values_list('inbox', flat=True))
+    if not inboxes or health.is_open:
+        return {}
+
+    def post(inbox: str) -> Outcome:
+        try:
+            return fetcher_component.post(
+                inbox, account=account, data=body, digest=digest).status_code
+        except requests.RequestException as exception:
+            return repr(exception)
+
+    outcomes: Dict[str, Outcome] = {}
+    if health.is_half_open:
+        # Probe the host with one request before sending the rest.
+        outcomes[inboxes[0]] = post(inboxes[0])
+        inboxes = inboxes[1:] if is_delivered(outcomes[inboxes[0]]) else []
+    concurrency = min(len(inboxes), getattr(settings, "RBQ_DELIVERY_CONCURRENCY", 4))
+    if inboxes:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes.update(zip(inboxes, pool.map(post, inboxes)))
+
+    record(activity, health, outcomes)
+    return outcomes
+
+
+def record(activity: ASActivity, health: DomainHealth, outcomes: Dict[str, Outcome]) -> None:
+    """
+    Save the outcomes of a delivery task and update the host's circuit breaker.
+
+    activity -- the delivered ASActivity.
+    health -- the DomainHealth of the host.
+    outcomes -- inbox URL => HTTP status code or error.
+    """
+    now = timezone.now()
+    max_attempts = getattr(settings, "RBQ_DELIVERY_MAX_ATTEMPTS", 10)
+    host_alive = False
+    for delivery in Delivery.objects.filter(activity=activity, inbox__in=outcomes.keys()):
+        outcome = outcomes[delivery.inbox]
+        delivery.attempts += 1
+        if is_delivered(outcome):
+            delivery.status = "delivered"
+            delivery.last_error = ""
+        elif is_permanent(outcome) or delivery.attempts >= max_attempts:
+            delivery.status = "failed"
+            delivery.last_error = str(outcome)
+        else:
+            delivery.next_attempt_at = now + backoff(delivery.attempts)
+            delivery.last_error = str(outcome)
+        host_alive = host_alive or is_delivered(outcome) or is_permanent(outcome)
+        delivery.save()
+
+    if host_alive:
+        DomainHealth.objects.filter(id=health.id).update(
+            consecutive_failures=0, opened_until=None)
+        return
+    DomainHealth.objects.filter(id=health.id).update(
+        consecutive_failures=F('consecutive_failures') + 1)
+    health.refresh_from_db()
+    threshold = getattr(settings, "RBQ_CIRCUIT_BREAKER_THRESHOLD", 5)
+    if health.consecutive_failures >= threshold:
+        cooldown = min(
+            getattr(settings, "RBQ_CIRCUIT_BREAKER_COOLDOWN", 600)
+            * 2 ** min(health.consecutive_failures - threshold, 16),
+            getattr(settings, "RBQ_DELIVERY_RETRY_MAX", 6 * 3600))
+        health.opened_until = now + timedelta(seconds=cooldown)
+        health.save()
+        # Don't wake up before the host may be probed again.
+        Delivery.objects.filter(
+            host=health.host, status="pending", next_attempt_at__lt=health.opened_until
+        ).update(next_attempt_at=health.opened_until)
+
+
+def retry_deliveries(batch_size: int = 1000) -> int:
+    """
+    Enqueue pending deliveries whose next attempt is due.
+    Runs as a django-q scheduled task, see the setup_schedules command.
+
+    returns the number of deliveries enqueued.
+    batch_size -- the maximum number of deliveries enqueued in one run.
+    """
+    now = timezone.now()
+    due = list(Delivery.objects.filter(
+        status="pending", next_attempt_at__lte=now
+    ).exclude(
+        host__in=DomainHealth.objects.filter(opened_until__gt=now).values('host')
+    ).order_by('next_attempt_at').values_list('id', 'activity_id', 'inbox')[:batch_size])
+    if not due:
+        return 0
+    Delivery.objects.filter(id__in=[delivery_id for delivery_id, _a, _i in due]).update(
+        next_attempt_at=now + timedelta(seconds=getattr(settings, "RBQ_DELIVERY_LEASE", 300)))
+
+    by_activity: Dict[int, List[str]] = {}
+    for _id, activity_id, inbox in due:
+        by_activity.setdefault(activity_id, []).append(inbox)
+    for activity in ASActivity.objects.filter(id__in=by_activity.keys()):
+        body = render(activity)
+        digest = fetcher_component.body_digest(body)
+        for host_inboxes in plan(by_activity[activity.id]).values():
+            async_task(
+                deliver,
+                activity.id,
+                body,
+                host_inboxes,
+                digest,
+                q_options={
+                    "task_name": "retry_delivery"
+                })
+    return len(due)
+
+
+def prune_deliveries(batch_size: int = 10000) -> int:
+    """
+    Delete delivered and failed deliveries not updated for
+    settings.RBQ_DELIVERY_RETENTION seconds, one batch per run.
+    Runs as a django-q scheduled task, see the setup_schedules command.
+
+    returns the number of deliveries deleted.
+    batch_size -- the maximum number of deliveries deleted in one run.
+    """
+    before = timezone.now() - timedelta(seconds=getattr(settings, "RBQ_DELIVERY_RETENTION", 7 * 86400))
+    ids = list(Delivery.objects.filter(
+        status__in=("delivered", "failed"), updated_at__lt=before
+    ).values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    deleted, _rows = Delivery.objects.filter(id__in=ids).delete()
+    return deleted
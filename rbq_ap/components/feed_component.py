@@ -0,0 +1,110 @@
+"""
+Functions related to home timelines of local Accounts.
+
+Timelines are filled on write: every saved Activity is copied, as a FeedItem,
+to the timelines of the local Accounts who may read it.
+"""
+
+from django.conf import settings
+from django.db.models import Count, Q, QuerySet
+
+from rbq_backend.models import Account, ASActivity, FeedItem, Follow, HIDDEN_STATUSES, addressed
+
+# Activities shown in home timelines; Announces wait until StatusSerializer
+# renders them as reblogs, not as statuses of the booster.
+FEED_TYPES = ("Create",)
+# Visibilities shown to all followers; direct ones only to their addressees.
+FOLLOWERS_VISIBILITIES = ("public", "unlisted", "private")
+
+
+def feed_length() -> int:
+    "The number of activities kept in each home timeline."
+    return getattr(settings, "RBQ_HOME_FEED_LENGTH", 800)
+
+
+def fan_out(activity: ASActivity) -> int:
+    """
+    Add an Activity to the home timelines of its local readers, in one INSERT:
+    its local author, and the local followers of its author; only the
+    addressed ones among them if the Activity is direct.
+
+    returns the number of timelines the Activity was added to.
+    activity -- the saved ASActivity.
+    """
+    if activity.type not in FEED_TYPES or activity.status in HIDDEN_STATUSES:
+        return 0
+    # Followers of X are stored in the followee column, see local_follow_user.
+    readers = Q(id__in=Follow.objects.filter(follower__ap_id=activity.actor_id).values('followee'))
+    if activity.visibility not in FOLLOWERS_VISIBILITIES:
+        readers &= Q(ap_id__in=addressed(activity.data, "to", "cc", "bcc", "audience"))
+    account_ids = list(Account.objects.local().filter(
+        readers | Q(ap_id=activity.actor_id)).values_list('id', flat=True))
+    FeedItem.objects.bulk_create([
+        FeedItem(account_id=account_id, activity=activity) for account_id in account_ids
+    ], ignore_conflicts=True)
+    return len(account_ids)
+
+
+def withdraw(activities: QuerySet) -> int:
+    """
+    Remove undone or deleted Activities from all home timelines.
+
+    returns the number of FeedItems removed.
+    activities -- the ASActivity QuerySet to remove.
+    """
+    deleted, _rows = FeedItem.objects.filter(activity__in=activities).delete()
+    return deleted
+
+
+def backfill(follower_id: int, followee_id: int) -> int:
+    """
+    Add the recent activities of a newly followed Actor to a home timeline.
+    Runs as a django-q task, enqueued by local_follow_user().
+
+    returns the number of activities added.
+    follower_id -- the primary key of the local Account.
+    followee_id -- the primary key of the followed Account.
+    """
+    followee = Account.objects.get(id=followee_id)
+    activity_ids = ASActivity.objects.filter(
+        visibility__in=FOLLOWERS_VISIBILITIES, actor=followee, type__in=FEED_TYPES
+    ).exclude(status__in=HIDDEN_STATUSES).order_by('-id').values_list('id', flat=True)[:feed_length() // 2]
+    FeedItem.objects.bulk_create([
+        FeedItem(account_id=follower_id, activity_id=activity_id) for activity_id in activity_ids
+    ], ignore_conflicts=True)
+    return len(activity_ids)
+
+
+def purge(follower_id: int, followee_id: int) -> int:
+    """
+    Remove the activities of an unfollowed Actor from a home timeline.
+    Runs as a django-q task, enqueued by local_unfollow_user().
+
+    returns the number of activities removed.
+    follower_id -- the primary key of the local Account.
+    followee_id -- the primary key of the unfollowed Account.
+    """
+    deleted, _rows = FeedItem.objects.filter(
+        account_id=follower_id, activity__actor__id=followee_id).delete()
+    return deleted
+
+
+def trim_feeds(batch_size: int = 1000) -> int:
+    """
+    Drop the oldest activities of home timelines longer than
+    settings.RBQ_HOME_FEED_LENGTH, with one DELETE per timeline.
+    Runs as a django-q scheduled task, see the setup_schedules command.
+
+    returns the number of FeedItems removed.
+    batch_size -- the maximum number of timelines trimmed in one run.
+    """
+    length = feed_length()
+    account_ids = list(FeedItem.objects.values('account').annotate(
+        items=Count('id')).filter(items__gt=length).values_list('account', flat=True)[:batch_size])
+    deleted = 0
+    for account_id in account_ids:
+        oldest_kept = FeedItem.objects.filter(account_id=account_id).order_by(
+            '-activity_id').values_list('activity_id', flat=True)[length - 1]
+        deleted += FeedItem.objects.filter(
+            account_id=account_id, activity_id__lt=oldest_kept).delete()[0]
+    return deleted
@@ -1,57 +1,255 @@
 "Functions related to HTTP requests."
 
-from typing import Optional, Callable
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Callable, Tuple
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests_http_signature import HTTPSignatureAuth
+from django.conf import settings
+from django.core.cache import cache
 
+from rbq_backend.components import crypto_component
+from rbq_backend.components.cache_component import LRUCache
 from rbq_backend.models import Account
 
 
-def get(url: str, account: Optional[Account] = None) -> requests.Response:
-    "Fetch JSON data from a URL, with HTTP Signatures authorization."
-    return requests.get(
-        url,
-        auth=auth_from_account(account),
-        headers={"Accept": "application/activity+json"}
-    )
+_session_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_pid: Optional[int] = None
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the keep-alive session shared by all requests of this process.
+
+    Connections are pooled per host, at most settings.RBQ_HTTP_POOL_MAXSIZE
+    of them to the same host; callers wait for a free connection instead
+    of opening more. A forked worker builds its own session.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=getattr(settings, "RBQ_HTTP_POOL_CONNECTIONS", 100),
+                    pool_maxsize=getattr(settings, "RBQ_HTTP_POOL_MAXSIZE", 10),
+                    pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def get_timeout() -> Tuple[float, float]:
+    "Returns the (connect, read) timeouts in seconds."
+    return tuple(getattr(settings, "RBQ_HTTP_TIMEOUT", (5, 30)))
+
+
+class FetchFailedException(requests.RequestException):
+    "A remote fetch failed, now or recently; see the negative cache."
+
+
+class HostUnreachableException(FetchFailedException):
+    "The host of a fetched URL didn't answer, now or recently; try again later."
+
+
+FAILURE_TTLS = {
+    404: 3600,
+    410: 7 * 86400,
+    "default": 300,
+    "unreachable": 600,
+}
+
+
+def _failure_key(url: str) -> str:
+    return "rbq:fetch-failed:%s" % hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _host_failure_key(url: str) -> str:
+    return "rbq:host-unreachable:%s" % urlparse(url).hostname
+
+
+def _failure_ttl(status) -> int:
+    ttls = dict(FAILURE_TTLS)
+    ttls.update(getattr(settings, "RBQ_FETCH_FAILURE_TTLS", {}))
+    return ttls.get(status, ttls["default"])
+
+
+def remember_failure(url: str, status: Optional[int] = None) -> None:
+    """
+    Don't fetch a URL, or its whole host, again for a while.
+
+    url -- the URL failed to fetch.
+    status -- the HTTP status code, or None if the host was unreachable.
+    """
+    if status is None:
+        cache.set(_host_failure_key(url), True, _failure_ttl("unreachable"))
+    else:
+        cache.set(_failure_key(url), status, _failure_ttl(status))
+
+
+def forget_failure(url: str) -> None:
+    "The object at url (and so its host) is reachable again."
+    cache.delete_many([_failure_key(url), _host_failure_key(url)])
+
+
+def forget_unreachable(url: str) -> None:
+    "The host of url is reachable again, e.g. it just sent a request here."
+    cache.delete(_host_failure_key(url))
+
+
+def get(url: str,
+        account: Optional[Account] = None,
+        headers: Optional[dict] = None) -> requests.Response:
+    """
+    Fetch JSON data from a URL, with HTTP Signatures authorization.
+
+    Raises FetchFailedException on errors, and without any request
+    while the URL or its host is in the negative cache; its subclass
+    HostUnreachableException when the host didn't answer.
+    headers -- extra request headers, e.g. for a conditional GET.
+    """
+    failures = cache.get_many([_failure_key(url), _host_failure_key(url)])
+    if _host_failure_key(url) in failures:
+        raise HostUnreachableException("Recently failed to reach %s" % url)
+    if failures:
+        raise FetchFailedException("Recently failed to fetch %s" % url)
+    try:
+        response = get_session().get(
+            url,
+            auth=auth_from_account(account),
+            headers=dict(headers or {}, Accept="application/activity+json"),
+            timeout=get_timeout()
+        )
+    except (requests.ConnectionError, requests.Timeout) as exception:
+        remember_failure(url)
+        raise HostUnreachableException("Failed to fetch %s" % url) from exception
+    if response.status_code >= 400:
+        if response.status_code not in (401, 403):
+            # Other accounts may still be authorized to fetch it.
+            remember_failure(url, response.status_code)
+        raise FetchFailedException(
+            "Failed to fetch %s: %d" % (url, response.status_code), response=response)
+    return response
+
+
+def get_json_async(url: str, account: Optional[Account] = None) -> Future:
+    """
+    Fetch JSON data from a URL in a thread pool shared by this process.
+    At most settings.RBQ_FETCH_CONCURRENCY fetches run at the same time.
+
+    returns a Future of the parsed JSON.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _session_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "RBQ_FETCH_CONCURRENCY", 8))
+                _pool_pid = pid
+    return _pool.submit(lambda: get(url, account).json())
+
+
+class HTTPSignatureHeaderAuth(HTTPSignatureAuth):
+    """
+    HTTP Signatures authenticator with an already loaded private key.
+    The HTTP param used in ActivityPub implementations
+    is "Signature" instead of the standard "Authorization".
+    """
+
+    def __init__(self, private_key: crypto_component.PrivateKey, key_id: str):
+        super().__init__(
+            key=None,
+            key_id=key_id,
+            algorithm="rsa-sha256",
+            headers=["(request-target)", "host", "date"])
+        self.private_key = private_key
+
+    def add_digest(self, request):
+        "Reuse a Digest header computed by the caller, but still sign it."
+        if request.body is not None and "Digest" in request.headers \
+                and "digest" not in self.headers:
+            self.headers.append("digest")
+        super().add_digest(request)
+
+    def __call__(self, request):
+        self.add_date(request)
+        self.add_digest(request)
+        signature = base64.b64encode(self.private_key.sign(
+            self.get_string_to_sign(request, self.headers), self.algorithm)).decode()
+        request.headers["Signature"] = ",".join('%s="%s"' % item for item in (
+            ("keyId", self.key_id),
+            ("algorithm", self.algorithm),
+            ("headers", " ".join(self.headers)),
+            ("signature", signature)))
+        return request
+
+
+# ap_id => (PEM, loaded PrivateKey) of local Accounts
+_private_keys = LRUCache(maxsize=getattr(settings, "RBQ_PRIVATE_KEY_CACHE_SIZE", 1024))
+
+
+def get_private_key(account: Account) -> crypto_component.PrivateKey:
+    """
+    Get the loaded private key of a local Account.
+    Keys are parsed once per process, and again when the PEM changes.
+    """
+    cached = _private_keys.get(account.ap_id)
+    if cached is not None and cached[0] == account.private_key:
+        return cached[1]
+    private_key = crypto_component.PrivateKey.from_pem(account.private_key)
+    _private_keys.set(account.ap_id, (account.private_key, private_key))
+    return private_key
 
 
 def auth_from_account(account: Optional[Account] = None) -> Optional[Callable]:
     "Generate the HTTP Signatures authenticator of requests."
-    def signature_auth(func):
-        """
-        Authenticator wrapper.
-        The HTTP param used in ActivityPub implementations
-        differs from the standard one?
-        """
-        def call(request):
-            request = func(request)
-            _signature, string = request.headers["Authorization"].split(" ", 1)
-            request.headers["Signature"] = string
-            del request.headers["Authorization"]
-            return request
-        return call
     if account:
-        return signature_auth(HTTPSignatureAuth(
-            key=account.private_key.encode('utf-8'),
-            key_id="%s#main-key" % account.ap_id,
-            algorithm="rsa-sha256",
-            headers=["(request-target)", "host", "date"]
-        ))
+        return HTTPSignatureHeaderAuth(
+            get_private_key(account),
+            key_id="%s#main-key" % account.ap_id)
     else:
         return None
 
 
+def body_digest(body: bytes) -> str:
+    "Returns the Digest header value of a request body."
+    return "SHA-256=" + base64.b64encode(hashlib.sha256(body).digest()).decode()
+
+
 def post(url: str,
          account: Optional[Account] = None,
-         json: Optional[dict] = None) -> requests.Response:
-    "Send JSON data to a URL, with HTTP Signatures authorization."
-    result = requests.post(
+         json: Optional[dict] = None,
+         data: Optional[bytes] = None,
+         digest: Optional[str] = None) -> requests.Response:
+    """
+    Send JSON data to a URL, with HTTP Signatures authorization.
+
+    json -- the dict to send.
+    data -- or the already serialized JSON body.
+    digest -- the Digest header of data, see body_digest().
+    """
+    headers = {
+        "Accept": "application/activity+json",
+        "Content-Type": "application/activity+json"}
+    if digest is not None:
+        headers["Digest"] = digest
+    result = get_session().post(
         url,
         auth=auth_from_account(account),
-        headers={
-            "Accept": "application/activity+json",
-            "Content-Type": "application/activity+json"},
-        json=json)
+        headers=headers,
+        json=json,
+        data=data,
+        timeout=get_timeout())
     return result
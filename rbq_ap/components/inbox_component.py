@@ -1,13 +1,22 @@
+from datetime import timedelta
+from typing import Optional
+
 from django import db
-from rbq_backend.models import ASActivity
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from rbq_backend.models import Account, ASActivity, InboxItem
+from rbq_backend.components import task_component
 from rbq_backend.components.asobject_component import ASDict
-from rbq_ap.components import account_component, asactivity_component
+from rbq_ap.components import account_component, asactivity_component, fetcher_component
 
 
 class Inbox(asactivity_component.CreateHandlerMixin,
             asactivity_component.LikeHandler,
             asactivity_component.AnnounceHandler,
             asactivity_component.UndoHandlerMixin,
+            asactivity_component.DeleteHandlerMixin,
             asactivity_component.FollowHandlerMixin,
             asactivity_component.AcceptHandlerMixin,
             asactivity_component.SaveASActivityMixin):
@@ -16,10 +25,15 @@ class Inbox(asactivity_component.CreateHandlerMixin,
     to /inbox or /users/<username>/inbox.
     """
 
-    def __init__(self, request=None):
+    def __init__(self, request=None, account: Optional[Account] = None):
+        """
+        request -- the DRF request, authenticated by HTTP Signatures.
+        account -- the verified Actor, when processing outside of a request.
+        """
         self.request = request
+        self.account = account if account is not None else request.user
     # Only supported
-    ACTIVITY_TYPES = ['Create', 'Follow', 'Accept', 'Undo', 'Like']
+    ACTIVITY_TYPES = ['Create', 'Follow', 'Accept', 'Undo', 'Like', 'Announce', 'Delete']
 
     def handler(self, data: ASDict):
         """
@@ -31,13 +45,15 @@ class Inbox(asactivity_component.CreateHandlerMixin,
         """
         self.original_activity = data
         try:
-            if ASActivity.objects.filter(data__id=data["id"]).count() == 0:
+            # It arrived, so it exists and its server is up.
+            fetcher_component.forget_failure(data["id"])
+            if not ASActivity.objects.filter(ap_id=data["id"]).exists():
                 self.check_actor(data)
                 if data["type"] in self.ACTIVITY_TYPES:
                     data = getattr(self, '%s_handler' %
                                    data["type"].lower())(data)
                     if data:
-                        self.save(data, self.request.user,
+                        self.save(data, self.account,
                                   asactivity_component.get_recipients(data))
                 else:
                     print(data)
@@ -55,15 +71,87 @@ class Inbox(asactivity_component.CreateHandlerMixin,
             if isinstance(data["actor"], dict):
                 actor_id = data["actor"]["id"]
                 data["actor"] = actor_id
-            if self.request.user is None:
+            if self.account is None:
                 raise asactivity_component.ActorNotMatchException(
                     actor_id=actor_id,
                     account_id=None)
-            if self.request.user.ap_id != actor_id:
+            if self.account.ap_id != actor_id:
                 raise asactivity_component.ActorNotMatchException(
                     actor_id=actor_id,
-                    account_id=self.request.user.ap_id)
+                    account_id=self.account.ap_id)
         except asactivity_component.ActorNotMatchException as exception:
             raise exception
         except:
             raise asactivity_component.ActorNotMatchException()
+
+
+def enqueue(request, data: ASDict) -> InboxItem:
+    """
+    Persist an incoming Activity and process it in a task.
+    Only the HTTP Signatures and the minimal shape are checked here.
+
+    returns the stored InboxItem; POSTing the same Activity twice
+    doesn't enqueue it again.
+    request -- the DRF request, authenticated by HTTP Signatures.
+    data -- the Activity dict parsed by DRF.
+    """
+    if not isinstance(data, dict) or not all(
+            isinstance(data.get(key, None), str) for key in ("id", "type")):
+        raise asactivity_component.InvalidFormException(data)
+    Inbox(request).check_actor(data)
+    item, created = InboxItem.objects.get_or_create(
+        ap_id=data["id"],
+        defaults={"data": data, "account": request.user})
+    if created:
+        task_component.enqueue_on_commit(
+            process,
+            item.id,
+            q_options={
+                "task_name": "process_inbox"
+            })
+    return item
+
+
+def process(item_id: int) -> None:
+    """
+    Do the side-effects of a stored InboxItem, at most once.
+    The item is claimed with one short UPDATE; the handler, with its remote
+    fetches, then runs without holding a lock or a transaction open.
+    A claim older than settings.RBQ_INBOX_LEASE seconds is taken over,
+    e.g. when the worker died.
+
+    item_id -- the primary key of the InboxItem.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, "RBQ_INBOX_LEASE", 300))
+    claimed = InboxItem.objects.filter(id=item_id, processed_at__isnull=True).filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - lease)
+    ).update(claimed_at=now)
+    if not claimed:
+        return
+    item = InboxItem.objects.select_related('account').get(id=item_id)
+    try:
+        Inbox(account=item.account).handler(item.data)
+    except Exception:
+        # A retry of the task may claim it again.
+        InboxItem.objects.filter(id=item_id).update(claimed_at=None)
+        raise
+    InboxItem.objects.filter(id=item_id).update(processed_at=timezone.now())
+
+
+def prune_inbox(batch_size: int = 10000) -> int:
+    """
+    Delete InboxItems processed more than settings.RBQ_INBOX_RETENTION
+    seconds ago; until then, the same Activity POSTed again is not processed twice.
+    Runs as a django-q scheduled task, see the setup_schedules command.
+
+    returns the number of InboxItems deleted.
+    batch_size -- the maximum number of InboxItems deleted in one run.
+    """
+    before = timezone.now() - timedelta(seconds=getattr(settings, "RBQ_INBOX_RETENTION", 86400))
+    ids = list(InboxItem.objects.filter(
+        processed_at__lt=before).values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    deleted, _rows = InboxItem.objects.filter(id__in=ids).delete()
+    return deleted
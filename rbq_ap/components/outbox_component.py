@@ -0,0 +1,106 @@
+"Functions related to outboxes of local Actors."
+
+import hashlib
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+from django.db.models import Count, Max, QuerySet
+
+from rbq_ap.components import cursor_component
+from rbq_backend.components import json_component
+from rbq_backend.models import Account, ASActivity, HIDDEN_STATUSES
+
+PAGE_SIZE = 20
+# Activities shown in outboxes, like other implementations do.
+OUTBOX_TYPES = ("Create", "Announce")
+# Visibilities shown in outboxes; see ASActivity.visibility.
+OUTBOX_VISIBILITIES = ("public", "unlisted")
+
+
+def public_activities(account: Account) -> QuerySet:
+    "Activities of an Actor addressed to the public, neither undone nor deleted."
+    return ASActivity.objects.filter(
+        visibility__in=OUTBOX_VISIBILITIES, type__in=OUTBOX_TYPES, actor=account
+    ).exclude(status__in=HIDDEN_STATUSES)
+
+
+def _page_activities(account: Account, cursor: Optional[str] = None) -> QuerySet:
+    "The activities of an outbox page, newest first, and the first one of the next page."
+    activities = public_activities(account).order_by('-created_at', '-id')
+    if cursor is not None:
+        activities = cursor_component.after(activities, cursor, descending=True)
+    return activities[:PAGE_SIZE + 1]
+
+
+def validators(account: Account, page: bool = False,
+               cursor: Optional[str] = None) -> Tuple[str, Optional[datetime], Optional[int]]:
+    """
+    Cache validators of an outbox, or of one of its pages.
+    The collection's ETag comes from one aggregate query: the number of public
+    activities, the newest one and the last update. A page's ETag comes from
+    the ids and update times of its own rows, without their data.
+
+    returns the ETag, the Last-Modified time and, for the collection only,
+    the number of activities.
+    account -- the local Account.
+    page -- whether a page is requested, rather than the collection.
+    cursor -- where the page starts, from the "next" link of the previous page.
+    """
+    total = None
+    if not page:
+        stats = public_activities(account).aggregate(
+            total=Count('id'), newest=Max('id'), last_modified=Max('updated_at'))
+        total, last_modified = stats["total"], stats["last_modified"]
+        parts = [account.outbox_uri, total, stats["newest"], last_modified]
+    else:
+        rows = list(_page_activities(account, cursor).values_list('id', 'updated_at'))
+        last_modified = max((updated_at for _id, updated_at in rows), default=None)
+        parts = [account.outbox_uri, cursor, last_modified] + [activity_id for activity_id, _updated_at in rows]
+    etag = '"%s"' % hashlib.sha1(":".join(map(str, parts)).encode('utf-8')).hexdigest()
+    return etag, last_modified, total
+
+
+def gen_outbox(account: Account, total: int) -> dict:
+    return {
+        "id": account.outbox_uri,
+        "type": "OrderedCollection",
+        "totalItems": total,
+        "first": account.outbox_uri + "?page=true"
+    }
+
+
+def _item(data: dict) -> dict:
+    "An activity embedded in a page, without what is only for this server."
+    return {key: value for key, value in data.items() if key not in ("@context", "rbqInternal")}
+
+
+def stream_outbox_page(account: Account, cursor: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Render a page of an outbox, newest first, one activity at a time.
+    The page is never built in memory; "next" comes last, once it's known.
+
+    account -- the local Account.
+    cursor -- where the page starts, from the "next" link of the previous page.
+    """
+    if cursor is not None:
+        page_id = "%s?cursor=%s" % (account.outbox_uri, cursor)
+    else:
+        page_id = account.outbox_uri + "?page=true"
+    head = json_component.dumps({
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "id": page_id,
+        "type": "OrderedCollectionPage",
+        "partOf": account.outbox_uri,
+    })
+    yield head[:-1] + b',"orderedItems":['
+
+    last = None
+    rows = _page_activities(account, cursor).values_list('created_at', 'id', 'data')
+    for index, (created_at, activity_id, data) in enumerate(rows.iterator()):
+        if index == PAGE_SIZE:
+            yield b'],"next":' + json_component.dumps("%s?cursor=%s" % (
+                account.outbox_uri, cursor_component.encode(*last))) + b'}'
+            return
+        yield (b"," if index else b"") + json_component.dumps(_item(data))
+        last = (created_at, activity_id)
+    yield b"]}"
@@ -0,0 +1,64 @@
+"Functions related to replies collections of local objects."
+
+from typing import Optional
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+from rbq_backend.models import ASObject
+from rbq_backend.models.asobject import POST_TYPES
+
+PAGE_SIZE = 20
+
+
+def replies_uri(aso: ASObject) -> str:
+    return aso.ap_id + "/replies"
+
+
+def has_replies(aso: ASObject) -> bool:
+    "Whether this server serves a replies collection for the object."
+    return aso.type in POST_TYPES and urlparse(aso.ap_id).hostname in settings.RBQ_LOCAL_DOMAINS
+
+
+def with_replies(aso: ASObject) -> dict:
+    "The object to render, linked to its replies collection if it has one."
+    if not has_replies(aso):
+        return aso.data
+    return dict(aso.data, replies=replies_uri(aso))
+
+
+def gen_replies(aso: ASObject) -> dict:
+    return {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "id": replies_uri(aso),
+        "type": "OrderedCollection",
+        "totalItems": aso.listed_replies_count,
+        "first": replies_uri(aso) + "?page=true"
+    }
+
+
+def gen_replies_page(aso: ASObject, cursor: Optional[str] = None) -> dict:
+    """
+    A page of public and unlisted replies, oldest first, read from the
+    (in_reply_to, id) index.
+
+    aso -- the local object.
+    cursor -- the id of the last reply of the previous page, from its "next" link.
+    """
+    replies = aso.listed_replies.order_by('id')
+    if cursor is not None:
+        replies = replies.filter(id__gt=int(cursor))
+        page_id = "%s?cursor=%s" % (replies_uri(aso), cursor)
+    else:
+        page_id = replies_uri(aso) + "?page=true"
+    rows = list(replies.values_list('id', 'ap_id')[:PAGE_SIZE + 1])
+    page = {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "id": page_id,
+        "type": "OrderedCollectionPage",
+        "partOf": replies_uri(aso),
+        "orderedItems": [ap_id for _id, ap_id in rows[:PAGE_SIZE]],
+    }
+    if len(rows) > PAGE_SIZE:
+        page["next"] = "%s?cursor=%d" % (replies_uri(aso), rows[PAGE_SIZE - 1][0])
+    return page
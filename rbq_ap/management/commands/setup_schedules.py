@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django_q.models import Schedule
+
+
+class Command(BaseCommand):
+    help = 'Create or update the periodic django-q tasks of RBQ.'
+
+    # name => (func, minutes between runs)
+    SCHEDULES = {
+        "retry_deliveries": ("rbq_ap.components.delivery_component.retry_deliveries", 1),
+        "prune_deliveries": ("rbq_ap.components.delivery_component.prune_deliveries", 60),
+        "refresh_stale_actors": ("rbq_ap.components.account_component.refresh_stale_actors", 10),
+        "trim_feeds": ("rbq_ap.components.feed_component.trim_feeds", 10),
+        "prune_inbox": ("rbq_ap.components.inbox_component.prune_inbox", 60),
+    }
+
+    def handle(self, *args, **options):
+        for name, (func, minutes) in self.SCHEDULES.items():
+            Schedule.objects.update_or_create(
+                name=name,
+                defaults={
+                    "func": func,
+                    "schedule_type": Schedule.MINUTES,
+                    "minutes": minutes,
+                    "repeats": -1,
+                })
+            self.stdout.write("%s: every %d minute(s)." % (name, minutes))
@@ -1,4 +1,15 @@
+from rest_framework.exceptions import ParseError
 from rest_framework.parsers import JSONParser
 
+from rbq_backend.components import json_component
+
+
 class ActivityStreamsParser(JSONParser):
-    media_type = 'application/activity+json'
\ No newline at end of file
+    "Parse ActivityStreams JSON with the codec of settings.RBQ_JSON_CODEC."
+    media_type = 'application/activity+json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return json_component.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % exc)
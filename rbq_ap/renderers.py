@@ -1,12 +1,24 @@
 from rest_framework.renderers import JSONRenderer
+from rbq_backend.components import json_component
 from rbq_backend.components.asobject_component import ASDict, filter_asobject_for_output
 
 
-class ActivityStreamsRenderer(JSONRenderer):
+class CodecJSONRenderer(JSONRenderer):
+    "Render JSON with the codec of settings.RBQ_JSON_CODEC."
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b''
+        return json_component.dumps(data)
+
+
+class ActivityStreamsRenderer(CodecJSONRenderer):
     "Render returned JSON as ActivityStreams."
     media_type = 'application/activity+json'
 
     def render(self, data: ASDict, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b''
         data = filter_asobject_for_output(data)
         return super().render(
             data,
@@ -18,6 +30,6 @@ class ActivityStreamsLDJSONRenderer(ActivityStreamsRenderer):
     media_type = 'application/ld+json; profile="https://www.w3.org/ns/activitystreams"'
 
 
-class WebfingerRenderer(JSONRenderer):
+class WebfingerRenderer(CodecJSONRenderer):
     "Render returned JSON as JRD."
     media_type = 'application/jrd+json'
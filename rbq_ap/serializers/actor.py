@@ -38,7 +38,7 @@ class ActorSerializer(serializers.ModelSerializer):
 
     def _set_fullname(self, instance, data):
         try:
-            domain = urlparse(data.get("id", instance.ap_id))
+            domain = urlparse(data.get("id", instance.ap_id)).hostname
             firstname = data.get("preferredUsername", instance.preferred_username)
             instance.username = "%s@%s" % (firstname, domain)
         except:
@@ -66,9 +66,12 @@ class ActorSerializer(serializers.ModelSerializer):
         return account
 
     def update(self, account, data):
-        self._set_fullname(account, data)
-        self._set_inbox(account, data)
-        self._set_public_key(account, data)
+        # The full username is set from the raw Actor document instead.
+        data.pop("preferred_username", None)
+        self._set_fullname(account, self.initial_data)
+        self._set_inbox(account, self.initial_data)
+        self._set_public_key(account, self.initial_data)
+        data["inbox_uri"] = account.inbox_uri
         return super().update(account, data)
 
     class Meta:
@@ -1,14 +1,17 @@
 from django.shortcuts import render, get_object_or_404
 from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import viewsets
 from rest_framework.decorators import api_view, action, renderer_classes, parser_classes, authentication_classes
 from rbq_backend.models import Account, ASObject, ASActivity
 from rbq_ap.serializers.actor import ActorSerializer
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rbq_backend.components import webfinger_component
+from rbq_backend.components import render_component, webfinger_component
 from rbq_backend.view_mixins import AtDomainViewMixin
-from rbq_ap.components import inbox_component, account_component
+from rbq_ap.components import inbox_component, account_component, asactivity_component, cursor_component, outbox_component, replies_component
 from rbq_ap.auth import APSignatureAuthentication
 
 from rbq_ap.renderers import ActivityStreamsRenderer, ActivityStreamsLDJSONRenderer, WebfingerRenderer
@@ -27,45 +30,130 @@ class ActorViewSet(AtDomainViewMixin, viewsets.ReadOnlyModelViewSet):
     lookup_field = 'username'
     lookup_value_regex = r'[^@\/]+'
 
+    def retrieve(self, request: Request, username: str = None) -> Response:
+        "The Actor, rendered once per version."
+        account = self.get_object()
+        rendered = render_component.get_or_render(
+            account.ap_id, account.updated_at,
+            lambda: ActivityStreamsRenderer().render(self.get_serializer(account).data))
+        return render_component.respond(request, rendered, request.accepted_media_type)
+
     @action(detail=True, methods=["POST"])
     def inbox(self, request: Request, username: str = None) -> Response:
-        inbox_component.Inbox(request).handler(request.data)
-        return Response(status=200)
+        return receive_activity(request)
 
     @action(detail=True, methods=["GET"])
     def followers(self, request: Request, username: str = None) -> Response:
         account = self.get_object()
-        if 'page' in request.query_params.keys():
-            page = int(request.query_params["page"])
-            return Response(data=account_component.gen_followers_paged(account, page=page))
+        if 'page' in request.query_params.keys() or 'cursor' in request.query_params.keys():
+            try:
+                return Response(data=account_component.gen_followers_paged(
+                    account,
+                    page=int(request.query_params["page"]) if "page" in request.query_params else None,
+                    cursor=request.query_params.get("cursor")))
+            except ValueError:
+                return Response(status=400)
         else:
             return Response(data=account_component.gen_followers(account))
 
     @action(detail=True, methods=["GET"])
     def following(self, request: Request, username: str = None) -> Response:
         account = self.get_object()
-        if 'page' in request.query_params.keys():
-            page = int(request.query_params["page"])
-            return Response(data=account_component.gen_following_paged(account, page=page))
+        if 'page' in request.query_params.keys() or 'cursor' in request.query_params.keys():
+            try:
+                return Response(data=account_component.gen_following_paged(
+                    account,
+                    page=int(request.query_params["page"]) if "page" in request.query_params else None,
+                    cursor=request.query_params.get("cursor")))
+            except ValueError:
+                return Response(status=400)
         else:
             return Response(data=account_component.gen_following(account))
 
+    @action(detail=True, methods=["GET"])
+    def outbox(self, request: Request, username: str = None) -> Response:
+        """
+        The public Activities of an Actor, newest first.
+        Pages are streamed, and conditional requests answered with 304.
+        """
+        account = self.get_object()
+        cursor = request.query_params.get("cursor")
+        if cursor is not None:
+            try:
+                cursor_component.decode(cursor)
+            except ValueError:
+                return Response(status=400)
+        page = 'page' in request.query_params.keys() or cursor is not None
+        etag, last_modified, total = outbox_component.validators(account, page, cursor)
+        timestamp = last_modified.timestamp() if last_modified is not None else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            if page:
+                response = StreamingHttpResponse(
+                    outbox_component.stream_outbox_page(account, cursor),
+                    content_type=ActivityStreamsRenderer.media_type)
+            else:
+                response = Response(data=outbox_component.gen_outbox(account, total))
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        return response
+
+
+def receive_activity(request: Request) -> Response:
+    """
+    Handle an Activity POSTed to an inbox.
+
+    With settings.RBQ_ASYNC_INBOX, the Activity is only verified and stored,
+    and its side-effects are done later by a django-q task.
+    """
+    if getattr(settings, "RBQ_ASYNC_INBOX", False):
+        try:
+            inbox_component.enqueue(request, request.data)
+        except asactivity_component.InvalidFormException:
+            return Response(status=400)
+        except asactivity_component.ActorNotMatchException:
+            return Response(status=401)
+        return Response(status=202)
+    inbox_component.Inbox(request).handler(request.data)
+    return Response(status=200)
+
 
 @api_view(["POST"])
 @parser_classes((ActivityStreamsParser,))
 def inbox_view(request: Request) -> Response:
-    inbox_component.Inbox(request).handler(request.data)
-    return Response(status=200)
+    return receive_activity(request)
 
 
 @api_view(['GET'])
+@renderer_classes((ActivityStreamsRenderer, ActivityStreamsLDJSONRenderer))
 def find_object_or_activity(req: Request, path: str) -> Response:
     uri = "%s://%s/%s" % ("https", req.headers['Host'], path)
+    if uri.endswith("/replies"):
+        return replies(req, uri[:-len("/replies")])
     try:
-        obj = ASObject.objects.get(data__id=uri)
-        return Response(data=obj.data)
+        version = ASObject.objects.filter(ap_id=uri).values_list('updated_at', flat=True).get()
     except ASObject.DoesNotExist:
         return Response(status=404)
+    rendered = render_component.get_or_render(
+        uri, version,
+        lambda: ActivityStreamsRenderer().render(
+            replies_component.with_replies(ASObject.objects.get(ap_id=uri))))
+    return render_component.respond(req, rendered, req.accepted_media_type)
+
+
+def replies(req: Request, uri: str) -> Response:
+    "The replies collection of a local object, or one of its pages."
+    aso = ASObject.objects.filter(ap_id=uri).first()
+    if aso is None or not replies_component.has_replies(aso):
+        return Response(status=404)
+    if 'page' in req.query_params.keys() or 'cursor' in req.query_params.keys():
+        try:
+            return Response(data=replies_component.gen_replies_page(
+                aso, cursor=req.query_params.get("cursor")))
+        except ValueError:
+            return Response(status=400)
+    return Response(data=replies_component.gen_replies(aso))
 
 
 @api_view(['GET'])
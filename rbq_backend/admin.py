@@ -6,3 +6,6 @@ admin.site.register(Account)
 admin.site.register(ASActivity)
 admin.site.register(ASObject)
 admin.site.register(Administration)
+admin.site.register(Delivery)
+admin.site.register(DomainHealth)
+admin.site.register(InteractionCount)
@@ -35,3 +35,33 @@ def get_asobject(obj: ASDict) -> Optional[models.ASObject]:
 
 def save_asobject(obj: ASDict) -> Optional[models.ASObject]:
     return models.ASObject.objects.save_asobject(obj)
+
+
+def resolve_thread(ap_id: str) -> None:
+    """
+    Finish resolving the context of an object saved with rbqInternal.threadPending,
+    then move everything in its provisional context to the resolved one.
+    Runs as a django-q task.
+
+    ap_id -- the object's ActivityPub id.
+    """
+    aso = models.ASObject.objects.get(ap_id=ap_id)
+    provisional = aso.data.get("context", None)
+    data = aso.data
+    del data["context"]
+    data = models.ASObject.objects.maybe_create_or_find_context(
+        data,
+        budget=getattr(settings, "RBQ_THREAD_RESOLVE_BACKGROUND_BUDGET", 30.0),
+        fallback_context=provisional)
+    # Give up on the parts of the thread still unreachable.
+    data.get("rbqInternal", {}).pop("threadPending", None)
+    aso.data = data
+    aso.save()
+    if provisional is not None and data["context"] != provisional:
+        for other in models.ASObject.objects.filter(context=provisional):
+            other.data["context"] = data["context"]
+            other.save()
+        models.ThreadNode.objects.filter(context=provisional).update(context=data["context"])
+        models.ASObject.objects.filter(ap_id=provisional, type="Context").delete()
+    # Under its parent, if it's known now.
+    models.ThreadNode.objects.index(aso)
@@ -0,0 +1,90 @@
+"Counters cached on Accounts (followers, following and posts) and on ASObjects (interactions and replies)."
+
+from typing import Optional
+
+from django.db.models import F, QuerySet
+from django.db.models.functions import Coalesce, Greatest
+
+COUNTERS = ("followers_count", "following_count", "posts_count")
+INTERACTION_COUNTERS = ("favourites_count", "reblogs_count", "replies_count", "listed_replies_count")
+# Activity type => its counter in InteractionCount.
+INTERACTION_TYPES = {"Like": "favourites_count", "Announce": "reblogs_count"}
+
+
+def adjust(accounts: QuerySet, **deltas: int) -> int:
+    """
+    Add to counters of Accounts in one UPDATE, without reading them first.
+    NULL counters count as 0, and counters never drop below 0.
+
+    returns the number of Accounts updated.
+    accounts -- the Account (or InteractionCount) QuerySet to update.
+    deltas -- counter name => the number to add, e.g. posts_count=-1.
+    """
+    updates = {}
+    for name, delta in deltas.items():
+        if name not in COUNTERS + INTERACTION_COUNTERS:
+            raise ValueError("Unknown counter: %s" % name)
+        if delta:
+            updates[name] = Greatest(Coalesce(F(name), 0) + delta, 0)
+    if not updates:
+        return 0
+    return accounts.update(**updates)
+
+
+def adjust_interactions(asobject, activity_type: str, delta: int) -> None:
+    """
+    Count a Like or Announce of an ASObject in, or out with delta=-1.
+
+    asobject -- the liked or announced ASObject.
+    activity_type -- "Like" or "Announce"; other types are ignored.
+    """
+    from rbq_backend.models import InteractionCount
+    name = INTERACTION_TYPES.get(activity_type, None)
+    if name is None:
+        return
+    InteractionCount.objects.get_or_create(asobject=asobject)
+    adjust(InteractionCount.objects.filter(asobject=asobject), **{name: delta})
+
+
+def adjust_replies(parent_ap_id: Optional[str], delta: int, reply_ap_id: Optional[str] = None) -> None:
+    """
+    Count a reply in, or out with delta=-1, on the ASObject it replies to;
+    also in listed_replies_count if its Create is public or unlisted.
+    Replies to unknown objects are counted once their parent is saved,
+    see ASObjectManager.save_asobject(); replies whose Create comes after
+    them are listed by count_listed_reply().
+
+    parent_ap_id -- the inReplyTo of the reply.
+    reply_ap_id -- the ActivityPub id of the reply.
+    """
+    from rbq_backend.models import ASActivity, ASObject, InteractionCount, LISTED_VISIBILITIES
+    if parent_ap_id is None:
+        return
+    parent_id = ASObject.objects.filter(ap_id=parent_ap_id).values_list('id', flat=True).first()
+    if parent_id is None:
+        return
+    listed = reply_ap_id is not None and ASActivity.objects.filter(
+        type="Create", object=reply_ap_id, visibility__in=LISTED_VISIBILITIES).exists()
+    InteractionCount.objects.get_or_create(asobject_id=parent_id)
+    adjust(InteractionCount.objects.filter(asobject_id=parent_id),
+           replies_count=delta, listed_replies_count=delta if listed else 0)
+
+
+def count_listed_reply(create) -> None:
+    """
+    Count a reply in listed_replies_count of its parent when its public or
+    unlisted Create is saved after the reply itself.
+
+    create -- the ASActivity just inserted.
+    """
+    from rbq_backend.models import ASObject, InteractionCount, LISTED_VISIBILITIES
+    if create.type != "Create" or create.visibility not in LISTED_VISIBILITIES or create.object is None:
+        return
+    parent_ap_id = ASObject.objects.filter(ap_id=create.object).values_list('in_reply_to', flat=True).first()
+    if parent_ap_id is None:
+        return
+    parent_id = ASObject.objects.filter(ap_id=parent_ap_id).values_list('id', flat=True).first()
+    if parent_id is None:
+        return
+    InteractionCount.objects.get_or_create(asobject_id=parent_id)
+    adjust(InteractionCount.objects.filter(asobject_id=parent_id), listed_replies_count=1)
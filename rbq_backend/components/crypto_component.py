@@ -1,8 +1,15 @@
 from typing import Union
 
+from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives import hashes, serialization
+
+
+HASHES = {
+    "sha256": hashes.SHA256,
+    "sha512": hashes.SHA512,
+}
 
 
 class Key:
@@ -34,6 +41,19 @@ class PublicKey(Key):
         )
         return cls(key)
 
+    def verify(self, signature: bytes, data: bytes, algorithm: str = "rsa-sha256") -> bool:
+        """
+        Verify an RSA PKCS#1 v1.5 signature.
+
+        algorithm -- "rsa-sha256", "rsa-sha512" or "hs2019" (treated as rsa-sha256).
+        """
+        hash_name = algorithm.split("-")[-1] if algorithm.startswith("rsa-") else "sha256"
+        try:
+            self.key.verify(signature, data, padding.PKCS1v15(), HASHES[hash_name]())
+            return True
+        except (InvalidSignature, KeyError, ValueError):
+            return False
+
     def to_pem(self) -> str:
         return self.key.public_bytes(
             encoding=serialization.Encoding.PEM,
@@ -69,6 +89,10 @@ class PrivateKey(Key):
             encryption_algorithm=serialization.NoEncryption()
         ).decode('utf-8')
 
+    def sign(self, data: bytes, algorithm: str = "rsa-sha256") -> bytes:
+        "Sign data with RSA PKCS#1 v1.5."
+        return self.key.sign(data, padding.PKCS1v15(), HASHES[algorithm.split("-")[-1]]())
+
     def public_key(self) -> PublicKey:
         "Get public key from a private key pair."
         return PublicKey(self.key.public_key())
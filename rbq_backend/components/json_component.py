@@ -0,0 +1,77 @@
+"""
+JSON encoding and decoding of ActivityStreams documents.
+
+settings.RBQ_JSON_CODEC picks the backend: "orjson", "json" (the standard
+library) or "auto" for orjson when it is installed. The standard library is
+always the fallback.
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, Tuple, Union
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(
+        obj, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+
+def _json_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+_encoder = JSONEncoder()
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    try:
+        return orjson.dumps(obj, default=_encoder.default)
+    except TypeError:
+        # e.g. integers beyond 64 bits, or non-str keys.
+        return _json_dumps(obj)
+
+
+# Integers orjson can't read exactly (beyond 64 bits) have 19 digits or more.
+_LONG_NUMBER = re.compile(r"[0-9]{19}")
+_LONG_NUMBER_BYTES = re.compile(rb"[0-9]{19}")
+
+
+def _orjson_loads(data: Union[bytes, str]) -> Any:
+    pattern = _LONG_NUMBER if isinstance(data, str) else _LONG_NUMBER_BYTES
+    if pattern.search(data):
+        # orjson would read them as floats; long digit runs in strings also land here.
+        return _json_loads(data)
+    return orjson.loads(data)
+
+
+CODECS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]] = {
+    "json": (_json_dumps, _json_loads),
+}
+if orjson is not None:
+    CODECS["orjson"] = (_orjson_dumps, _orjson_loads)
+
+
+def get_codec() -> Tuple[Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]:
+    "Returns the (dumps, loads) functions of the configured codec."
+    name = getattr(settings, "RBQ_JSON_CODEC", "auto")
+    if name == "auto":
+        name = "orjson" if "orjson" in CODECS else "json"
+    return CODECS.get(name, CODECS["json"])
+
+
+def dumps(obj: Any) -> bytes:
+    "Encode to compact UTF-8 JSON."
+    return get_codec()[0](obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    "Decode JSON; raises ValueError if malformed."
+    return get_codec()[1](data)
@@ -0,0 +1,59 @@
+"Rendered response bodies of objects and Actors, cached by id and version."
+
+import hashlib
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class Rendered(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+def _cache():
+    return caches[getattr(settings, "RBQ_RENDER_CACHE", "default")]
+
+
+def _key(ap_id: str, version: datetime) -> str:
+    return "rbq:rendered:%s:%s" % (
+        hashlib.sha1(ap_id.encode('utf-8')).hexdigest(), version.isoformat())
+
+
+def get_or_render(ap_id: str, version: datetime, render: Callable[[], bytes]) -> Rendered:
+    """
+    Get the rendered body of an object, rendering it on a cache miss.
+
+    ap_id -- the ActivityPub id of the object or Actor.
+    version -- its updated_at; a new version is rendered again.
+    render -- returns the response body.
+    """
+    key = _key(ap_id, version)
+    rendered = _cache().get(key)
+    if rendered is None:
+        body = render()
+        rendered = (body, '"%s"' % hashlib.sha1(body).hexdigest())
+        _cache().set(key, rendered, getattr(settings, "RBQ_RENDER_CACHE_TTL", 86400))
+    return Rendered(rendered[0], rendered[1], version)
+
+
+def forget(ap_id: str, version: datetime) -> None:
+    "Drop a rendered version, e.g. before it's replaced."
+    _cache().delete(_key(ap_id, version))
+
+
+def respond(request, rendered: Rendered, content_type: str) -> HttpResponse:
+    "Returns the rendered body, or 304 if the client has it already."
+    timestamp = rendered.last_modified.timestamp()
+    response = get_conditional_response(request, etag=rendered.etag, last_modified=timestamp)
+    if response is None:
+        response = HttpResponse(rendered.body, content_type=content_type)
+    response["ETag"] = rendered.etag
+    response["Last-Modified"] = http_date(timestamp)
+    return response
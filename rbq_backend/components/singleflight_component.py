@@ -0,0 +1,57 @@
+"Let only one caller at a time do the work for a key, e.g. fetching a remote object."
+
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+from django.db import connection
+
+_locks: Dict[str, Tuple[threading.RLock, int]] = {}
+_locks_lock = threading.Lock()
+
+
+def _advisory_key(key: str) -> int:
+    "Map a key to the signed 64-bit integer used by PostgreSQL advisory locks."
+    return int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+@contextmanager
+def single_flight(key: str) -> Iterator[None]:
+    """
+    Run the block for a key in one thread of all processes at a time.
+
+    Threads of this process wait on a lock of their own; other workers wait
+    on a PostgreSQL advisory lock. Callers that waited should look for the
+    result saved by the first one before doing the work again.
+
+    Inside a transaction, the advisory lock is held until it commits or rolls
+    back, so waiters see the rows saved by the first caller, and an error
+    in the block can't leave the lock taken on the connection.
+
+    key -- e.g. "account:<ap_id>".
+    """
+    with _locks_lock:
+        lock, waiters = _locks.get(key, (threading.RLock(), 0))
+        _locks[key] = (lock, waiters + 1)
+    try:
+        with lock:
+            if connection.in_atomic_block:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [_advisory_key(key)])
+                yield
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_lock(%s)", [_advisory_key(key)])
+                try:
+                    yield
+                finally:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_advisory_unlock(%s)", [_advisory_key(key)])
+    finally:
+        with _locks_lock:
+            lock, waiters = _locks[key]
+            if waiters <= 1:
+                del _locks[key]
+            else:
+                _locks[key] = (lock, waiters - 1)
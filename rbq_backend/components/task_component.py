@@ -0,0 +1,22 @@
+"Functions related to django-q tasks."
+
+from typing import Any
+
+from django.db import transaction
+from django_q.conf import Conf
+from django_q.tasks import async_task
+
+
+def enqueue_on_commit(func: Any, *args, **kwargs) -> None:
+    """
+    Enqueue a django-q task once the current transaction commits, so that
+    workers see the rows it wrote; right away outside of transactions.
+    A sync cluster (e.g. in tests) runs the task at once, in this transaction.
+
+    func -- the task function, or its dotted path.
+    args, kwargs -- passed to async_task().
+    """
+    if Conf.SYNC:
+        async_task(func, *args, **kwargs)
+    else:
+        transaction.on_commit(lambda: async_task(func, *args, **kwargs))
@@ -0,0 +1,42 @@
+from django.contrib.postgres.fields.jsonb import KeyTextTransform
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from rbq_backend.models import ASActivity, ASObject
+
+
+class Command(BaseCommand):
+    help = 'Fill the ap_id column of ASObjects and ASActivities from their data["id"].'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size: int = 1000, **options):
+        for model in (ASObject, ASActivity):
+            filled = self.backfill(model, batch_size)
+            self.stdout.write("%s: %d rows filled." % (model.__name__, filled))
+
+    def backfill(self, model, batch_size: int) -> int:
+        "Update rows in primary key ranges, so every batch is a short transaction."
+        filled = 0
+        last_pk = 0
+        while True:
+            pks = list(model.objects.filter(pk__gt=last_pk, ap_id__isnull=True)
+                       .order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return filled
+            last_pk = pks[-1]
+            batch = model.objects.filter(pk__in=pks, ap_id__isnull=True)
+            try:
+                with transaction.atomic():
+                    filled += batch.update(ap_id=KeyTextTransform("id", "data"))
+            except IntegrityError:
+                # Duplicated ids in the JSON data: keep the first row only.
+                for row in batch.only('pk', 'data'):
+                    try:
+                        with transaction.atomic():
+                            filled += model.objects.filter(pk=row.pk).update(
+                                ap_id=row.data.get("id", None))
+                    except IntegrityError:
+                        self.stderr.write("%s %d: duplicated id %s" % (
+                            model.__name__, row.pk, row.data.get("id", None)))
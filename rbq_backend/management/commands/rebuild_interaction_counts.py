@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from rbq_backend.components.counter_component import INTERACTION_TYPES
+from rbq_backend.models import ASActivity, ASObject, InteractionCount, LISTED_VISIBILITIES
+
+
+class Command(BaseCommand):
+    help = 'Recount favourites, reblogs and (listed) replies of ASObjects from the Like and Announce Activities and the replies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size: int = 1000, **options):
+        fixed = 0
+        last_pk = 0
+        while True:
+            objects = list(ASObject.objects.filter(pk__gt=last_pk).order_by('pk')
+                           .values_list('pk', 'ap_id')[:batch_size])
+            if not objects:
+                break
+            last_pk = objects[-1][0]
+            fixed += self.rebuild(objects)
+        self.stdout.write("%d objects fixed." % fixed)
+
+    def rebuild(self, objects) -> int:
+        "Count a batch of ASObjects with two queries, then save the differing counts."
+        ap_ids = [ap_id for _pk, ap_id in objects]
+        counts = {
+            ap_id: (favourites, reblogs)
+            for ap_id, favourites, reblogs in ASActivity.objects.filter(
+                object__in=ap_ids,
+                type__in=INTERACTION_TYPES.keys(),
+                status="normal"
+            ).values('object').annotate(
+                favourites=Count('id', filter=Q(type="Like")),
+                reblogs=Count('id', filter=Q(type="Announce"))
+            ).values_list('object', 'favourites', 'reblogs')}
+        listed = ASActivity.objects.filter(
+            type="Create", visibility__in=LISTED_VISIBILITIES).values('object')
+        replies = {
+            in_reply_to: (n, n_listed)
+            for in_reply_to, n, n_listed in ASObject.objects.filter(
+                in_reply_to__in=ap_ids
+            ).values('in_reply_to').annotate(
+                n=Count('id'),
+                n_listed=Count('id', filter=Q(ap_id__in=listed))
+            ).values_list('in_reply_to', 'n', 'n_listed')}
+        stored = {
+            asobject_id: (favourites, reblogs, replies_count, listed_replies_count)
+            for asobject_id, favourites, reblogs, replies_count, listed_replies_count in
+            InteractionCount.objects.filter(
+                asobject__in=[pk for pk, _ap_id in objects]
+            ).values_list('asobject', 'favourites_count', 'reblogs_count',
+                          'replies_count', 'listed_replies_count')}
+        fixed = 0
+        for pk, ap_id in objects:
+            favourites, reblogs = counts.get(ap_id, (0, 0))
+            replies_count, listed_replies_count = replies.get(ap_id, (0, 0))
+            if stored.get(pk, (0, 0, 0, 0)) != (favourites, reblogs, replies_count, listed_replies_count):
+                InteractionCount.objects.update_or_create(
+                    asobject_id=pk,
+                    defaults={"favourites_count": favourites, "reblogs_count": reblogs,
+                              "replies_count": replies_count,
+                              "listed_replies_count": listed_replies_count})
+                fixed += 1
+        return fixed
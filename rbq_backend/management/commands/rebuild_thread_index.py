@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from rbq_backend.models import ASObject, ThreadNode
+from rbq_backend.models.asobject import POST_TYPES
+
+
+class Command(BaseCommand):
+    help = 'Add every ASObject in a thread to the thread index, e.g. after upgrading.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size: int = 1000, **options):
+        indexed = 0
+        last_pk = 0
+        while True:
+            objects = list(ASObject.objects.filter(
+                pk__gt=last_pk, type__in=POST_TYPES, context__isnull=False
+            ).order_by('pk')[:batch_size])
+            if not objects:
+                break
+            last_pk = objects[-1].pk
+            # Replies indexed before their parents are moved under them later.
+            for aso in objects:
+                indexed += ThreadNode.objects.index(aso) is not None
+        self.stdout.write("%d objects indexed." % indexed)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from rbq_backend.components import counter_component
+from rbq_backend.models import Account, ASObject, Follow
+from rbq_backend.models.asobject import POST_TYPES
+
+
+class Command(BaseCommand):
+    help = 'Recount followers, following and posts of Accounts, fixing the drifted counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size: int = 1000, **options):
+        fixed = 0
+        last_pk = 0
+        while True:
+            accounts = list(Account.objects.filter(pk__gt=last_pk).order_by('pk').only(
+                'pk', 'ap_id', *counter_component.COUNTERS)[:batch_size])
+            if not accounts:
+                break
+            last_pk = accounts[-1].pk
+            fixed += self.reconcile(accounts)
+        self.stdout.write("%d accounts fixed." % fixed)
+
+    def reconcile(self, accounts) -> int:
+        "Count a batch of Accounts with one query per counter, then save the differing ones."
+        ids = [account.pk for account in accounts]
+        ap_ids = [account.ap_id for account in accounts]
+        # Follow rows are stored with followee as the following side.
+        followers = dict(Follow.objects.filter(follower__in=ids).values('follower')
+                         .annotate(n=Count('id')).values_list('follower', 'n'))
+        following = dict(Follow.objects.filter(followee__in=ids).values('followee')
+                         .annotate(n=Count('id')).values_list('followee', 'n'))
+        posts = dict(ASObject.objects.filter(type__in=POST_TYPES, attributed_to__in=ap_ids)
+                     .values('attributed_to').annotate(n=Count('id'))
+                     .values_list('attributed_to', 'n'))
+        fixed = 0
+        for account in accounts:
+            counts = {
+                "followers_count": followers.get(account.pk, 0),
+                "following_count": following.get(account.pk, 0),
+                "posts_count": posts.get(account.ap_id, 0),
+            }
+            drifted = {name: count for name, count in counts.items()
+                       if getattr(account, name) != count}
+            if drifted:
+                Account.objects.filter(pk=account.pk).update(**drifted)
+                fixed += 1
+        return fixed
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.5 on 2019-10-02 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0017_auto_20190927_0424'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asactivity',
+            name='ap_id',
+            field=models.TextField(null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='asobject',
+            name='ap_id',
+            field=models.TextField(null=True, unique=True),
+        ),
+    ]
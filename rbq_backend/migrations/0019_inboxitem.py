@@ -0,0 +1,31 @@
+# Generated by Django 2.2.5 on 2019-10-03 11:40
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0018_ap_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ap_id', models.TextField(unique=True)),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField()),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('account', models.ForeignKey(help_text='The Actor verified by HTTP Signatures.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
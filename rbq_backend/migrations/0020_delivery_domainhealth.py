@@ -0,0 +1,47 @@
+# Generated by Django 2.2.5 on 2019-10-05 09:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0019_inboxitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DomainHealth',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.TextField(unique=True)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('opened_until', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Delivery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('inbox', models.TextField()),
+                ('host', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('delivered', 'Delivered'), ('failed', 'Failed')], default='pending', max_length=50)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='rbq_backend.ASActivity')),
+            ],
+            options={
+                'verbose_name_plural': 'Deliveries',
+                'unique_together': {('activity', 'inbox')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='delivery_status_next_idx'),
+        ),
+    ]
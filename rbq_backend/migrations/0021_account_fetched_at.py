@@ -0,0 +1,28 @@
+# Generated by Django 2.2.5 on 2019-10-06 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0020_delivery_domainhealth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='etag',
+            field=models.TextField(blank=True, default='', help_text='ETag of the last fetched Actor document'),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='last_modified',
+            field=models.TextField(blank=True, default='', help_text='Last-Modified of the last fetched Actor document'),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='fetched_at',
+            field=models.DateTimeField(db_index=True, help_text='When the remote Actor was last fetched, or a refresh was last tried', null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.5 on 2019-10-07 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0021_account_fetched_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', 'created_at', 'id'], name='follow_followee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', 'created_at', 'id'], name='follow_follower_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.5 on 2019-10-08 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0022_follow_created_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asactivity',
+            index=models.Index(fields=['actor', 'created_at', 'id'], name='asactivity_actor_created_idx'),
+        ),
+    ]
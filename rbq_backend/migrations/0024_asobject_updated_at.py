@@ -0,0 +1,20 @@
+# Generated by Django 2.2.5 on 2019-10-09 10:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0023_asactivity_actor_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asobject',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
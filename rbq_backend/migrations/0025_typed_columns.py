@@ -0,0 +1,62 @@
+# Generated by Django 2.2.5 on 2019-10-10 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0024_asobject_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asobject',
+            name='type',
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asobject',
+            name='attributed_to',
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asobject',
+            name='in_reply_to',
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asobject',
+            name='context',
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asobject',
+            name='published',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asactivity',
+            name='type',
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asactivity',
+            name='object',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='asactivity',
+            name='published',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='asactivity',
+            name='status',
+            field=models.TextField(help_text='data["rbqInternal"]["status"]', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='asactivity',
+            index=models.Index(fields=['object', 'type'], name='asactivity_object_type_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 2.2.5 on 2019-10-10 15:40
+
+from django.db import migrations
+from django.utils.dateparse import parse_datetime
+
+BATCH_SIZE = 1000
+
+
+def get_id(value):
+    if isinstance(value, dict):
+        return value.get("id", None)
+    if isinstance(value, str):
+        return value
+    return None
+
+
+def published(data):
+    try:
+        return parse_datetime(data.get("published", None) or "")
+    except (TypeError, ValueError):
+        return None
+
+
+def object_columns(data):
+    return {
+        "type": data.get("type", None),
+        "attributed_to": get_id(data.get("attributedTo", data.get("actor", None))),
+        "in_reply_to": get_id(data.get("inReplyTo", None)),
+        "context": get_id(data.get("context", None)),
+        "published": published(data),
+    }
+
+
+def activity_columns(data):
+    internal = data.get("rbqInternal", {})
+    return {
+        "type": data.get("type", None),
+        "object": get_id(data.get("object", None)),
+        "published": published(data),
+        "status": internal.get("status", None) if isinstance(internal, dict) else None,
+    }
+
+
+def backfill(model, columns):
+    "Fill the typed columns of every row of model from its data."
+    last_pk = 0
+    while True:
+        rows = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'data')[:BATCH_SIZE])
+        if not rows:
+            return
+        last_pk = rows[-1].pk
+        for row in rows:
+            for name, value in columns(row.data).items():
+                setattr(row, name, value)
+        fields = list(columns({}).keys())
+        model.objects.bulk_update(rows, fields)
+
+
+def backfill_typed_columns(apps, schema_editor):
+    backfill(apps.get_model('rbq_backend', 'ASObject'), object_columns)
+    backfill(apps.get_model('rbq_backend', 'ASActivity'), activity_columns)
+
+
+class Migration(migrations.Migration):
+    # Data migrations on ASObject and ASActivity walk the table in primary
+    # key ranges of BATCH_SIZE rows and run outside a transaction, so each
+    # bulk_update commits by itself: rows are locked one batch at a time
+    # instead of until the whole table is done, and an interrupted run can
+    # simply be started again. Later backfills follow the same pattern.
+    atomic = False
+
+    dependencies = [
+        ('rbq_backend', '0025_typed_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_typed_columns, migrations.RunPython.noop),
+    ]
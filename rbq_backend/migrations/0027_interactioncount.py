@@ -0,0 +1,24 @@
+# Generated by Django 2.2.5 on 2019-10-11 09:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0026_backfill_typed_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('favourites_count', models.PositiveIntegerField(default=0)),
+                ('reblogs_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('asobject', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='interaction_count', to='rbq_backend.ASObject')),
+            ],
+        ),
+    ]
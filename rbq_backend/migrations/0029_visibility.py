@@ -0,0 +1,31 @@
+# Generated by Django 2.2.5 on 2019-10-11 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0028_feeditem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asactivity',
+            name='local',
+            field=models.BooleanField(default=False, help_text='Whether the actor is a local Account'),
+        ),
+        migrations.AddField(
+            model_name='asactivity',
+            name='visibility',
+            field=models.TextField(choices=[('public', 'Public'), ('unlisted', 'Unlisted'), ('private', 'Followers only'), ('direct', 'Direct')], help_text='From to and cc, see get_visibility()', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='asactivity',
+            index=models.Index(condition=models.Q(('type', 'Create'), ('visibility', 'public')), fields=['id'], name='asactivity_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asactivity',
+            index=models.Index(condition=models.Q(('local', True), ('type', 'Create'), ('visibility', 'public')), fields=['id'], name='asactivity_local_public_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.5 on 2019-10-11 15:20
+
+from django.conf import settings
+from django.db import migrations
+
+BATCH_SIZE = 1000
+PUBLIC_IDS = {"https://www.w3.org/ns/activitystreams#Public", "as:Public", "Public"}
+
+
+def addressed(data, field):
+    value = data.get(field, [])
+    result = set()
+    for item in value if isinstance(value, list) else [value]:
+        result.add(item.get("id", None) if isinstance(item, dict) else item)
+    return result
+
+
+def visibility(data, followers_uri):
+    to, cc = addressed(data, "to"), addressed(data, "cc")
+    if to & PUBLIC_IDS:
+        return "public"
+    if cc & PUBLIC_IDS:
+        return "unlisted"
+    if followers_uri in to | cc:
+        return "private"
+    return "direct"
+
+
+def backfill_visibility(apps, schema_editor):
+    "Fill visibility and local from the addressing and the actor of every activity."
+    ASActivity = apps.get_model('rbq_backend', 'ASActivity')
+    last_pk = 0
+    while True:
+        rows = list(ASActivity.objects.filter(pk__gt=last_pk).order_by('pk').select_related(
+            'actor').only('pk', 'data', 'actor__username', 'actor__followers_uri')[:BATCH_SIZE])
+        if not rows:
+            return
+        last_pk = rows[-1].pk
+        for row in rows:
+            row.visibility = visibility(row.data, row.actor.followers_uri)
+            row.local = row.actor.username.split("@")[-1] in settings.RBQ_LOCAL_DOMAINS
+        ASActivity.objects.bulk_update(rows, ["visibility", "local"])
+
+
+class Migration(migrations.Migration):
+    # Batched like 0026.
+    atomic = False
+
+    dependencies = [
+        ('rbq_backend', '0029_visibility'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_visibility, migrations.RunPython.noop),
+    ]
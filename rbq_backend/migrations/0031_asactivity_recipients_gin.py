@@ -0,0 +1,18 @@
+# Generated by Django 2.2.5 on 2019-10-12 10:05
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0030_backfill_visibility'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asactivity',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['recipients'], name='asactivity_recipients_gin'),
+        ),
+    ]
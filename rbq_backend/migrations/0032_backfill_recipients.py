@@ -0,0 +1,57 @@
+# Generated by Django 2.2.5 on 2019-10-12 10:10
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+PUBLIC_IDS = {PUBLIC, "as:Public", "Public"}
+
+
+def get_id(value):
+    if isinstance(value, dict):
+        return value.get("id", None)
+    if isinstance(value, str):
+        return value
+    return None
+
+
+def recipients(data, depth=1):
+    "Like get_recipients(), without looking up objects stored apart."
+    result = {get_id(data.get("actor", None))}
+    for field in ("to", "cc", "bcc", "audience"):
+        value = data.get(field, [])
+        result.update(get_id(item) for item in (value if isinstance(value, list) else [value]))
+    if depth > 0 and isinstance(data.get("object", None), dict):
+        result.update(recipients(data["object"], depth - 1))
+    return {PUBLIC if ap_id in PUBLIC_IDS else ap_id for ap_id in result} - {None}
+
+
+def backfill_recipients(apps, schema_editor):
+    """
+    Activities sent by local Accounts stored inbox URLs as recipients;
+    store who they are addressed to instead, like received ones.
+    """
+    ASActivity = apps.get_model('rbq_backend', 'ASActivity')
+    last_pk = 0
+    while True:
+        rows = list(ASActivity.objects.filter(pk__gt=last_pk, local=True).order_by('pk').only(
+            'pk', 'data', 'recipients')[:BATCH_SIZE])
+        if not rows:
+            return
+        last_pk = rows[-1].pk
+        for row in rows:
+            row.recipients = sorted(recipients(row.data))
+        ASActivity.objects.bulk_update(rows, ["recipients"])
+
+
+class Migration(migrations.Migration):
+    # Batched like 0026.
+    atomic = False
+
+    dependencies = [
+        ('rbq_backend', '0031_asactivity_recipients_gin'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_recipients, migrations.RunPython.noop),
+    ]
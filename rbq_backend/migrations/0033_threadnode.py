@@ -0,0 +1,29 @@
+# Generated by Django 2.2.5 on 2019-10-12 14:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0032_backfill_recipients'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadNode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('context', models.TextField()),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('path', models.TextField()),
+                ('asobject', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='thread_node', to='rbq_backend.ASObject')),
+                ('parent', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='rbq_backend.ASObject')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='threadnode',
+            index=models.Index(fields=['context', 'path'], name='threadnode_context_path_idx', opclasses=['text_pattern_ops', 'text_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.5 on 2019-10-12 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0033_threadnode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interactioncount',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='asobject',
+            index=models.Index(fields=['in_reply_to', 'id'], name='asobject_in_reply_to_id_idx'),
+        ),
+        migrations.AlterField(
+            model_name='asobject',
+            name='in_reply_to',
+            field=models.TextField(null=True),
+        ),
+    ]
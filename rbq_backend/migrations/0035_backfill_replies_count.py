@@ -0,0 +1,38 @@
+# Generated by Django 2.2.5 on 2019-10-12 18:30
+
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+
+def backfill_replies_count(apps, schema_editor):
+    "Store the number of replies of every ASObject which has some."
+    ASObject = apps.get_model('rbq_backend', 'ASObject')
+    InteractionCount = apps.get_model('rbq_backend', 'InteractionCount')
+    last_pk = 0
+    while True:
+        objects = list(ASObject.objects.filter(pk__gt=last_pk).order_by('pk')
+                       .values_list('pk', 'ap_id')[:BATCH_SIZE])
+        if not objects:
+            return
+        last_pk = objects[-1][0]
+        replies = dict(ASObject.objects.filter(in_reply_to__in=[ap_id for _pk, ap_id in objects])
+                       .values('in_reply_to').annotate(n=Count('id')).values_list('in_reply_to', 'n'))
+        for pk, ap_id in objects:
+            if replies.get(ap_id, 0):
+                InteractionCount.objects.update_or_create(
+                    asobject_id=pk, defaults={"replies_count": replies[ap_id]})
+
+
+class Migration(migrations.Migration):
+    # Batched like 0026.
+    atomic = False
+
+    dependencies = [
+        ('rbq_backend', '0034_replies_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_replies_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.5 on 2019-10-14 10:05
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def mark_deleted_creates(apps, schema_editor):
+    "Mark the Creates of objects deleted before this migration as deleted."
+    ASActivity = apps.get_model('rbq_backend', 'ASActivity')
+    ASObject = apps.get_model('rbq_backend', 'ASObject')
+    creates = ASActivity.objects.filter(
+        type="Create", object__in=ASObject.objects.filter(type="Tombstone").values('ap_id')
+    ).exclude(status="deleted")
+    last_pk = 0
+    while True:
+        rows = list(creates.filter(pk__gt=last_pk).order_by('pk').only('pk', 'data')[:BATCH_SIZE])
+        if not rows:
+            return
+        last_pk = rows[-1].pk
+        for row in rows:
+            internal = row.data.get("rbqInternal", None)
+            row.data["rbqInternal"] = dict(internal if isinstance(internal, dict) else {}, status="deleted")
+            row.status = "deleted"
+        ASActivity.objects.bulk_update(rows, ["data", "status"])
+
+
+class Migration(migrations.Migration):
+    # Batched like 0026.
+    atomic = False
+
+    dependencies = [
+        ('rbq_backend', '0035_backfill_replies_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_deleted_creates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='asactivity',
+            name='asactivity_public_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='asactivity',
+            name='asactivity_local_public_idx',
+        ),
+        migrations.AddIndex(
+            model_name='asactivity',
+            index=models.Index(condition=models.Q(('type', 'Create'), ('visibility', 'public'), models.Q(('status__in', ('canceled', 'deleted')), _negated=True)), fields=['id'], name='asactivity_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asactivity',
+            index=models.Index(condition=models.Q(('type', 'Create'), ('visibility', 'public'), models.Q(('status__in', ('canceled', 'deleted')), _negated=True), ('local', True)), fields=['id'], name='asactivity_local_public_idx'),
+        ),
+    ]
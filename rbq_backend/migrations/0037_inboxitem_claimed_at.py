@@ -0,0 +1,18 @@
+# Generated by Django 2.2.5 on 2019-10-14 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0036_public_timeline_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboxitem',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a task started processing it.', null=True),
+        ),
+    ]
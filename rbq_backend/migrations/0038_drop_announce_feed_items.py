@@ -0,0 +1,20 @@
+# Generated by Django 2.2.5 on 2019-10-14 17:02
+
+from django.db import migrations
+
+
+def drop_announce_feed_items(apps, schema_editor):
+    "Home timelines don't show Announces until they can be rendered as reblogs."
+    FeedItem = apps.get_model('rbq_backend', 'FeedItem')
+    FeedItem.objects.filter(activity__type="Announce").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbq_backend', '0037_inboxitem_claimed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_announce_feed_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.5 on 2019-10-14 18:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+
+def backfill_listed_replies_count(apps, schema_editor):
+    "Count the replies whose Create is public or unlisted, for parents with replies."
+    ASActivity = apps.get_model('rbq_backend', 'ASActivity')
+    ASObject = apps.get_model('rbq_backend', 'ASObject')
+    InteractionCount = apps.get_model('rbq_backend', 'InteractionCount')
+    listed = ASActivity.objects.filter(type="Create", visibility__in=("public", "unlisted")).values('object')
+    last_pk = 0
+    while True:
+        counts = list(InteractionCount.objects.filter(pk__gt=last_pk, replies_count__gt=0)
+                      .order_by('pk').values_list('pk', 'asobject__ap_id')[:BATCH_SIZE])
+        if not counts:
+            return
+        last_pk = counts[-1][0]
+        replies = dict(ASObject.objects.filter(
+            in_reply_to__in=[ap_id for _pk, ap_id in counts], ap_id__in=listed
+        ).values('in_reply_to').annotate(n=Count('id')).values_list('in_reply_to', 'n'))
+        for pk, ap_id in counts:
+            if replies.get(ap_id, 0):
+                InteractionCount.objects.filter(pk=pk).update(listed_replies_count=replies[ap_id])
+
+
+class Migration(migrations.Migration):
+    # Batched like 0026.
+    atomic = False
+
+    dependencies = [
+        ('rbq_backend', '0038_drop_announce_feed_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interactioncount',
+            name='listed_replies_count',
+            field=models.PositiveIntegerField(default=0, help_text='Replies whose Create is public or unlisted'),
+        ),
+        migrations.RunPython(backfill_listed_replies_count, migrations.RunPython.noop),
+    ]
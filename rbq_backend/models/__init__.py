@@ -3,4 +3,9 @@ from .administration import *
 from .asactivity import *
 from .asobject import *
 from .base_models import *
+from .delivery import *
+from .feed_item import *
 from .follow import *
+from .inbox_item import *
+from .interaction_count import *
+from .thread_node import *
@@ -4,7 +4,7 @@ from django.contrib.postgres.fields import JSONField, ArrayField, CITextField
 from django.contrib.auth.models import AbstractBaseUser, UserManager, PermissionsMixin
 from django.conf import settings
 
-from rbq_backend.components import crypto_component
+from rbq_backend.components import counter_component, crypto_component, render_component
 
 from .base_models import ARModel
 from .administration import Administration
@@ -45,6 +45,20 @@ class AccountManager(UserManager, APActorManagerMixin):
     def get_by_natural_key(self, username):
         return self.get(username__iexact=username)
 
+    @staticmethod
+    def _is_local() -> models.Q:
+        "Accounts whose full username ends with one of RBQ_LOCAL_DOMAINS."
+        local = models.Q(pk__in=[])
+        for domain in settings.RBQ_LOCAL_DOMAINS:
+            local |= models.Q(username__iendswith="@%s" % domain)
+        return local
+
+    def local(self) -> models.QuerySet:
+        return self.filter(self._is_local())
+
+    def remote(self) -> models.QuerySet:
+        return self.exclude(self._is_local())
+
     def create_superuser(self, username, email, password, **extra_fields):
         _, domain = username.split("@")
         if domain in settings.RBQ_LOCAL_DOMAINS:
@@ -113,10 +127,35 @@ class Account(AbstractBaseUser, PermissionsMixin, ARModel):
     followers_count = models.PositiveIntegerField(null=True)
     following_count = models.PositiveIntegerField(null=True)
     posts_count = models.PositiveIntegerField(null=True)
+    etag = models.TextField(blank=True, default="", help_text="ETag of the last fetched Actor document")
+    last_modified = models.TextField(blank=True, default="", help_text="Last-Modified of the last fetched Actor document")
+    fetched_at = models.DateTimeField(null=True, db_index=True, help_text="When the remote Actor was last fetched, or a refresh was last tried")
 
     USERNAME_FIELD = 'username'
     EMAIL_FIELD = 'email'
     REQUIRED_FIELDS = ['email']
+    def save(self, *args, **kwargs):
+        """
+        Drop the rendered Actor of the previous version, and its cached public keys.
+        Saving an existing Account leaves its counters alone: they are only
+        changed by counter_component in single UPDATEs, which a full save
+        with values read earlier would overwrite.
+        """
+        if self.pk is not None and self.updated_at is not None:
+            render_component.forget(self.ap_id, self.updated_at)
+        if self.pk is not None:
+            from rbq_ap.components import account_component
+            account_component.forget_public_key(self.ap_id)
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = {
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+            } - set(counter_component.COUNTERS)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"updated_at"}
+        super().save(*args, **kwargs)
+
     @property
     def preferred_username(self):
         username, _ = self.username.split("@")
@@ -1,27 +1,102 @@
-from typing import Optional
+from typing import Optional, Set
 from django.db import models
 from django.contrib.postgres.fields import JSONField, ArrayField, CITextField
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth.models import AbstractBaseUser, UserManager, PermissionsMixin
 from django.conf import settings
 
 from .base_models import ARModel
 from .account import Account
-from .asobject import ASObject
+from .asobject import ASObject, parse_published
+from rbq_ap import helpers
+from rbq_backend.components import counter_component
+
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+# The public collection, as written by various implementations.
+PUBLIC_IDS = {PUBLIC, "as:Public", "Public"}
+# Statuses of Activities undone, or Creates of deleted objects.
+HIDDEN_STATUSES = ("canceled", "deleted")
+# Statuses of public timelines, also the condition of their partial indexes.
+PUBLIC_TIMELINE = models.Q(visibility='public', type='Create') & ~models.Q(status__in=HIDDEN_STATUSES)
+
+
+def addressed(data: dict, *fields: str) -> Set[str]:
+    "ActivityPub IDs in the given addressing fields of an Activity."
+    result = set()
+    for field in fields:
+        value = data.get(field, [])
+        for item in value if isinstance(value, list) else [value]:
+            result.add(helpers.get_id(item))
+    return result - {None}
+
+
+def get_visibility(data: dict, followers_uri: Optional[str]) -> str:
+    """
+    Classify an Activity from its addressing, like Mastodon does.
+
+    returns "public", "unlisted", "private" (followers only) or "direct".
+    data -- the Activity dict.
+    followers_uri -- the followers collection of its actor.
+    """
+    to, cc = addressed(data, "to"), addressed(data, "cc")
+    if to & PUBLIC_IDS:
+        return "public"
+    if cc & PUBLIC_IDS:
+        return "unlisted"
+    if followers_uri in to | cc:
+        return "private"
+    return "direct"
+
 
 class ASActivity(ARModel):
     "All ActivityStreams activities goes here."
     data = JSONField()
+    ap_id = models.TextField(unique=True, null=True)
     domain = CITextField()
     actor = models.ForeignKey(
         Account, on_delete=models.DO_NOTHING, related_name='activities', to_field='ap_id')
     recipients = ArrayField(models.TextField(), null=True)
+    # Copied from data on every save, for queries.
+    type = models.TextField(null=True, db_index=True)
+    object = models.TextField(null=True)
+    published = models.DateTimeField(null=True)
+    status = models.TextField(null=True, help_text='data["rbqInternal"]["status"]')
+    VISIBILITIES = (
+        ('public', 'Public'),
+        ('unlisted', 'Unlisted'),
+        ('private', 'Followers only'),
+        ('direct', 'Direct'),
+    )
+    visibility = models.TextField(choices=VISIBILITIES, null=True, help_text="From to and cc, see get_visibility()")
+    local = models.BooleanField(default=False, help_text="Whether the actor is a local Account")
+
+    SYNCED_FIELDS = {"ap_id", "type", "object", "published", "status", "visibility", "local"}
 
     @property
     def asobject(self):
-        try:
-            return ASObject.objects.get(data__id=self.data["object"])
-        except KeyError:
+        "The object of this Activity, read once per instance."
+        if self.object is None:
             raise ASObject.DoesNotExist
+        cached = getattr(self, "_asobject", None)
+        if cached is None or cached.ap_id != self.object:
+            self._asobject = ASObject.objects.get(ap_id=self.object)
+        return self._asobject
+
+    def save(self, *args, **kwargs):
+        "Keep ap_id and the other columns in sync with data."
+        self.ap_id = self.data.get("id", None)
+        self.type = self.data.get("type", None)
+        self.object = helpers.get_id(self.data.get("object", None))
+        self.published = parse_published(self.data)
+        self.status = self.data.get("rbqInternal", {}).get("status", None)
+        self.visibility = get_visibility(self.data, self.actor.followers_uri)
+        self.local = self.actor.is_local
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | self.SYNCED_FIELDS
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            counter_component.count_listed_reply(self)
 
     def __str__(self):
         try:
@@ -31,3 +106,15 @@ class ASActivity(ARModel):
 
     class Meta:
         verbose_name_plural = 'ASActivities'
+        indexes = [
+            # Keyset pagination of outboxes.
+            models.Index(fields=['actor', 'created_at', 'id'], name='asactivity_actor_created_idx'),
+            models.Index(fields=['object', 'type'], name='asactivity_object_type_idx'),
+            # "Addressed to me" queries: recipients__contains=[ap_id].
+            GinIndex(fields=['recipients'], name='asactivity_recipients_gin'),
+            # Public timelines, with the same conditions as their queries.
+            models.Index(fields=['id'], name='asactivity_public_idx',
+                         condition=PUBLIC_TIMELINE),
+            models.Index(fields=['id'], name='asactivity_local_public_idx',
+                         condition=PUBLIC_TIMELINE & models.Q(local=True)),
+        ]
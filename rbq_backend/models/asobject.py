@@ -1,27 +1,72 @@
-from typing import Dict, Optional, Union, List
-from django.db import models, transaction   
+import time
+from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Optional, Union, List, Tuple
+from django.db import models, transaction
 from django.contrib.postgres.fields import JSONField, ArrayField, CITextField
 from django.contrib.auth.models import AbstractBaseUser, UserManager, PermissionsMixin
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+import requests
 
 from .account import Account
+from .interaction_count import InteractionCount
+from .thread_node import ThreadNode
+from rbq_ap import helpers
+from rbq_backend.components import counter_component, render_component, task_component
+from rbq_backend.components.singleflight_component import single_flight
 from rbq_ap.components import fetcher_component
 
 ASElement = Union[str, int, float, 'ASDict', List['ASElement']]
 ASDict = Dict[str, ASElement]
 
+# Object types counted in posts_count of their authors.
+POST_TYPES = ("Article", "Note")
+# Visibilities of the Creates of replies listed in replies collections.
+LISTED_VISIBILITIES = ("public", "unlisted")
+
+
+def author_id(obj: ASDict) -> Optional[str]:
+    """
+    Returns the ActivityPub id of an object's author: attributedTo, or actor
+    for objects which don't have one. The attributed_to column is filled
+    from it, so posts_count and reconcile_counters agree on authors.
+    """
+    return helpers.get_id(obj.get("attributedTo", obj.get("actor", None)))
+
+
+def parse_published(obj: ASDict) -> Optional[datetime]:
+    "Returns the published time of an object, or None if missing or malformed."
+    try:
+        return parse_datetime(obj.get("published", None) or "")
+    except (TypeError, ValueError):
+        return None
+
+
 class ASObjectManager(models.Manager):
     def get_or_fetch(self, obj: ASDict) -> Optional['ASObject']:
         """
         Get an ASObject from DB or fetch it from remote.
+        Concurrent callers for the same object wait for one fetch.
 
         :params obj: a dict contains key "id" that pointed to the object's AP ID.
         :returning: the ASObject fetched from DB or saved to DB.
         """
         try:
-            return self.get(data__id=obj["id"])
+            return self.get(ap_id=obj["id"])
         except self.model.DoesNotExist:
-            result = fetcher_component.get(obj["id"])
+            pass
+        with single_flight("asobject:%s" % obj["id"]):
+            try:
+                return self.get(ap_id=obj["id"])
+            except self.model.DoesNotExist:
+                pass
+            try:
+                result = fetcher_component.get(obj["id"])
+            except fetcher_component.FetchFailedException:
+                raise self.model.DoesNotExist(obj["id"])
             obj = result.json()
             return self.save_asobject(obj)
 
@@ -34,65 +79,199 @@ class ASObjectManager(models.Manager):
         """
         if "id" not in obj.keys():
             return None
+        fetcher_component.forget_failure(obj["id"])
         obj = self.maybe_create_or_find_context(obj)
         try:
-            aso = self.get(data__id=obj["id"])
+            aso = self.get(ap_id=obj["id"])
+            previous_parent = aso.in_reply_to
             aso.data = obj
             aso.save()
+            if aso.in_reply_to != previous_parent:
+                counter_component.adjust_replies(previous_parent, -1, aso.ap_id)
+                counter_component.adjust_replies(aso.in_reply_to, 1, aso.ap_id)
         except self.model.DoesNotExist:
             aso = self.create(data=obj)
-        aso = self.maybe_increase_actor_posts_count(aso)
+            self.maybe_change_actor_posts_count(aso, 1)
+            counter_component.adjust_replies(aso.in_reply_to, 1, aso.ap_id)
+            # Replies which arrived first.
+            replies = aso.replies.count()
+            if replies:
+                InteractionCount.objects.update_or_create(
+                    asobject=aso, defaults={"replies_count": replies,
+                                            "listed_replies_count": aso.listed_replies.count()})
+        ThreadNode.objects.index(aso)
+        if obj.get("rbqInternal", {}).get("threadPending", False):
+            task_component.enqueue_on_commit(
+                "rbq_backend.components.asobject_component.resolve_thread",
+                aso.ap_id,
+                q_options={
+                    "task_name": "resolve_thread"
+                })
         return aso
 
-    def maybe_create_or_find_context(self, obj: ASDict, recursion_count: int = 0) -> ASDict:
-        """Ensure an ActivityStreams object has its context."""
-        context = None
-        try:
-            context = self.get(data__id=obj["context"])
-        except (KeyError, self.model.DoesNotExist):
-            if 'inReplyTo' in obj.keys() and recursion_count < 8:
-                obj["context"] = self.maybe_create_or_find_context(
-                    self.get_or_fetch({"id": obj["inReplyTo"]}),
-                    recursion_count=recursion_count+1)
-            else:
-                with transaction.atomic():
-                    context = self.model(data={"type": "Context"})
-                    context.save()
-                    context.data["id"] = "https://%s/contexts/%s" % (
-                        settings.RBQ_LOCAL_DOMAINS[0], context.id)
-                    context.save()
-                    obj["context"] = context.data["id"]
+    def tombstone(self, aso: 'ASObject') -> 'ASObject':
+        """
+        Replace a deleted object with a Tombstone, keeping its id and context.
+
+        :params aso: the ASObject deleted by its author.
+        :returning: aso itself.
+        """
+        if aso.data.get("type", None) == "Tombstone":
+            return aso
+        deleted = aso.data
+        aso.data = {
+            "id": deleted["id"],
+            "type": "Tombstone",
+            "formerType": deleted.get("type", None),
+            "deleted": timezone.now().isoformat(),
+        }
+        if "context" in deleted:
+            aso.data["context"] = deleted["context"]
+        aso.save()
+        self.maybe_change_actor_posts_count(self.model(data=deleted), -1)
+        counter_component.adjust_replies(helpers.get_id(deleted.get("inReplyTo", None)), -1, aso.ap_id)
+        return aso
+
+    def maybe_create_or_find_context(self,
+                                     obj: ASDict,
+                                     budget: Optional[float] = None,
+                                     fallback_context: Optional[str] = None) -> ASDict:
+        """
+        Ensure an ActivityStreams object has its context.
+
+        The context is the one of the object, or of its closest ancestor known
+        locally. Missing ancestors are fetched until the time budget runs out;
+        the object then gets a new context and rbqInternal.threadPending,
+        and resolve_thread() finishes the walk in a task.
+
+        :params obj: the ASDict to save.
+        :params budget: seconds to spend on fetching ancestors.
+        :params fallback_context: the context to use when none is found.
+        :returning: obj with its "context".
+        """
+        if budget is None:
+            budget = getattr(settings, "RBQ_THREAD_RESOLVE_BUDGET", 2.0)
+        deadline = time.monotonic() + budget
+        fetched: List[ASDict] = []
+        current = obj
+        context_id = None
+        pending = False
+        for _depth in range(8):
+            context_id, parent_id = self._known_context(current)
+            if context_id is not None or parent_id is None:
+                break
+            try:
+                parent = fetcher_component.get_json_async(parent_id).result(
+                    timeout=max(deadline - time.monotonic(), 0))
+            except fetcher_component.HostUnreachableException:
+                # Unreachable now or recently: defer the rest of the walk.
+                pending = True
+                break
+            except fetcher_component.FetchFailedException:
+                # Gone, or refused.
+                break
+            except (FutureTimeoutError, requests.RequestException, ValueError):
+                # Timed out or unreachable: defer the rest of the walk.
+                pending = True
+                break
+            if not isinstance(parent, dict) or parent.get("id", None) != parent_id:
+                break
+            fetched.append(parent)
+            current = parent
+
+        if context_id is None:
+            context_id = fallback_context or self.create_context().ap_id
+        obj["context"] = context_id
+        if pending:
+            obj["rbqInternal"] = obj.get("rbqInternal", {})
+            obj["rbqInternal"]["threadPending"] = True
+        elif "threadPending" in obj.get("rbqInternal", {}):
+            del obj["rbqInternal"]["threadPending"]
+        for ancestor in reversed(fetched):
+            ancestor["context"] = context_id
+            self.save_asobject(ancestor)
         return obj
 
+    def _known_context(self, obj: ASDict) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Look up the context and the parent of an object with one query.
+
+        :returning: (the context id if known locally, the parent id to fetch).
+        """
+        context_id = helpers.get_id(obj.get("context", None))
+        parent_id = helpers.get_id(obj.get("inReplyTo", None))
+        known = {aso.ap_id: aso for aso in self.filter(
+            ap_id__in=[i for i in (context_id, parent_id) if i is not None])}
+        if context_id in known:
+            return context_id, None
+        if parent_id in known:
+            return known[parent_id].data.get("context", None), None
+        return None, parent_id
+
+    def create_context(self) -> 'ASObject':
+        "Create a new local Context object."
+        with transaction.atomic():
+            context = self.model(data={"type": "Context"})
+            context.save()
+            context.data["id"] = "https://%s/contexts/%s" % (
+                settings.RBQ_LOCAL_DOMAINS[0], context.id)
+            context.save()
+        return context
+
     @staticmethod
-    def maybe_increase_actor_posts_count(aso: 'ASObject') -> 'ASObject':
+    def maybe_change_actor_posts_count(aso: 'ASObject', delta: int) -> 'ASObject':
         """
-        Increase posts_count of the object's actor if object is of certain types.
+        Add delta to posts_count of the object's author (see author_id) if object is of certain types.
+        Done in one UPDATE, so concurrent changes don't overwrite each other.
 
         :params aso: -- The ASObject to check its type.
+        :params delta: -- 1 for a new object, -1 for a deleted one.
         :returning: aso itself.
         """
-        try:
-            if aso.data.get("type", None) in ("Article", "Note"):
-                actor = aso.actor
-                actor.posts_count += 1
-                actor.save()
-        except Account.DoesNotExist:
-            pass
+        if aso.data.get("type", None) in POST_TYPES:
+            counter_component.adjust(
+                Account.objects.filter(ap_id=author_id(aso.data)), posts_count=delta)
         return aso
 
 
 class ASObject(models.Model):
     "All ActivityStreams objects goes here."
     data = JSONField()
+    ap_id = models.TextField(unique=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Copied from data on every save, for queries.
+    type = models.TextField(null=True, db_index=True)
+    attributed_to = models.TextField(null=True, db_index=True)
+    in_reply_to = models.TextField(null=True)
+    context = models.TextField(null=True, db_index=True)
+    published = models.DateTimeField(null=True, db_index=True)
+
+    SYNCED_FIELDS = {"ap_id", "type", "attributed_to", "in_reply_to", "context", "published"}
+
+    def save(self, *args, **kwargs):
+        """
+        Keep ap_id and the other columns in sync with data,
+        and drop the rendered response of the previous version.
+        """
+        if self.ap_id is not None and self.updated_at is not None:
+            render_component.forget(self.ap_id, self.updated_at)
+        self.ap_id = self.data.get("id", None)
+        self.type = self.data.get("type", None)
+        self.attributed_to = author_id(self.data)
+        self.in_reply_to = helpers.get_id(self.data.get("inReplyTo", None))
+        self.context = helpers.get_id(self.data.get("context", None))
+        self.published = parse_published(self.data)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | self.SYNCED_FIELDS | {"updated_at"}
+        super().save(*args, **kwargs)
 
     @property
     def actor(self):
-        if isinstance(self.data.get("actor", None), str):
-            return Account.objects.get(ap_id=self.data["actor"])
+        if self.attributed_to is not None:
+            return Account.objects.get(ap_id=self.attributed_to)
         return Account.objects.filter(
-            activities__data__object=self.data["id"],
-            activities__data__type="Create").get()
+            activities__object=self.ap_id,
+            activities__type="Create").get()
 
     def __str__(self):
         try:
@@ -103,9 +282,7 @@ class ASObject(models.Model):
     @property
     def asactivity(self):
         from .asactivity import ASActivity
-        return ASActivity.objects.get(
-            data__object=self.data["id"],
-            data__type="Create")
+        return ASActivity.objects.get(object=self.ap_id, type="Create")
 
     @property
     def language(self):
@@ -115,18 +292,41 @@ class ASObject(models.Model):
             return settings.LANGUAGE_CODE
 
     @property
-    def in_reply_to(self):
-        return ASObject.objects.get(data__id=self.data["inReplyTo"])
+    def parent(self):
+        "The object this one replies to."
+        return ASObject.objects.get(ap_id=self.in_reply_to)
 
     @property
     def replies(self):
-        return ASObject.objects.filter(data__inReplyTo=self.data["id"])
+        return ASObject.objects.filter(in_reply_to=self.ap_id)
 
     @property
     def replies_count(self):
-        return self.replies.count()
+        "Maintained by save_asobject() and tombstone(), see counter_component."
+        return InteractionCount.objects.filter(asobject=self).values_list(
+            'replies_count', flat=True).first() or 0
+
+    @property
+    def listed_replies(self):
+        """
+        The replies whose Create is public or unlisted.
+        Replies known without their Create are left out, as their audience is unknown.
+        """
+        from .asactivity import ASActivity
+        return self.replies.filter(ap_id__in=ASActivity.objects.filter(
+            type="Create", visibility__in=LISTED_VISIBILITIES).values('object'))
+
+    @property
+    def listed_replies_count(self):
+        "The number of listed_replies, maintained like replies_count."
+        return InteractionCount.objects.filter(asobject=self).values_list(
+            'listed_replies_count', flat=True).first() or 0
 
     objects = ASObjectManager()
 
     class Meta:
         verbose_name_plural = 'ASObjects'
+        indexes = [
+            # Keyset pagination of replies collections.
+            models.Index(fields=['in_reply_to', 'id'], name='asobject_in_reply_to_id_idx'),
+        ]
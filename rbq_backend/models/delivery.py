@@ -0,0 +1,52 @@
+from django.db import models
+from django.utils import timezone
+
+from .base_models import ARModel
+
+
+class Delivery(ARModel):
+    "Delivery state of an Activity to a remote inbox."
+    STATUSES = (
+        ("pending", "Pending"),
+        ("delivered", "Delivered"),
+        ("failed", "Failed"),
+    )
+    activity = models.ForeignKey(
+        'ASActivity', on_delete=models.CASCADE, related_name='deliveries')
+    inbox = models.TextField()
+    host = models.TextField()
+    status = models.CharField(choices=STATUSES, max_length=50, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True, default="")
+
+    def __str__(self) -> str:
+        return "%s -> %s: %s" % (self.activity_id, self.inbox, self.status)
+
+    class Meta:
+        verbose_name_plural = 'Deliveries'
+        unique_together = (('activity', 'inbox'),)
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='delivery_status_next_idx'),
+        ]
+
+
+class DomainHealth(models.Model):
+    "Circuit breaker of deliveries to a remote host."
+    host = models.TextField(unique=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    opened_until = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def is_open(self) -> bool:
+        "No delivery is tried until opened_until."
+        return self.opened_until is not None and self.opened_until > timezone.now()
+
+    @property
+    def is_half_open(self) -> bool:
+        "The cooldown has passed, only probe the host with one request."
+        return self.opened_until is not None and not self.is_open
+
+    def __str__(self) -> str:
+        return "%s: %d failures" % (self.host, self.consecutive_failures)
@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class FeedItem(models.Model):
+    """
+    An Activity in the home timeline of a local Account.
+    Filled when Activities are saved, see feed_component.
+    """
+    account = models.ForeignKey('Account', on_delete=models.CASCADE, related_name='+')
+    activity = models.ForeignKey('ASActivity', on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Also the index of timeline pages: newest activity_id first.
+        unique_together = [['account', 'activity']]
+
+    def __str__(self) -> str:
+        return "%s: %s" % (self.account_id, self.activity_id)
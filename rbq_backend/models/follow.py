@@ -6,3 +6,8 @@ class Follow(ARModel):
     follower = models.ForeignKey('Account', on_delete=models.CASCADE, related_name='+')
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pagination of followers/following collections.
+            models.Index(fields=['followee', 'created_at', 'id'], name='follow_followee_created_idx'),
+            models.Index(fields=['follower', 'created_at', 'id'], name='follow_follower_created_idx'),
+        ]
@@ -0,0 +1,15 @@
+from django.db import models
+from django.contrib.postgres.fields import JSONField
+
+from .base_models import ARModel
+
+
+class InboxItem(ARModel):
+    "A raw Activity POSTed to an inbox, waiting to be processed by a task."
+    ap_id = models.TextField(unique=True)
+    data = JSONField()
+    account = models.ForeignKey(
+        'Account', on_delete=models.CASCADE, related_name='+',
+        help_text='The Actor verified by HTTP Signatures.')
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text='When a task started processing it.')
+    processed_at = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class InteractionCount(models.Model):
+    "Favourites, reblogs and replies of an ASObject, kept up to date by the inbox."
+    asobject = models.OneToOneField(
+        'ASObject', on_delete=models.CASCADE, related_name='interaction_count')
+    favourites_count = models.PositiveIntegerField(default=0)
+    reblogs_count = models.PositiveIntegerField(default=0)
+    replies_count = models.PositiveIntegerField(default=0)
+    listed_replies_count = models.PositiveIntegerField(default=0, help_text='Replies whose Create is public or unlisted')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return "%s: %d favourites, %d reblogs, %d replies" % (
+            self.asobject_id, self.favourites_count, self.reblogs_count, self.replies_count)
@@ -0,0 +1,96 @@
+from typing import List, Optional
+
+from django.db import models
+from django.db.models.functions import Concat, Substr
+
+# A path is the ids of the ASObjects from the root of a thread, this one
+# last, each zero-padded and followed by "/": sorting by path lists a thread
+# depth first, and the path of a reply starts with the paths of its ancestors.
+SEGMENT = "%010d/"
+SEGMENT_LENGTH = 11
+
+
+class ThreadNodeManager(models.Manager):
+    def index(self, aso) -> Optional['ThreadNode']:
+        """
+        Add or move an ASObject in the thread index, after it was saved.
+        Replies saved before it are moved under it, with their replies.
+
+        :params aso: the saved ASObject.
+        :returning: its ThreadNode, or None if it's not in a thread.
+        """
+        from .asobject import POST_TYPES
+        if aso.type not in POST_TYPES or aso.context is None:
+            return None
+        segment = SEGMENT % aso.id
+        parent = None
+        if aso.in_reply_to is not None:
+            parent = self.filter(asobject__ap_id=aso.in_reply_to).first()
+        if parent is not None and segment in parent.path:
+            # A reply to one of its own replies.
+            parent = None
+        path = (parent.path if parent else "") + segment
+        depth = parent.depth + 1 if parent else 0
+
+        node = self.filter(asobject=aso).first()
+        if node is None:
+            node = self.create(
+                asobject=aso, context=aso.context, depth=depth, path=path,
+                parent_id=parent.asobject_id if parent else None)
+        elif (node.path, node.context) != (path, aso.context):
+            self._move(node.context, node.path, path, depth - node.depth, aso.context)
+            self.filter(id=node.id).update(parent_id=parent.asobject_id if parent else None)
+            node.refresh_from_db()
+
+        for orphan in self.filter(parent__isnull=True, asobject__in_reply_to=aso.ap_id).exclude(id=node.id):
+            if orphan.path[-SEGMENT_LENGTH:] in path:
+                continue
+            self._move(orphan.context, orphan.path, path + orphan.path[-SEGMENT_LENGTH:],
+                       depth + 1 - orphan.depth, aso.context)
+            self.filter(id=orphan.id).update(parent_id=aso.id)
+        return node
+
+    def _move(self, old_context: str, old_path: str, new_path: str, depth_delta: int, context: str) -> int:
+        "Move a node and its replies to a new path with one UPDATE."
+        return self.filter(context=old_context, path__startswith=old_path).update(
+            path=Concat(models.Value(new_path), Substr('path', len(old_path) + 1)),
+            depth=models.F('depth') + depth_delta,
+            context=context)
+
+    def conversation(self, node: 'ThreadNode') -> List['ThreadNode']:
+        """
+        The ancestors and the replies of a node, in one query, depth first.
+
+        :params node: the ThreadNode of a status.
+        :returning: ThreadNodes with their ASObjects, ancestors first;
+                    tell them apart with is_ancestor_of().
+        """
+        ancestor_ids = [int(segment) for segment in node.path.split("/")[:-2]]
+        return list(self.filter(
+            models.Q(asobject_id__in=ancestor_ids) |
+            models.Q(context=node.context, path__startswith=node.path)
+        ).exclude(id=node.id).select_related('asobject').order_by('path'))
+
+
+class ThreadNode(models.Model):
+    "The place of an ASObject in its thread, maintained by ThreadNode.objects.index()."
+    asobject = models.OneToOneField('ASObject', on_delete=models.CASCADE, related_name='thread_node')
+    context = models.TextField()
+    parent = models.ForeignKey('ASObject', on_delete=models.SET_NULL, null=True, related_name='+')
+    depth = models.PositiveIntegerField(default=0)
+    path = models.TextField()
+
+    objects = ThreadNodeManager()
+
+    def is_ancestor_of(self, other: 'ThreadNode') -> bool:
+        return other.path.startswith(self.path) and other.path != self.path
+
+    def __str__(self) -> str:
+        return "%s: %s" % (self.context, self.path)
+
+    class Meta:
+        indexes = [
+            # Replies of a status: context = ... AND path LIKE '...%'.
+            models.Index(fields=['context', 'path'], name='threadnode_context_path_idx',
+                         opclasses=['text_pattern_ops', 'text_pattern_ops']),
+        ]
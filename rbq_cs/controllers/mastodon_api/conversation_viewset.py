@@ -0,0 +1,49 @@
+from rest_framework import viewsets, permissions, authentication
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.versioning import NamespaceVersioning
+from django.db.models import Q
+from rbq_backend.models import Account, ASActivity, HIDDEN_STATUSES
+from rbq_cs.serializers.mastodon.account_serializer import AccountSerializer
+from rbq_cs.serializers.mastodon.status_serializer import StatusSerializer
+from rbq_cs.paginations import MastodonPagination
+
+class ConversationViewSet(viewsets.GenericViewSet):
+    """
+    Direct messages of the user, newest first.
+    """
+    pagination_class = MastodonPagination
+    serializer_class = StatusSerializer
+    # Users, not remote servers signing their requests.
+    authentication_classes = [authentication.BasicAuthentication, authentication.SessionAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    versioning_class = NamespaceVersioning
+
+    def list(self, request: Request) -> Response:
+        """
+        Direct statuses sent or received by the user; received ones are
+        found by array containment on the GIN-indexed recipients.
+
+        Returns array of Conversation
+        """
+        user = request.user
+        direct = ASActivity.objects.filter(visibility="direct", type="Create").filter(
+            Q(recipients__contains=[user.ap_id]) | Q(actor=user)
+        ).exclude(status__in=HIDDEN_STATUSES).select_related('actor')
+        page = self.paginate_queryset(direct)
+        statuses = self.serializer_class(page, many=True).data
+
+        # Participants of the whole page, in one query.
+        participants = {account.ap_id: account for account in Account.objects.filter(
+            ap_id__in={ap_id for asa in page for ap_id in asa.recipients or ()}
+        ).exclude(id=user.id)}
+        conversations = []
+        for asa, status in zip(page, statuses):
+            accounts = [participants[ap_id] for ap_id in asa.recipients or () if ap_id in participants]
+            conversations.append({
+                "id": str(asa.id),
+                "unread": False,
+                "accounts": AccountSerializer(accounts, many=True).data,
+                "last_status": status,
+            })
+        return self.get_paginated_response(conversations)
@@ -1,12 +1,62 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, permissions, authentication
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rbq_backend.models import Status
+from rest_framework.decorators import action
+from rest_framework.versioning import NamespaceVersioning
+from django.db.models import Q
+from rbq_backend.models import Account, ASActivity, ASObject, ThreadNode, HIDDEN_STATUSES
 from rbq_cs.serializers.mastodon.status_serializer import StatusSerializer
 
-class StatusViewSet(viewsets.ModelViewSet):
+
+def visible_to(user: Account) -> Q:
+    "Statuses a user may read; anonymous users read public and unlisted ones."
+    visible = Q(visibility__in=("public", "unlisted"))
+    if user.is_authenticated:
+        visible |= Q(actor=user) | Q(recipients__contains=[user.ap_id])
+        visible |= Q(visibility="private", actor__in=user.following.all())
+    return visible
+
+
+class StatusViewSet(viewsets.ReadOnlyModelViewSet):
     """
-    A simple ViewSet for viewing and editing accounts.
+    A simple ViewSet for viewing statuses.
     """
-    queryset = Status.objects.all()
     serializer_class = StatusSerializer
-    #permission_classes = [IsAccountAdminOrReadOnly]
+    authentication_classes = [authentication.BasicAuthentication, authentication.SessionAuthentication]
+    permission_classes = [permissions.AllowAny]
+    versioning_class = NamespaceVersioning
+
+    def get_queryset(self):
+        return ASActivity.objects.filter(
+            visible_to(self.request.user), type="Create"
+        ).exclude(status__in=HIDDEN_STATUSES).select_related('actor')
+
+    def list(self, request):
+        return Response(status=403)
+
+    @action(detail=True, methods=["GET"])
+    def context(self, request: Request, pk: int = None) -> Response:
+        """
+        Ancestors and descendants of the status, depth first,
+        read from the thread index.
+
+        Returns Context
+        """
+        status = self.get_object()
+        try:
+            node = status.asobject.thread_node
+        except (ThreadNode.DoesNotExist, ASObject.DoesNotExist):
+            return Response({"ancestors": [], "descendants": []})
+        nodes = ThreadNode.objects.conversation(node)
+        by_object = {asa.object: asa for asa in self.get_queryset().filter(
+            object__in=[other.asobject.ap_id for other in nodes])}
+        ancestors, descendants = [], []
+        for other in nodes:
+            asa = by_object.get(other.asobject.ap_id, None)
+            if asa is not None:
+                asa._asobject = other.asobject
+                (ancestors if other.is_ancestor_of(node) else descendants).append(asa)
+        return Response({
+            "ancestors": self.serializer_class(ancestors, many=True).data,
+            "descendants": self.serializer_class(descendants, many=True).data,
+        })
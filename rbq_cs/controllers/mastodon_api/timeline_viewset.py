@@ -0,0 +1,50 @@
+from rest_framework import viewsets, permissions, authentication
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.decorators import action
+from rest_framework.versioning import NamespaceVersioning
+from django.db.models import Q
+from rbq_backend.models import ASActivity, FeedItem, PUBLIC_TIMELINE
+from rbq_cs.serializers.mastodon.status_serializer import StatusSerializer
+from rbq_cs.paginations import FeedPagination, MastodonPagination
+
+class TimelineViewSet(viewsets.GenericViewSet):
+    """
+    Timelines of statuses, newest first.
+    """
+    pagination_class = FeedPagination
+    serializer_class = StatusSerializer
+    # Users, not remote servers signing their requests.
+    authentication_classes = [authentication.BasicAuthentication, authentication.SessionAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    versioning_class = NamespaceVersioning
+
+    @action(detail=False, methods=["GET"])
+    def home(self, request: Request) -> Response:
+        """
+        Statuses from the accounts the user follows, and the user's own,
+        read from the materialized home timeline (see feed_component).
+
+        Returns array of Status
+        """
+        items = FeedItem.objects.filter(account=request.user).select_related(
+            'activity', 'activity__actor')
+        page = self.paginate_queryset(items)
+        return self.get_paginated_response(
+            self.serializer_class([item.activity for item in page], many=True).data)
+
+    @action(detail=False, methods=["GET"], permission_classes=[permissions.AllowAny],
+            pagination_class=MastodonPagination)
+    def public(self, request: Request) -> Response:
+        """
+        Public statuses known to this server, or only the local ones with
+        ?local=true. The filters match the partial indexes of ASActivity.
+
+        Returns array of Status
+        """
+        condition = PUBLIC_TIMELINE
+        if request.query_params.get("local", "").lower() in ("true", "1"):
+            condition &= Q(local=True)
+        activities = ASActivity.objects.filter(condition).select_related('actor')
+        page = self.paginate_queryset(activities)
+        return self.get_paginated_response(self.serializer_class(page, many=True).data)
@@ -7,10 +7,21 @@ from rest_framework.response import Response
 from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class MastodonPagination(pagination.LimitOffsetPagination):
+    """
+    Pagination of Mastodon APIs, newest first:
+    max_id -- results older than this id.
+    since_id -- results newer than this id, the newest ones.
+    min_id -- results newer than this id, the ones right after it.
+
+    One query of limit+1 rows per page; links are built from the ids
+    of the rows on the page.
+    """
     limit_query_param: str = 'limit'
     default_limit: int = 40
+    max_limit: int = 80
     min_id_query_param: str = 'min_id'
     max_id_query_param: str = 'max_id'
+    since_id_query_param: str = 'since_id'
     queryset_id_field: str = 'id'
 
     def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> Optional[list]:
@@ -18,56 +29,71 @@ class MastodonPagination(pagination.LimitOffsetPagination):
         Paginate a queryset if required, either returning a
         page object, or `None` if pagination is not configured for this view.
         """
-        self.queryset = queryset
         self.request = request
         self.limit: int = self.get_limit(request)
+        max_id = self._get_id(request, self.max_id_query_param)
+        since_id = self._get_id(request, self.since_id_query_param)
+        min_id = self._get_id(request, self.min_id_query_param)
 
-        new_queryset = queryset
-        try:
-            self.max_id: int = request.query_params[self.max_id_query_param]
-            new_queryset = self._gen_subset(new_queryset, max_id=self.max_id)
-        except (KeyError, ValueError):
-            self.max_id: int = new_queryset.last().id
-        try:
-            self.min_id: int = request.query_params[self.min_id_query_param]
-            new_queryset = self._gen_subset(new_queryset, min_id=self.min_id)
-        except (KeyError, ValueError):
-            self.min_id: int = 0
-
-        return list(new_queryset[:self.limit])
+        queryset = self._gen_subset(queryset, min_id=since_id, max_id=max_id)
+        if min_id is not None:
+            # Walk up from min_id, then show the page newest first as usual.
+            rows = list(self._gen_subset(queryset, min_id=min_id)
+                        .order_by(self.queryset_id_field)[:self.limit + 1])
+            self.has_newer = len(rows) > self.limit
+            self.has_older = True
+            page = rows[:self.limit][::-1]
+        else:
+            rows = list(queryset.order_by('-' + self.queryset_id_field)[:self.limit + 1])
+            self.has_older = len(rows) > self.limit
+            # Newer rows may arrive at any time, clients poll with min_id.
+            self.has_newer = True
+            page = rows[:self.limit]
+        self.page_ids = [getattr(row, self.queryset_id_field) for row in page]
+        return page
 
     def get_paginated_response(self, data):
         rels = {
-            "prev": self.get_previous_link(),
-            "next": self.get_next_link()
+            "next": self.get_next_link(),
+            "prev": self.get_previous_link()
         }
 
-        link = '; '.join(['<%s>; rel="%s"' % (rels[k], k) for k in rels if rels[k] is not None])
+        link = ', '.join(['<%s>; rel="%s"' % (rels[k], k) for k in rels if rels[k] is not None])
 
         return Response(data, headers={
             "link": link
-        })
+        } if link else None)
 
     def get_next_link(self) -> Optional[str]:
-        "Returns the link url pointed to next subset."
-        if self._gen_subset(self.queryset, min_id=self.max_id)[:self.limit].count() <= 0:
+        "Returns the link url pointed to older results."
+        if not self.page_ids or not self.has_older:
             return None
         url = self.request.build_absolute_uri()
         url = replace_query_param(url, self.limit_query_param, self.limit)
-        url = replace_query_param(url, self.min_id_query_param, self.max_id)
-        url = remove_query_param(url, self.max_id_query_param)
+        url = replace_query_param(url, self.max_id_query_param, self.page_ids[-1])
+        url = remove_query_param(url, self.min_id_query_param)
+        url = remove_query_param(url, self.since_id_query_param)
         return url
 
     def get_previous_link(self) -> Optional[str]:
-        "Returns the link url pointed to previous subset."
-        if self._gen_subset(self.queryset, max_id=self.min_id)[:self.limit].count() <= 0:
+        "Returns the link url pointed to newer results."
+        if not self.page_ids or not self.has_newer:
             return None
         url = self.request.build_absolute_uri()
         url = replace_query_param(url, self.limit_query_param, self.limit)
-        url = replace_query_param(url, self.max_id_query_param, self.max_id)
-        url = remove_query_param(url, self.min_id_query_param)
+        url = replace_query_param(url, self.min_id_query_param, self.page_ids[0])
+        url = remove_query_param(url, self.max_id_query_param)
+        url = remove_query_param(url, self.since_id_query_param)
         return url
 
+    @staticmethod
+    def _get_id(request: Request, name: str) -> Optional[int]:
+        "An id query param, None if missing or malformed."
+        try:
+            return int(request.query_params[name])
+        except (KeyError, ValueError):
+            return None
+
     def _gen_subset(self,
                     queryset: QuerySet,
                     min_id: int = None,
@@ -78,3 +104,8 @@ class MastodonPagination(pagination.LimitOffsetPagination):
         if max_id is not None:
             queryset = queryset.filter(**{self.queryset_id_field+"__lt": max_id})
         return queryset
+
+
+class FeedPagination(MastodonPagination):
+    "Pagination of FeedItems, by the ids of their activities."
+    queryset_id_field: str = 'activity_id'
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from rbq_backend.models import ASObject, ASActivity
+from rbq_backend.models import ASObject, ASActivity, InteractionCount
 from rbq_cs.serializers.mastodon.account_serializer import AccountSerializer
 #from rbq_cs.serializers.mastodon.mention_serializer import MentionSerializer
 
@@ -10,47 +10,103 @@ class RecursiveField(serializers.Serializer):
         serializer = self.parent.__class__(value, context=self.context)
         return serializer.data
 
+class StatusListSerializer(serializers.ListSerializer):
+    "Read the objects, counters and parents of a whole page of statuses in three queries."
+
+    def to_representation(self, data):
+        statuses = list(data.all() if hasattr(data, 'all') else data)
+        ap_ids = [asa.object for asa in statuses if asa.object is not None]
+        asobjects = ASObject.objects.in_bulk(ap_ids, field_name='ap_id')
+        for asa in statuses:
+            if asa.object in asobjects:
+                asa._asobject = asobjects[asa.object]
+        counts = InteractionCount.objects.filter(asobject__ap_id__in=ap_ids).values_list(
+            'asobject__ap_id', 'favourites_count', 'reblogs_count', 'replies_count')
+        self.child.context["interaction_counts"] = {}
+        self.child.context["replies_counts"] = {}
+        for ap_id, favourites, reblogs, replies in counts:
+            self.child.context["interaction_counts"][ap_id] = (favourites, reblogs)
+            self.child.context["replies_counts"][ap_id] = replies
+        parents = {aso.in_reply_to for aso in asobjects.values() if aso.in_reply_to is not None}
+        creates = ASActivity.objects.filter(type="Create", object__in=parents).select_related('actor')
+        self.child.context["parent_activities"] = {asa.object: asa for asa in creates} if parents else {}
+        return super().to_representation(statuses)
+
+
 class StatusSerializer(serializers.ModelSerializer):
     id = serializers.CharField()
-    uri = serializers.URLField(source='asobject__data__id')
-    url = serializers.URLField(source='asobject__data__url')
+    uri = serializers.URLField(source='asobject.data.id', allow_null=True)
+    url = serializers.URLField(source='asobject.data.url', allow_null=True)
     account = AccountSerializer(source="actor")
-    in_reply_to_id = serializers.CharField(
-        source='asobject__in_reply_to__asactivity__id')
-    in_reply_to_account_id = serializers.CharField(
-        source='asobject__in_reply_to__asactivity__actor__id')
-    created_at = serializers.DateTimeField(source="asobject__data__published")
-    sensitive = serializers.BooleanField(source='asobject__data__sensitive')
-    spoiler_text = serializers.CharField(source='asobject__data__summary')
-#    visibility = serializers.CharField(source='visibility')
-    language = serializers.CharField(source='asobject__language')
-
-    content = serializers.CharField(source='asobject__data__content')
+    in_reply_to_id = serializers.SerializerMethodField()
+    in_reply_to_account_id = serializers.SerializerMethodField()
+    created_at = serializers.DateTimeField(source="asobject.published", allow_null=True)
+    sensitive = serializers.BooleanField(source='asobject.data.sensitive', default=False)
+    spoiler_text = serializers.CharField(source='asobject.data.summary', default="")
+    language = serializers.CharField(source='asobject.language', allow_null=True)
+
+    content = serializers.CharField(source='asobject.data.content', allow_null=True)
 #    reblog = RecursiveField(source="reblog_of")
 #    mentions = MentionSerializer(many=True)
 
+    def _interaction_counts(self, asa: ASActivity):
+        "(favourites, reblogs), read by StatusListSerializer for lists."
+        counts = self.context.get("interaction_counts", None)
+        if counts is not None:
+            return counts.get(asa.object, (0, 0))
+        return InteractionCount.objects.filter(asobject__ap_id=asa.object).values_list(
+            'favourites_count', 'reblogs_count').first() or (0, 0)
+
+    def _parent_activity(self, asa: ASActivity):
+        "The Create of the status replied to, read by StatusListSerializer for lists."
+        try:
+            in_reply_to = asa.asobject.in_reply_to
+        except ASObject.DoesNotExist:
+            return None
+        if in_reply_to is None:
+            return None
+        parents = self.context.get("parent_activities", None)
+        if parents is not None:
+            return parents.get(in_reply_to)
+        return ASActivity.objects.filter(
+            type="Create", object=in_reply_to).select_related('actor').first()
+
+    def get_in_reply_to_id(self, asa: ASActivity):
+        parent = self._parent_activity(asa)
+        return str(parent.id) if parent is not None else None
+
+    def get_in_reply_to_account_id(self, asa: ASActivity):
+        parent = self._parent_activity(asa)
+        return str(parent.actor.id) if parent is not None else None
+
     favourites_count = serializers.SerializerMethodField()
 
     def get_favourites_count(self, asa: ASActivity) -> int:
-        return ASActivity.objects.filter(
-            data__object=asa.data["id"],
-            data__type="Like",
-            data__rbqInternal__status="normal").count()
+        return self._interaction_counts(asa)[0]
+
+    replies_count = serializers.SerializerMethodField()
+
+    def get_replies_count(self, asa: ASActivity) -> int:
+        counts = self.context.get("replies_counts", None)
+        if counts is not None:
+            return counts.get(asa.object, 0)
+        try:
+            return asa.asobject.replies_count
+        except ASObject.DoesNotExist:
+            return 0
 
     reblogs_count = serializers.SerializerMethodField()
 
     def get_reblogs_count(self, asa: ASActivity) -> int:
-        return ASActivity.objects.filter(
-            data__object=asa.data["id"],
-            data__type="Announce",
-            data__rbqInternal__status="normal").count()
+        return self._interaction_counts(asa)[1]
 
     class Meta:
         model = ASActivity
+        list_serializer_class = StatusListSerializer
         fields = ('id', 'in_reply_to_id', 'in_reply_to_account_id',
                   'created_at', 'sensitive', 'spoiler_text',
                   'visibility', 'language', 'uri', 'url', 'content',
                   #'reblog',
                   'account',# 'mentions',
-                  #'reblogs_count',
+                  'replies_count', 'reblogs_count',
                   'favourites_count')
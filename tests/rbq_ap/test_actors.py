@@ -3,6 +3,7 @@ from rest_framework.test import APITestCase
 import requests_mock
 from rbq_backend.models import Account
 from rbq_ap.serializers.actor import ActorSerializer
+from rbq_ap.components import account_component
 from tests import helpers
 
 MIME_AP = "application/activity+json"
@@ -42,7 +43,7 @@ class ActorTestCase(APITestCase):
             secure=True
         )
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data["preferredUsername"], "chuukaku_may")
+        self.assertEqual(json.loads(response.content)["preferredUsername"], "chuukaku_may")
 
     def test_002_actor_follow(self):
         "Test whether a remote actor can follow a local actor."
@@ -65,3 +66,36 @@ class ActorTestCase(APITestCase):
             self.assertIn(self.remote_user, self.user.followers.all())
             # pragma pylint: disable=no-member
             self.client.force_authenticate(user=None)
+
+    def test_003_followers_pages(self):
+        "Test whether followers pages link to each other with cursors."
+        followers = Account.objects.bulk_create([
+            Account(username="user%d@misskey.localdomain" % i,
+                    ap_id="https://misskey.localdomain/users/user%d" % i)
+            for i in range(60)])
+        for follower in followers:
+            follower.following.add(self.user)
+
+        def get(url):
+            response = self.client.get(url, HTTP_ACCEPT=MIME_AP, HTTP_HOST="rbq.localdomain", secure=True)
+            self.assertEqual(response.status_code, 200)
+            return response.data
+
+        first = get("/users/chuukaku_may/followers?page=1")
+        self.assertEqual(first["orderedItems"], [f.ap_id for f in followers[:50]])
+        second = get(first["next"].replace("https://rbq.localdomain", ""))
+        self.assertEqual(second["orderedItems"], [f.ap_id for f in followers[50:]])
+        self.assertNotIn("next", second)
+        self.assertEqual(
+            get("/users/chuukaku_may/followers?page=2")["orderedItems"], second["orderedItems"])
+
+    def test_004_follow_counters(self):
+        "Test whether following twice counts once, and unfollowing uncounts."
+        for _ in range(2):
+            account_component.local_follow_user(self.remote_user, self.user)
+        self.assertEqual(Account.objects.get(id=self.user.id).followers_count, 1)
+        self.assertEqual(Account.objects.get(id=self.remote_user.id).following_count, 1)
+        for _ in range(2):
+            account_component.local_unfollow_user(self.remote_user, self.user)
+        self.assertEqual(Account.objects.get(id=self.user.id).followers_count, 0)
+        self.assertEqual(Account.objects.get(id=self.remote_user.id).following_count, 0)
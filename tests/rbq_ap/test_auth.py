@@ -0,0 +1,112 @@
+import json
+import requests
+import requests_mock
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIRequestFactory
+from rbq_ap.auth import APSignatureAuthentication
+from rbq_ap.components import account_component, fetcher_component
+from rbq_backend.models import Account
+from tests import helpers
+
+
+class SignatureTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        account_component._public_keys.clear()
+        self.remote_user, self.actor_data = helpers.create_remote_user("ai", "misskey.localdomain")
+
+    def signed_request(self, account: Account, *extra_headers: str) -> Request:
+        "Build an inbox request signed the way fetcher_component signs."
+        body = json.dumps({"type": "Ping"}).encode("utf-8")
+        prepared = requests.Request(
+            "POST", "https://rbq.localdomain/inbox", data=body,
+            headers={"Content-Type": "application/activity+json"}).prepare()
+        auth = fetcher_component.auth_from_account(account)
+        auth.headers.extend(extra_headers)
+        prepared = auth(prepared)
+        return Request(APIRequestFactory().post(
+            "/inbox", data=body, content_type="application/activity+json",
+            HTTP_HOST="rbq.localdomain",
+            HTTP_DATE=prepared.headers["Date"],
+            HTTP_DIGEST=prepared.headers["Digest"],
+            HTTP_SIGNATURE=prepared.headers["Signature"]))
+
+    def test_000_verify_with_cached_key(self):
+        "Test whether the parsed public key is cached with its Actor after the first request."
+        auth = APSignatureAuthentication()
+        user, _key_id = auth.authenticate(self.signed_request(self.remote_user))
+        self.assertEqual(user, self.remote_user)
+        with self.assertNumQueries(0):
+            user, _key_id = auth.authenticate(self.signed_request(self.remote_user))
+        self.assertEqual(user, self.remote_user)
+
+    def test_001_key_rotation(self):
+        "Test whether the Actor is fetched again when its key has changed."
+        auth = APSignatureAuthentication()
+        auth.authenticate(self.signed_request(self.remote_user))
+
+        rotated = Account.objects.get(id=self.remote_user.id)
+        Account.objects.set_ap_keys(rotated)
+        self.actor_data["publicKey"]["publicKeyPem"] = rotated.public_key
+        with requests_mock.Mocker() as remote:
+            remote.get(self.remote_user.ap_id, text=json.dumps(self.actor_data))
+            user, _key_id = auth.authenticate(self.signed_request(rotated))
+        self.assertEqual(user, self.remote_user)
+        self.assertEqual(
+            Account.objects.get(id=self.remote_user.id).public_key.strip(),
+            rotated.public_key.strip())
+
+    def test_002_signing_key_cache(self):
+        "Test whether a changed private key is loaded again for signing."
+        auth = APSignatureAuthentication()
+        first_key = fetcher_component.get_private_key(self.remote_user)
+        self.assertIs(fetcher_component.get_private_key(self.remote_user), first_key)
+
+        old_public_key = self.remote_user.public_key
+        Account.objects.set_ap_keys(self.remote_user)
+        self.assertIsNot(fetcher_component.get_private_key(self.remote_user), first_key)
+        self.remote_user.save()
+        account_component.forget_public_key(self.remote_user.ap_id)
+        user, _key_id = auth.authenticate(self.signed_request(self.remote_user))
+        self.assertEqual(user, self.remote_user)
+        self.assertNotEqual(old_public_key, user.public_key)
+
+    def test_003_signed_content_headers(self):
+        "Test whether signed Content-Type and Content-Length headers are verified."
+        auth = APSignatureAuthentication()
+        request = self.signed_request(self.remote_user, "content-type", "content-length")
+        user, _key_id = auth.authenticate(request)
+        self.assertEqual(user, self.remote_user)
+
+    def test_004_forged_signatures_rate_limited(self):
+        "Test whether failing signatures fetch the Actor again at most once per interval."
+        auth = APSignatureAuthentication()
+        auth.authenticate(self.signed_request(self.remote_user))
+        forger = Account(username="ai@misskey.localdomain", ap_id=self.remote_user.ap_id)
+        Account.objects.set_ap_keys(forger)
+        with requests_mock.Mocker() as remote:
+            remote.get(self.remote_user.ap_id, status_code=500)
+            for _ in range(3):
+                with self.assertRaises(AuthenticationFailed):
+                    auth.authenticate(self.signed_request(forger))
+            self.assertEqual(remote.call_count, 1)
+
+    def test_005_saved_account_drops_key(self):
+        "Test whether saving an Account drops its cached key and fields."
+        auth = APSignatureAuthentication()
+        auth.authenticate(self.signed_request(self.remote_user))
+        self.remote_user.username = "ai2@misskey.localdomain"
+        self.remote_user.save()
+        user, _key_id = auth.authenticate(self.signed_request(self.remote_user))
+        self.assertEqual(user.username, "ai2@misskey.localdomain")
+
+    def test_006_verified_request_clears_unreachable_host(self):
+        "Test whether a verified request marks the Actor's host as reachable again."
+        fetcher_component.remember_failure("https://misskey.localdomain/objects/1")
+        APSignatureAuthentication().authenticate(self.signed_request(self.remote_user))
+        with requests_mock.Mocker() as remote:
+            remote.get("https://misskey.localdomain/objects/1", json={})
+            self.assertEqual(fetcher_component.get("https://misskey.localdomain/objects/1").json(), {})
@@ -1,7 +1,11 @@
 import json
+from datetime import timedelta
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework.test import APITestCase
 import requests_mock
-from rbq_backend.models import Account, ASObject
+from rbq_ap.components import inbox_component
+from rbq_backend.models import Account, ASActivity, ASObject, InboxItem
 from tests import helpers
 
 MIME_AP = "application/activity+json"
@@ -48,8 +52,80 @@ class CreationTestCase(APITestCase):
             # pragma pylint: disable=no-member
             self.client.force_authenticate(user=None)
             self.assertEqual(response.status_code, 200)
-            aso = ASObject.objects.get(data__id=self.note_data["id"])
+            aso = ASObject.objects.get(ap_id=self.note_data["id"])
             obj = aso.data
             self.assertEqual(self.note_data["type"], obj["type"])
             self.assertEqual(self.note_data["content"], obj["content"])
             self.assertEqual(aso.actor, self.remote_user)
+
+    @override_settings(RBQ_ASYNC_INBOX=True)
+    def test_001_note_creates_async(self):
+        "Test whether the inbox accepts Activities, processes them in tasks and prunes them."
+        with requests_mock.Mocker() as remote:
+            remote.get("https://misskey.localdomain/objects/1",
+                       text=json.dumps(self.note_data))
+            # pragma pylint: disable=no-member
+            self.client.force_authenticate(user=self.remote_user)
+            for _ in range(2):
+                response = self.client.post(
+                    "/inbox",
+                    data=json.dumps(self.create_data),
+                    content_type=MIME_AP,
+                    HTTP_HOST="rbq.localdomain",
+                    secure=True)
+                self.assertEqual(response.status_code, 202)
+            # pragma pylint: disable=no-member
+            self.client.force_authenticate(user=None)
+            self.assertEqual(InboxItem.objects.count(), 1)
+            self.assertIsNotNone(InboxItem.objects.get().processed_at)
+            aso = ASObject.objects.get(ap_id=self.note_data["id"])
+            self.assertEqual(aso.actor, self.remote_user)
+        self.assertEqual(inbox_component.prune_inbox(), 0)
+        InboxItem.objects.update(processed_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(inbox_component.prune_inbox(), 1)
+
+    def test_002_note_deletes(self):
+        "Test whether the author can delete Notes, and posts_count follows."
+        note_data = dict(self.note_data, attributedTo=self.remote_user.ap_id)
+        delete_data = {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": "https://misskey.localdomain/activities/delete",
+            "type": "Delete",
+            "actor": "https://misskey.localdomain/users/ai",
+            "object": note_data["id"]
+        }
+        with requests_mock.Mocker() as remote:
+            remote.get(note_data["id"], text=json.dumps(note_data))
+            # pragma pylint: disable=no-member
+            self.client.force_authenticate(user=self.remote_user)
+            for data in (self.create_data, delete_data):
+                response = self.client.post(
+                    "/inbox",
+                    data=json.dumps(data),
+                    content_type=MIME_AP,
+                    HTTP_HOST="rbq.localdomain",
+                    secure=True)
+                self.assertEqual(response.status_code, 200)
+                if data is self.create_data:
+                    self.assertEqual(Account.objects.get(id=self.remote_user.id).posts_count, 1)
+            # pragma pylint: disable=no-member
+            self.client.force_authenticate(user=None)
+        self.assertEqual(ASObject.objects.get(ap_id=note_data["id"]).data["type"], "Tombstone")
+        self.assertEqual(Account.objects.get(id=self.remote_user.id).posts_count, 0)
+        self.assertEqual(ASActivity.objects.get(object=note_data["id"], type="Create").status, "deleted")
+
+    def test_003_claimed_items(self):
+        "Test whether an item claimed by another task is left to it until its lease runs out."
+        item = InboxItem.objects.create(
+            ap_id=self.create_data["id"], data=dict(self.create_data),
+            account=self.remote_user, claimed_at=timezone.now())
+        inbox_component.process(item.id)
+        item.refresh_from_db()
+        self.assertIsNone(item.processed_at)
+        InboxItem.objects.filter(id=item.id).update(claimed_at=timezone.now() - timedelta(hours=1))
+        with requests_mock.Mocker() as remote:
+            remote.get(self.note_data["id"], text=json.dumps(self.note_data))
+            inbox_component.process(item.id)
+        item.refresh_from_db()
+        self.assertIsNotNone(item.processed_at)
+        self.assertTrue(ASActivity.objects.filter(ap_id=self.create_data["id"]).exists())
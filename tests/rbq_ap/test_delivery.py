@@ -0,0 +1,148 @@
+from datetime import timedelta
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+import requests_mock
+from rbq_backend.models import Account, ASActivity, Delivery, DomainHealth
+from rbq_ap.components import account_component, asactivity_component, delivery_component, fetcher_component
+from tests import helpers
+
+
+class DeliveryTestCase(APITestCase):
+
+    def setUp(self):
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        self.user = Account.objects.get(
+            username="chuukaku_may@rbq.localdomain")
+        self.remote_users = [
+            helpers.create_remote_user(name, domain)[0] for name, domain in (
+                ("ai", "misskey.localdomain"),
+                ("rin", "misskey.localdomain"),
+                ("gargron", "mastodon.localdomain"))]
+
+    def test_000_plan_by_host(self):
+        "Test whether inboxes are grouped by host and local ones are skipped."
+        result = delivery_component.plan(
+            [user.inbox_uri for user in self.remote_users] + [self.user.inbox_uri])
+        self.assertEqual(sorted(result.keys()), ["mastodon.localdomain", "misskey.localdomain"])
+        self.assertEqual(len(result["misskey.localdomain"]), 2)
+
+    def test_001_send_to_recipients(self):
+        "Test whether an Activity is POSTed once to every remote inbox."
+        with requests_mock.Mocker() as remote:
+            for user in self.remote_users:
+                remote.post(user.inbox_uri)
+            asactivity_component.send_activity(
+                data={
+                    "id": "https://rbq.localdomain/activities/1",
+                    "type": "Create",
+                    "actor": self.user.ap_id,
+                    "object": "https://rbq.localdomain/objects/1",
+                },
+                recipients=[user.ap_id for user in self.remote_users])
+            self.assertEqual(
+                sorted(request.url for request in remote.request_history),
+                sorted(user.inbox_uri for user in self.remote_users))
+            self.assertIn("Signature", remote.request_history[0].headers)
+            digests = set(request.headers["Digest"] for request in remote.request_history)
+            self.assertEqual(digests, {fetcher_component.body_digest(remote.request_history[0].body)})
+            self.assertIn('headers="(request-target) host date digest"',
+                          remote.request_history[0].headers["Signature"])
+
+    def test_002_deliver_records_outcomes(self):
+        "Test whether delivery states are recorded and failures are scheduled again."
+        with requests_mock.Mocker() as remote:
+            remote.post(self.remote_users[0].inbox_uri, status_code=202)
+            remote.post(self.remote_users[1].inbox_uri, status_code=410)
+            remote.post(self.remote_users[2].inbox_uri, status_code=503)
+            asactivity_component.send_activity(
+                data={
+                    "type": "Create",
+                    "actor": self.user.ap_id,
+                    "object": "https://rbq.localdomain/objects/1",
+                },
+                recipients=[user.ap_id for user in self.remote_users])
+        statuses = dict(Delivery.objects.values_list("inbox", "status"))
+        self.assertEqual(statuses, {
+            self.remote_users[0].inbox_uri: "delivered",
+            self.remote_users[1].inbox_uri: "failed",
+            self.remote_users[2].inbox_uri: "pending"})
+        retry = Delivery.objects.get(status="pending")
+        self.assertEqual(retry.attempts, 1)
+        self.assertGreater(retry.next_attempt_at, timezone.now())
+
+        Delivery.objects.update(next_attempt_at=timezone.now())
+        with requests_mock.Mocker() as remote:
+            remote.post(self.remote_users[2].inbox_uri, status_code=202)
+            self.assertEqual(delivery_component.retry_deliveries(), 1)
+        self.assertEqual(Delivery.objects.get(id=retry.id).status, "delivered")
+
+    @override_settings(RBQ_CIRCUIT_BREAKER_THRESHOLD=1)
+    def test_003_circuit_breaker(self):
+        "Test whether a failing host is paused, then probed with one request."
+        with requests_mock.Mocker() as remote:
+            remote.post(self.remote_users[0].inbox_uri, status_code=503)
+            remote.post(self.remote_users[1].inbox_uri, status_code=503)
+            asactivity_component.send_activity(
+                data={
+                    "type": "Create",
+                    "actor": self.user.ap_id,
+                    "object": "https://rbq.localdomain/objects/1",
+                },
+                recipients=[user.ap_id for user in self.remote_users[:2]])
+        health = DomainHealth.objects.get(host="misskey.localdomain")
+        self.assertTrue(health.is_open)
+
+        Delivery.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(delivery_component.retry_deliveries(), 0)
+
+        health.opened_until = timezone.now() - timedelta(seconds=1)
+        health.save()
+        with requests_mock.Mocker() as remote:
+            remote.post(self.remote_users[0].inbox_uri, status_code=503)
+            remote.post(self.remote_users[1].inbox_uri, status_code=503)
+            self.assertEqual(delivery_component.retry_deliveries(), 2)
+            self.assertEqual(remote.call_count, 1)
+        self.assertTrue(DomainHealth.objects.get(id=health.id).is_open)
+
+    def test_004_send_to_followers(self):
+        "Test whether followers collections are expanded, and addressees are stored as recipients."
+        for user in self.remote_users[:2]:
+            account_component.local_follow_user(user, self.user)
+        public = "https://www.w3.org/ns/activitystreams#Public"
+        with requests_mock.Mocker() as remote:
+            for user in self.remote_users:
+                remote.post(user.inbox_uri)
+            asactivity_component.send_activity(
+                data={
+                    "id": "https://rbq.localdomain/activities/1",
+                    "type": "Create",
+                    "actor": self.user.ap_id,
+                    "object": {
+                        "id": "https://rbq.localdomain/objects/1",
+                        "type": "Note",
+                        "to": ["as:Public"],
+                        "cc": [self.user.followers_uri]},
+                    "to": [public],
+                    "cc": [self.user.followers_uri]},
+                recipients=[public, self.user.followers_uri])
+            self.assertEqual(
+                sorted(request.url for request in remote.request_history),
+                sorted(user.inbox_uri for user in self.remote_users[:2]))
+        asa = ASActivity.objects.get(ap_id="https://rbq.localdomain/activities/1")
+        self.assertEqual(asa.recipients, sorted([public, self.user.ap_id, self.user.followers_uri]))
+        self.assertEqual(ASActivity.objects.filter(recipients__contains=[public]).count(), 1)
+
+    def test_005_prune_deliveries(self):
+        "Test whether old delivered and failed deliveries are deleted, pending ones kept."
+        activity = ASActivity.objects.create(actor=self.user, data={
+            "id": "https://rbq.localdomain/activities/1",
+            "type": "Create",
+            "actor": self.user.ap_id,
+            "object": "https://rbq.localdomain/objects/1"})
+        for user, status in zip(self.remote_users, ("delivered", "failed", "pending")):
+            Delivery.objects.create(activity=activity, inbox=user.inbox_uri, host="localdomain", status=status)
+        self.assertEqual(delivery_component.prune_deliveries(), 0)
+        Delivery.objects.update(updated_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(delivery_component.prune_deliveries(), 2)
+        self.assertEqual(list(Delivery.objects.values_list('status', flat=True)), ["pending"])
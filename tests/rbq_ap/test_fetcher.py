@@ -0,0 +1,60 @@
+import json
+import requests
+import requests_mock
+from django.core.cache import cache
+from django.test import TestCase
+from rbq_ap.components import account_component, fetcher_component
+from rbq_backend.models import Account, ASObject
+from tests import helpers
+
+
+class FetcherTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_000_gone_objects_not_fetched_again(self):
+        "Test whether a deleted object is only fetched once."
+        with requests_mock.Mocker() as remote:
+            remote.get("https://misskey.localdomain/objects/1", status_code=410)
+            for _ in range(2):
+                with self.assertRaises(ASObject.DoesNotExist):
+                    ASObject.objects.get_or_fetch({"id": "https://misskey.localdomain/objects/1"})
+            self.assertEqual(remote.call_count, 1)
+
+    def test_001_unreachable_host(self):
+        "Test whether nothing is fetched from a host which just timed out."
+        with requests_mock.Mocker() as remote:
+            remote.get("https://misskey.localdomain/objects/1", exc=requests.ConnectTimeout)
+            remote.get("https://misskey.localdomain/objects/2", json={})
+            for url in ("https://misskey.localdomain/objects/1",
+                        "https://misskey.localdomain/objects/2"):
+                with self.assertRaises(fetcher_component.FetchFailedException):
+                    fetcher_component.get(url)
+            self.assertEqual(remote.call_count, 1)
+
+    def test_002_arrived_object_clears_failure(self):
+        "Test whether an object arriving through the inbox can be fetched again."
+        with requests_mock.Mocker() as remote:
+            remote.get("https://misskey.localdomain/objects/1", status_code=404)
+            with self.assertRaises(fetcher_component.FetchFailedException):
+                fetcher_component.get("https://misskey.localdomain/objects/1")
+            ASObject.objects.save_asobject({
+                "id": "https://misskey.localdomain/objects/1",
+                "type": "Note"})
+            remote.get("https://misskey.localdomain/objects/1", json={})
+            self.assertEqual(fetcher_component.get("https://misskey.localdomain/objects/1").json(), {})
+
+    def test_003_unreachable_host_kept_for_unverified_requests(self):
+        "Test whether looking up the key of an unknown Actor doesn't clear the host's mark."
+        account_component._public_keys.clear()
+        remote_user, actor_data = helpers.create_remote_user("ai", "misskey.localdomain")
+        Account.objects.filter(id=remote_user.id).delete()
+        fetcher_component.remember_failure("https://misskey.localdomain/objects/1")
+        with requests_mock.Mocker() as remote:
+            remote.get(remote_user.ap_id, text=json.dumps(actor_data))
+            with self.assertRaises(Account.DoesNotExist):
+                account_component.get_public_key(remote_user.ap_id + "#main-key")
+            with self.assertRaises(fetcher_component.HostUnreachableException):
+                fetcher_component.get(remote_user.ap_id)
+            self.assertEqual(remote.call_count, 0)
@@ -0,0 +1,63 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from rbq_backend.models import Account, ASActivity, ASObject, InteractionCount
+from rbq_cs.serializers.mastodon.status_serializer import StatusSerializer
+from tests import helpers
+
+MIME_AP = "application/activity+json"
+
+
+class InteractionTestCase(APITestCase):
+
+    def setUp(self):
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        self.user = Account.objects.get(username="chuukaku_may@rbq.localdomain")
+        self.remote_user, _actor_data = helpers.create_remote_user("ai", "misskey.localdomain")
+        self.aso = ASObject.objects.save_asobject({
+            "id": "https://rbq.localdomain/objects/1",
+            "type": "Note",
+            "attributedTo": self.user.ap_id})
+        self.status = ASActivity.objects.create(actor=self.user, data={
+            "id": "https://rbq.localdomain/activities/1",
+            "type": "Create",
+            "actor": self.user.ap_id,
+            "object": self.aso.ap_id})
+
+    def post(self, data):
+        # pragma pylint: disable=no-member
+        self.client.force_authenticate(user=self.remote_user)
+        response = self.client.post(
+            "/inbox", data=json.dumps(data), content_type=MIME_AP,
+            HTTP_HOST="rbq.localdomain", secure=True)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(response.status_code, 200)
+
+    def counts(self):
+        return StatusSerializer(self.status)._interaction_counts(self.status)
+
+    def test_000_like_announce_undo(self):
+        "Test whether Likes and Announces are counted, and their Undos uncounted."
+        like = {
+            "id": "https://misskey.localdomain/likes/1",
+            "type": "Like",
+            "actor": self.remote_user.ap_id,
+            "object": self.aso.ap_id}
+        announce = dict(like, id="https://misskey.localdomain/notes/2/activity", type="Announce")
+        self.post(like)
+        self.post(announce)
+        self.assertEqual(self.counts(), (1, 1))
+        self.post({
+            "id": "https://misskey.localdomain/likes/1/undo",
+            "type": "Undo",
+            "actor": self.remote_user.ap_id,
+            "object": like})
+        self.assertEqual(self.counts(), (0, 1))
+
+        InteractionCount.objects.update(favourites_count=5, reblogs_count=0)
+        call_command("rebuild_interaction_counts", batch_size=1, stdout=StringIO())
+        self.assertEqual(self.counts(), (0, 1))
+        self.assertEqual(
+            StatusSerializer(self.status, context={"interaction_counts": {}})._interaction_counts(
+                self.status), (0, 0))
@@ -0,0 +1,89 @@
+import json
+from rest_framework.test import APITestCase
+from rbq_backend.models import Account, ASActivity
+
+MIME_AP = "application/activity+json"
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+
+
+class OutboxTestCase(APITestCase):
+
+    def setUp(self):
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        self.user = Account.objects.get(username="chuukaku_may@rbq.localdomain")
+        for i in range(25):
+            ASActivity.objects.create(data={
+                "id": "https://rbq.localdomain/activities/%d" % i,
+                "type": "Create",
+                "actor": self.user.ap_id,
+                "object": "https://rbq.localdomain/objects/%d" % i,
+                "to": [PUBLIC],
+                "rbqInternal": {"status": "normal"}
+            }, actor=self.user)
+        ASActivity.objects.create(data={
+            "id": "https://rbq.localdomain/activities/direct",
+            "type": "Create",
+            "actor": self.user.ap_id,
+            "object": "https://rbq.localdomain/objects/direct",
+            "to": ["https://misskey.localdomain/users/ai"]
+        }, actor=self.user)
+
+    def get(self, url, **headers):
+        return self.client.get(
+            url.replace("https://rbq.localdomain", ""),
+            HTTP_ACCEPT=MIME_AP, HTTP_HOST="rbq.localdomain", secure=True, **headers)
+
+    def get_page(self, url):
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_000_outbox_pages(self):
+        "Test whether the outbox lists public activities, newest first."
+        response = self.get("/users/chuukaku_may/outbox")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["totalItems"], 25)
+        first = self.get_page(response.data["first"])
+        self.assertEqual(
+            [item["id"] for item in first["orderedItems"]],
+            ["https://rbq.localdomain/activities/%d" % i for i in range(24, 4, -1)])
+        self.assertNotIn("rbqInternal", first["orderedItems"][0])
+        second = self.get_page(first["next"])
+        self.assertEqual(len(second["orderedItems"]), 5)
+        self.assertNotIn("next", second)
+
+    def test_001_outbox_not_modified(self):
+        "Test whether unchanged outboxes and pages are answered with 304."
+        response = self.get("/users/chuukaku_may/outbox")
+        first = self.get("/users/chuukaku_may/outbox?page=true")
+        self.assertNotEqual(first["ETag"], response["ETag"])
+        self.assertIn("Last-Modified", first)
+        self.assertEqual(
+            self.get("/users/chuukaku_may/outbox", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(
+            self.get("/users/chuukaku_may/outbox?page=true",
+                     HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        ASActivity.objects.filter(ap_id="https://rbq.localdomain/activities/24").delete()
+        self.assertEqual(
+            self.get("/users/chuukaku_may/outbox", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+        self.assertEqual(
+            self.get("/users/chuukaku_may/outbox?page=true",
+                     HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+
+    def test_002_hidden_and_edited_activities(self):
+        "Test whether undone activities leave the outbox, and edits change its ETag."
+        response = self.get("/users/chuukaku_may/outbox")
+        asa = ASActivity.objects.get(ap_id="https://rbq.localdomain/activities/3")
+        asa.data["content"] = "edited"
+        asa.save()
+        edited = self.get("/users/chuukaku_may/outbox", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(edited.status_code, 200)
+        asa.data["rbqInternal"]["status"] = "canceled"
+        asa.save()
+        response = self.get("/users/chuukaku_may/outbox")
+        self.assertEqual(response.data["totalItems"], 24)
+        self.assertNotEqual(response["ETag"], edited["ETag"])
+        first = self.get_page(response.data["first"])
+        second = self.get_page(first["next"])
+        self.assertNotIn(asa.ap_id, [item["id"] for item in first["orderedItems"] + second["orderedItems"]])
@@ -0,0 +1,44 @@
+import json
+from datetime import timedelta
+import requests_mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rbq_ap.components import account_component
+from rbq_backend.models import Account
+from tests import helpers
+
+
+class RefreshTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        self.remote_user, self.actor_data = helpers.create_remote_user("ai", "misskey.localdomain")
+
+    def test_000_conditional_refresh(self):
+        "Test whether an unchanged Actor isn't downloaded again."
+        with requests_mock.Mocker() as remote:
+            remote.get(self.actor_data["id"], text=json.dumps(self.actor_data),
+                       headers={"ETag": '"v1"'})
+            account_component.fetch_and_update_user(self.actor_data["id"])
+            self.assertEqual(Account.objects.get(id=self.remote_user.id).etag, '"v1"')
+
+            remote.get(self.actor_data["id"], status_code=304)
+            self.assertIsNotNone(account_component.fetch_and_update_user(self.actor_data["id"]))
+            self.assertEqual(remote.last_request.headers["If-None-Match"], '"v1"')
+            self.assertEqual(Account.objects.get(id=self.remote_user.id).etag, '"v1"')
+
+    def test_001_refresh_stale_actors(self):
+        "Test whether only stale remote Actors are refreshed."
+        self.actor_data["name"] = "Ai"
+        Account.objects.filter(id=self.remote_user.id).update(
+            fetched_at=timezone.now() - timedelta(days=2))
+        with requests_mock.Mocker() as remote:
+            remote.get(self.actor_data["id"], text=json.dumps(self.actor_data))
+            self.assertEqual(account_component.refresh_stale_actors(), 1)
+            self.assertEqual(account_component.refresh_stale_actors(), 0)
+            self.assertEqual(remote.call_count, 1)
+        user = Account.objects.get(id=self.remote_user.id)
+        self.assertEqual(user.name, "Ai")
+        self.assertGreater(user.fetched_at, timezone.now() - timedelta(minutes=1))
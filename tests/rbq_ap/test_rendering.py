@@ -0,0 +1,50 @@
+import json
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from rbq_backend.models import Account, ASObject
+
+MIME_AP = "application/activity+json"
+
+
+class RenderingTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        self.user = Account.objects.get(username="chuukaku_may@rbq.localdomain")
+
+    def get(self, url, **headers):
+        return self.client.get(
+            url, HTTP_ACCEPT=MIME_AP, HTTP_HOST="rbq.localdomain", secure=True, **headers)
+
+    def test_000_object_etag(self):
+        "Test whether objects are served with validators, and changes show up."
+        ASObject.objects.save_asobject({
+            "id": "https://rbq.localdomain/objects/1",
+            "type": "Note",
+            "content": "first"})
+        response = self.get("/objects/1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], MIME_AP)
+        self.assertIn("Last-Modified", response)
+        self.assertEqual(self.get("/objects/1", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        ASObject.objects.save_asobject({
+            "id": "https://rbq.localdomain/objects/1",
+            "type": "Note",
+            "content": "edited"})
+        response = self.get("/objects/1", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["content"], "edited")
+
+    def test_001_actor_etag(self):
+        "Test whether Actors are served with validators, and changes show up."
+        response = self.get("/users/chuukaku_may")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.get("/users/chuukaku_may", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.user.name = "May"
+        self.user.save()
+        response = self.get("/users/chuukaku_may", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["name"], "May")
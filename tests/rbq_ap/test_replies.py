@@ -0,0 +1,109 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from rbq_backend.models import ASActivity, ASObject, InteractionCount
+from tests import helpers
+
+MIME_AP = "application/activity+json"
+ROOT = "https://rbq.localdomain/objects/1"
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+
+
+class RepliesTestCase(APITestCase):
+
+    def setUp(self):
+        self.remote_user, _data = helpers.create_remote_user("ai", "misskey.localdomain")
+        self.root = ASObject.objects.save_asobject({"id": ROOT, "type": "Note", "content": "root"})
+        for i in range(25):
+            self.reply(i, ROOT)
+
+    def reply(self, i, parent, to=(PUBLIC,)):
+        "Receive a reply and its Create from the remote user."
+        aso = ASObject.objects.save_asobject({
+            "id": "https://misskey.localdomain/notes/%d" % i,
+            "type": "Note",
+            "inReplyTo": parent,
+            "context": self.root.context,
+            "to": list(to)})
+        ASActivity.objects.create(actor=self.remote_user, data={
+            "id": aso.ap_id + "/activity",
+            "type": "Create",
+            "actor": self.remote_user.ap_id,
+            "object": aso.ap_id,
+            "to": list(to)})
+        return aso
+
+    def get(self, url):
+        response = self.client.get(
+            url.replace("https://rbq.localdomain", ""),
+            HTTP_ACCEPT=MIME_AP, HTTP_HOST="rbq.localdomain", secure=True)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_000_replies_collection(self):
+        "Test whether local objects link to their replies, paged oldest first."
+        note = self.get(ROOT)
+        collection = self.get(note["replies"])
+        self.assertEqual(collection["totalItems"], 25)
+        first = self.get(collection["first"])
+        self.assertEqual(first["orderedItems"],
+                         ["https://misskey.localdomain/notes/%d" % i for i in range(20)])
+        second = self.get(first["next"])
+        self.assertEqual(len(second["orderedItems"]), 5)
+        self.assertNotIn("next", second)
+
+    def test_001_replies_count(self):
+        "Test whether replies are counted as they arrive and leave, in any order."
+        self.assertEqual(self.root.replies_count, 25)
+        ASObject.objects.tombstone(ASObject.objects.get(ap_id="https://misskey.localdomain/notes/0"))
+        self.assertEqual(self.root.replies_count, 24)
+        self.reply(100, "https://rbq.localdomain/objects/2")
+        parent = ASObject.objects.save_asobject({
+            "id": "https://rbq.localdomain/objects/2",
+            "type": "Note",
+            "inReplyTo": ROOT,
+            "context": self.root.context})
+        self.assertEqual(parent.replies_count, 1)
+        self.assertEqual(self.root.replies_count, 25)
+
+    def test_002_direct_replies(self):
+        "Test whether direct replies, and replies without a known Create, are not listed."
+        self.reply(100, ROOT, to=["https://rbq.localdomain/users/chuukaku_may"])
+        ASObject.objects.save_asobject({
+            "id": "https://misskey.localdomain/notes/101",
+            "type": "Note",
+            "inReplyTo": ROOT,
+            "context": self.root.context})
+        self.assertEqual(self.root.replies_count, 27)
+        collection = self.get(ROOT + "/replies")
+        self.assertEqual(collection["totalItems"], 25)
+        second = self.get(self.get(collection["first"])["next"])
+        self.assertEqual(second["orderedItems"],
+                         ["https://misskey.localdomain/notes/%d" % i for i in range(20, 25)])
+
+    def test_003_listed_replies_count(self):
+        "Test whether public replies are counted once, whichever of the reply and its Create comes first."
+        self.assertEqual(self.root.listed_replies_count, 25)
+        ASActivity.objects.create(actor=self.remote_user, data={
+            "id": "https://misskey.localdomain/notes/100/activity",
+            "type": "Create",
+            "actor": self.remote_user.ap_id,
+            "object": "https://misskey.localdomain/notes/100",
+            "to": [PUBLIC]})
+        self.assertEqual(self.root.listed_replies_count, 25)
+        ASObject.objects.save_asobject({
+            "id": "https://misskey.localdomain/notes/100",
+            "type": "Note",
+            "inReplyTo": ROOT,
+            "context": self.root.context})
+        self.assertEqual(self.root.listed_replies_count, 26)
+        ASObject.objects.tombstone(ASObject.objects.get(ap_id="https://misskey.localdomain/notes/0"))
+        self.assertEqual(self.root.listed_replies_count, 25)
+        with self.assertNumQueries(2):
+            collection = self.get(ROOT + "/replies")
+        self.assertEqual(collection["totalItems"], 25)
+
+        InteractionCount.objects.update(listed_replies_count=0)
+        call_command("rebuild_interaction_counts", stdout=StringIO())
+        self.assertEqual(self.root.listed_replies_count, 25)
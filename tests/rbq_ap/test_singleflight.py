@@ -0,0 +1,79 @@
+import threading
+import time
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase
+from rbq_backend.components.singleflight_component import _advisory_key, single_flight
+
+
+class SingleFlightTestCase(TestCase):
+
+    def test_000_one_caller_at_a_time(self):
+        "Test whether callers for the same key run one after another."
+        running = []
+        overlaps = []
+
+        def work():
+            try:
+                with single_flight("account:https://misskey.localdomain/users/ai"):
+                    running.append(1)
+                    overlaps.append(len(running))
+                    time.sleep(0.01)
+                    running.pop()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [1] * 8)
+
+    def test_001_reentrant(self):
+        "Test whether a caller may take the same key again."
+        with single_flight("asobject:x"):
+            with single_flight("asobject:x"):
+                pass
+        with single_flight("asobject:x"):
+            pass
+
+    def test_002_inside_transaction(self):
+        "Test whether the lock is held until the transaction ends, even after errors."
+        key = "asobject:https://misskey.localdomain/notes/1"
+        results = []
+
+        def try_lock():
+            "Whether another connection may take the lock now."
+            def run():
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_try_advisory_lock(%s)", [_advisory_key(key)])
+                        results.append(cursor.fetchone()[0])
+                finally:
+                    connection.close()
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+
+        def work():
+            # Its own connection, so its transactions really commit.
+            try:
+                with transaction.atomic():
+                    with single_flight(key):
+                        try_lock()
+                try_lock()
+                try:
+                    with transaction.atomic():
+                        with single_flight(key):
+                            with connection.cursor() as cursor:
+                                cursor.execute("SELECT 1 / 0")
+                except DatabaseError:
+                    results.append("error")
+                try_lock()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [False, True, "error", True])
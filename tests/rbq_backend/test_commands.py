@@ -0,0 +1,53 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from rbq_backend.models import Account, ASObject
+from rbq_ap.components import account_component
+
+
+class CommandsTestCase(TestCase):
+
+    def test_000_backfill_ap_ids(self):
+        "Test whether rows saved before the ap_id column get it filled."
+        aso = ASObject.objects.create(data={
+            "id": "https://misskey.localdomain/objects/1",
+            "type": "Note"})
+        ASObject.objects.filter(pk=aso.pk).update(ap_id=None)
+        call_command("backfill_ap_ids", batch_size=1, stdout=StringIO())
+        aso.refresh_from_db()
+        self.assertEqual(aso.ap_id, "https://misskey.localdomain/objects/1")
+
+    def test_001_reconcile_counters(self):
+        "Test whether drifted counters are recounted."
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        user = Account.objects.get(username="chuukaku_may@rbq.localdomain")
+        remote_user = Account.objects.create(
+            username="ai@misskey.localdomain", ap_id="https://misskey.localdomain/users/ai")
+        account_component.local_follow_user(remote_user, user)
+        ASObject.objects.create(data={
+            "id": "https://rbq.localdomain/objects/1",
+            "type": "Note",
+            "attributedTo": user.ap_id})
+        Account.objects.update(followers_count=7, following_count=None, posts_count=None)
+        call_command("reconcile_counters", batch_size=1, stdout=StringIO())
+        user.refresh_from_db()
+        remote_user.refresh_from_db()
+        self.assertEqual((user.followers_count, user.following_count, user.posts_count), (1, 0, 1))
+        self.assertEqual(remote_user.following_count, 1)
+
+    def test_002_save_keeps_counters(self):
+        "Test whether saving an Account read earlier doesn't overwrite its counters."
+        remote_user = Account.objects.create(
+            username="ai@misskey.localdomain", ap_id="https://misskey.localdomain/users/ai")
+        stale = Account.objects.get(pk=remote_user.pk)
+        ASObject.objects.save_asobject({
+            "id": "https://misskey.localdomain/notes/1",
+            "type": "Note",
+            "actor": remote_user.ap_id})
+        stale.name = "Ai"
+        stale.save()
+        remote_user.refresh_from_db()
+        self.assertEqual((remote_user.name, remote_user.posts_count), ("Ai", 1))
+        call_command("reconcile_counters", stdout=StringIO())
+        remote_user.refresh_from_db()
+        self.assertEqual(remote_user.posts_count, 1)
@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase, override_settings
+from rbq_backend.components import json_component
+
+
+class JSONCodecTestCase(SimpleTestCase):
+
+    note = {
+        "id": "https://rbq.localdomain/objects/1",
+        "type": "Note",
+        "content": "Alerta, alerta antifascista! 🏴",
+        "to": ["https://www.w3.org/ns/activitystreams#Public"],
+    }
+
+    def test_000_codecs_agree(self):
+        "Test whether every codec reads what the others write."
+        for writer in json_component.CODECS:
+            for reader in json_component.CODECS:
+                with override_settings(RBQ_JSON_CODEC=writer):
+                    data = json_component.dumps(self.note)
+                with override_settings(RBQ_JSON_CODEC=reader):
+                    self.assertEqual(json_component.loads(data), self.note)
+
+    def test_001_fallback(self):
+        "Test whether unknown codecs and values fall back to the standard library."
+        with override_settings(RBQ_JSON_CODEC="simdjson"):
+            self.assertEqual(json_component.get_codec(), json_component.CODECS["json"])
+        self.assertEqual(json_component.loads(json_component.dumps({"n": 2 ** 70})), {"n": 2 ** 70})
+
+    def test_002_big_integers(self):
+        "Test whether every codec reads integers beyond 64 bits exactly."
+        big = {"n": 2 ** 70 + 1, "m": -2 ** 63 - 1, "id": "https://rbq.localdomain/objects/1"}
+        for codec in json_component.CODECS:
+            with override_settings(RBQ_JSON_CODEC=codec):
+                self.assertEqual(json_component.loads(json_component.dumps(big)), big)
+                self.assertEqual(json_component.loads('{"n": %d}' % (2 ** 70 + 1)), {"n": 2 ** 70 + 1})
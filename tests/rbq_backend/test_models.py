@@ -0,0 +1,56 @@
+from django.test import TestCase
+from rbq_backend.models import Account, ASActivity, ASObject
+
+
+class TypedColumnsTestCase(TestCase):
+
+    def test_000_asobject_columns(self):
+        "Test whether ASObject columns follow its data."
+        aso = ASObject.objects.create(data={
+            "id": "https://misskey.localdomain/notes/2",
+            "type": "Note",
+            "attributedTo": {"id": "https://misskey.localdomain/users/ai"},
+            "inReplyTo": "https://misskey.localdomain/notes/1",
+            "context": "https://misskey.localdomain/contexts/1",
+            "published": "2019-10-10T12:00:00Z"})
+        aso = ASObject.objects.get(
+            type="Note",
+            attributed_to="https://misskey.localdomain/users/ai",
+            in_reply_to="https://misskey.localdomain/notes/1",
+            context="https://misskey.localdomain/contexts/1",
+            published__year=2019)
+        aso.data = {"id": aso.ap_id, "type": "Tombstone", "published": "yesterday"}
+        aso.save(update_fields=["data"])
+        aso = ASObject.objects.get(ap_id="https://misskey.localdomain/notes/2")
+        self.assertEqual((aso.type, aso.in_reply_to, aso.published), ("Tombstone", None, None))
+
+    def test_001_asactivity_columns(self):
+        "Test whether ASActivity columns follow its data."
+        actor = Account.objects.create(
+            username="ai@misskey.localdomain", ap_id="https://misskey.localdomain/users/ai")
+        ASActivity.objects.create(actor=actor, data={
+            "id": "https://misskey.localdomain/likes/1",
+            "type": "Like",
+            "actor": actor.ap_id,
+            "object": {"id": "https://misskey.localdomain/notes/1"},
+            "rbqInternal": {"status": "normal"}})
+        self.assertEqual(ASActivity.objects.filter(
+            object="https://misskey.localdomain/notes/1", type="Like", status="normal").count(), 1)
+
+    def test_002_asactivity_visibility(self):
+        "Test whether ASActivity visibility is classified from its addressing."
+        actor = Account.objects.create(
+            username="ai@misskey.localdomain", ap_id="https://misskey.localdomain/users/ai",
+            followers_uri="https://misskey.localdomain/users/ai/followers")
+        addressing = {
+            "public": {"to": ["as:Public"], "cc": [actor.followers_uri]},
+            "unlisted": {"to": [actor.followers_uri],
+                         "cc": "https://www.w3.org/ns/activitystreams#Public"},
+            "private": {"to": [actor.followers_uri]},
+            "direct": {"to": ["https://rbq.localdomain/users/chuukaku_may"]},
+        }
+        for visibility, fields in addressing.items():
+            asa = ASActivity.objects.create(actor=actor, data=dict(
+                fields, id="https://misskey.localdomain/notes/%s/activity" % visibility,
+                type="Create", actor=actor.ap_id))
+            self.assertEqual((asa.visibility, asa.local), (visibility, False))
@@ -0,0 +1,62 @@
+import json
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import requests
+import requests_mock
+from rbq_backend.models import ASObject
+
+
+class ThreadTestCase(TestCase):
+    root_data = {
+        "id": "https://misskey.localdomain/objects/1",
+        "type": "Note",
+        "content": "Alerta, alerta antifascista!"
+    }
+
+    parent_data = {
+        "id": "https://misskey.localdomain/objects/2",
+        "type": "Note",
+        "inReplyTo": "https://misskey.localdomain/objects/1",
+        "content": "Alerta!"
+    }
+
+    reply_data = {
+        "id": "https://misskey.localdomain/objects/3",
+        "type": "Note",
+        "inReplyTo": "https://misskey.localdomain/objects/2",
+        "content": "Antifascista!"
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.root = ASObject.objects.save_asobject(dict(self.root_data))
+
+    def test_000_missing_ancestor_fetched(self):
+        "Test whether a reply joins the context of its closest known ancestor."
+        with requests_mock.Mocker() as remote:
+            remote.get(self.parent_data["id"], text=json.dumps(self.parent_data))
+            reply = ASObject.objects.save_asobject(dict(self.reply_data))
+        self.assertEqual(reply.data["context"], self.root.data["context"])
+        self.assertEqual(
+            ASObject.objects.get(ap_id=self.parent_data["id"]).data["context"],
+            self.root.data["context"])
+
+    @override_settings(RBQ_THREAD_RESOLVE_BUDGET=0)
+    def test_001_deferred_resolution(self):
+        "Test whether the thread is resolved in a task when out of time."
+        with requests_mock.Mocker() as remote:
+            remote.get(self.parent_data["id"], text=json.dumps(self.parent_data))
+            reply = ASObject.objects.save_asobject(dict(self.reply_data))
+        reply.refresh_from_db()
+        self.assertEqual(reply.data["context"], self.root.data["context"])
+        self.assertNotIn("threadPending", reply.data.get("rbqInternal", {}))
+        self.assertEqual(ASObject.objects.filter(data__type="Context").count(), 1)
+
+    def test_002_unreachable_ancestor(self):
+        "Test whether the walk is deferred while the host of an ancestor is unreachable."
+        with requests_mock.Mocker() as remote:
+            remote.get(self.parent_data["id"], exc=requests.ConnectTimeout)
+            for _ in range(2):
+                reply = ASObject.objects.maybe_create_or_find_context(dict(self.reply_data))
+                self.assertTrue(reply["rbqInternal"]["threadPending"])
+            self.assertEqual(remote.call_count, 1)
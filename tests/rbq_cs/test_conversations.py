@@ -0,0 +1,48 @@
+from rest_framework.test import APITestCase
+from rbq_ap.components import asactivity_component
+from rbq_backend.models import Account, ASActivity
+from tests import helpers
+
+
+class ConversationTestCase(APITestCase):
+
+    def setUp(self):
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        Account.objects.create_user(username="wakaba_shiro@rbq.localdomain")
+        self.user = Account.objects.get(username="chuukaku_may@rbq.localdomain")
+        self.other = Account.objects.get(username="wakaba_shiro@rbq.localdomain")
+        self.remote_user, _data = helpers.create_remote_user("ai", "misskey.localdomain")
+
+    def direct(self, actor, name, to):
+        ASActivity.objects.create(actor=actor, recipients=asactivity_component.get_recipients({
+            "actor": actor.ap_id, "to": to}), data={
+                "id": "%s/activities/%s" % (actor.ap_id, name),
+                "type": "Create",
+                "actor": actor.ap_id,
+                "object": "%s/notes/%s" % (actor.ap_id, name),
+                "to": to})
+
+    def conversations(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get("/api/v1/conversations", HTTP_HOST="rbq.localdomain")
+        self.assertEqual(response.status_code, 200)
+        return [sorted(account["acct"] for account in conversation["accounts"])
+                for conversation in response.data]
+
+    def test_000_conversations(self):
+        "Test whether direct messages sent and received are listed, and only them."
+        self.direct(self.user, "sent", [self.remote_user.ap_id])
+        self.direct(self.remote_user, "received", [self.user.ap_id, self.other.ap_id])
+        self.direct(self.remote_user, "public", ["https://www.w3.org/ns/activitystreams#Public"])
+        self.assertEqual(self.conversations(self.user), [
+            sorted([self.remote_user.username, self.other.username]),
+            [self.remote_user.username]])
+        self.assertEqual(self.conversations(self.other), [
+            sorted([self.remote_user.username, self.user.username])])
+
+    def test_001_conversations_deleted(self):
+        "Test whether deleted direct messages are not listed."
+        self.direct(self.user, "sent", [self.remote_user.ap_id])
+        self.direct(self.remote_user, "received", [self.user.ap_id])
+        ASActivity.objects.filter(ap_id="%s/activities/received" % self.remote_user.ap_id).update(status="deleted")
+        self.assertEqual(self.conversations(self.user), [[self.remote_user.username]])
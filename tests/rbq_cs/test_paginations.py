@@ -0,0 +1,39 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rbq_backend.models import Account
+from rbq_cs.paginations import MastodonPagination
+
+
+class MastodonPaginationTestCase(TestCase):
+
+    def setUp(self):
+        self.ids = [Account.objects.create(
+            username="user%d@misskey.localdomain" % i,
+            ap_id="https://misskey.localdomain/users/user%d" % i).id for i in range(5)]
+
+    def paginate(self, query: str):
+        paginator = MastodonPagination()
+        request = Request(APIRequestFactory().get("/api/v1/accounts?" + query))
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.paginate_queryset(Account.objects.all(), request)
+            link = paginator.get_paginated_response([]).get("link", "")
+        self.assertEqual(len(queries), 1)
+        return [account.id for account in page], link
+
+    def test_000_newest_first(self):
+        "Test whether pages go from newest to oldest with max_id."
+        ids, link = self.paginate("limit=2")
+        self.assertEqual(ids, self.ids[:-3:-1])
+        self.assertIn("max_id=%d" % self.ids[3], link)
+        self.assertIn("min_id=%d" % self.ids[4], link)
+        ids, link = self.paginate("limit=2&max_id=%d" % self.ids[1])
+        self.assertEqual(ids, [self.ids[0]])
+        self.assertNotIn('rel="next"', link)
+
+    def test_001_since_and_min_id(self):
+        "Test whether since_id gives the newest rows, and min_id the ones right after it."
+        self.assertEqual(self.paginate("limit=2&since_id=%d" % self.ids[0])[0], self.ids[:-3:-1])
+        self.assertEqual(self.paginate("limit=2&min_id=%d" % self.ids[0])[0], self.ids[2:0:-1])
@@ -0,0 +1,73 @@
+from io import StringIO
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from rbq_backend.components import asobject_component
+from rbq_backend.models import ASActivity, ASObject, ThreadNode
+from tests import helpers
+
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+
+
+class StatusContextTestCase(APITestCase):
+
+    def setUp(self):
+        self.remote_user, _data = helpers.create_remote_user("ai", "misskey.localdomain")
+        # 1 <- 2 <- 3, 1 <- 4, saved with 3 before its parent.
+        for name, parent in (("1", None), ("3", "2"), ("2", "1"), ("4", "1")):
+            self.post(name, parent)
+
+    def post(self, name, parent, to=(PUBLIC,)):
+        note = {
+            "id": "https://misskey.localdomain/notes/%s" % name,
+            "type": "Note",
+            "attributedTo": self.remote_user.ap_id,
+            "content": name,
+            "to": list(to)}
+        if parent is not None:
+            note["inReplyTo"] = "https://misskey.localdomain/notes/%s" % parent
+            note["context"] = ASObject.objects.get(
+                ap_id="https://misskey.localdomain/notes/1").context
+        asobject_component.save_asobject(note)
+        return ASActivity.objects.create(actor=self.remote_user, data={
+            "id": note["id"] + "/activity",
+            "type": "Create",
+            "actor": self.remote_user.ap_id,
+            "object": note["id"],
+            "to": list(to)})
+
+    def context(self, name):
+        asa = ASActivity.objects.get(ap_id="https://misskey.localdomain/notes/%s/activity" % name)
+        response = self.client.get("/api/v1/statuses/%d/context" % asa.id, HTTP_HOST="rbq.localdomain")
+        self.assertEqual(response.status_code, 200)
+        return ([status["content"] for status in response.data["ancestors"]],
+                [status["content"] for status in response.data["descendants"]])
+
+    def nodes(self):
+        return [(node.asobject.data["content"], node.depth) for node in
+                ThreadNode.objects.select_related('asobject').order_by('path')]
+
+    def test_000_thread_index(self):
+        "Test whether replies saved before their parents are moved under them."
+        self.assertEqual(self.nodes(), [("1", 0), ("2", 1), ("3", 2), ("4", 1)])
+        ThreadNode.objects.all().delete()
+        call_command("rebuild_thread_index", batch_size=1, stdout=StringIO())
+        self.assertEqual(self.nodes(), [("1", 0), ("2", 1), ("3", 2), ("4", 1)])
+
+    def test_001_context(self):
+        "Test whether a status comes with its ancestors and descendants, depth first."
+        self.assertEqual(self.context("1"), ([], ["2", "3", "4"]))
+        self.assertEqual(self.context("2"), (["1"], ["3"]))
+        self.assertEqual(self.context("3"), (["1", "2"], []))
+
+    def test_002_context_visibility(self):
+        "Test whether direct replies are hidden from others."
+        self.post("5", "2", to=["https://rbq.localdomain/users/chuukaku_may"])
+        self.assertEqual(self.context("2"), (["1"], ["3"]))
+
+    def test_003_context_deleted(self):
+        "Test whether deleted statuses are neither shown nor listed in contexts."
+        ASActivity.objects.filter(ap_id="https://misskey.localdomain/notes/3/activity").update(status="deleted")
+        self.assertEqual(self.context("1"), ([], ["2", "4"]))
+        asa = ASActivity.objects.get(ap_id="https://misskey.localdomain/notes/3/activity")
+        response = self.client.get("/api/v1/statuses/%d" % asa.id, HTTP_HOST="rbq.localdomain")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,165 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rbq_ap.components import account_component, asactivity_component, feed_component
+from rbq_backend.models import Account, ASActivity, ASObject, FeedItem
+from tests import helpers
+
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+
+
+class HomeTimelineTestCase(APITestCase):
+
+    def setUp(self):
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        Account.objects.create_user(username="wakaba_shiro@rbq.localdomain")
+        self.user = Account.objects.get(username="chuukaku_may@rbq.localdomain")
+        self.other = Account.objects.get(username="wakaba_shiro@rbq.localdomain")
+        self.remote_user, _data = helpers.create_remote_user("ai", "misskey.localdomain")
+        self.saver = asactivity_component.SaveASActivityMixin()
+        self.create("before", [PUBLIC])
+
+    def create(self, name, to, in_reply_to=None):
+        "Receive a Create from the remote user."
+        note = {
+            "id": "https://misskey.localdomain/notes/%s" % name,
+            "type": "Note",
+            "attributedTo": self.remote_user.ap_id,
+            "content": name,
+            "to": to}
+        if in_reply_to is not None:
+            note["inReplyTo"] = in_reply_to.object
+        ASObject.objects.create(data=note)
+        self.saver.save({
+            "id": note["id"] + "/activity",
+            "type": "Create",
+            "actor": self.remote_user.ap_id,
+            "object": note["id"],
+            "to": to}, self.remote_user)
+        return ASActivity.objects.get(ap_id=note["id"] + "/activity")
+
+    def home(self, query=""):
+        self.client.force_authenticate(self.user)
+        response = self.client.get("/api/v1/timelines/home" + query, HTTP_HOST="rbq.localdomain")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_000_fan_out_and_backfill(self):
+        "Test whether followed activities fill home timelines, old ones included."
+        account_component.local_follow_user(self.user, self.remote_user)
+        public = self.create("public", [PUBLIC])
+        followers = self.create("followers", [self.remote_user.followers_uri])
+        direct = self.create("direct", [self.user.ap_id])
+        self.create("others", [self.other.ap_id])
+        response = self.home()
+        self.assertEqual(
+            [status["uri"] for status in response.data],
+            ["https://misskey.localdomain/notes/%s" % name
+             for name in ("direct", "followers", "public", "before")])
+        self.assertEqual(response.data[0]["content"], "direct")
+        self.assertEqual(response.data[0]["account"]["acct"], self.remote_user.username)
+        self.assertFalse(FeedItem.objects.filter(account=self.other).exists())
+
+        response = self.home("?limit=2&max_id=%d" % direct.id)
+        self.assertEqual([int(status["id"]) for status in response.data], [followers.id, public.id])
+        self.assertIn("max_id=%d" % public.id, response["link"])
+
+    def test_001_unfollow_purge(self):
+        "Test whether unfollowing removes activities from the home timeline."
+        account_component.local_follow_user(self.user, self.remote_user)
+        self.assertEqual(len(self.home().data), 1)
+        account_component.local_unfollow_user(self.user, self.remote_user)
+        self.assertEqual(self.home().data, [])
+
+    def test_002_own_activities_and_trim(self):
+        "Test whether local authors see their own activities, and long timelines are trimmed."
+        for i in range(3):
+            asactivity_component.send_activity({
+                "id": "https://rbq.localdomain/activities/%d" % i,
+                "type": "Create",
+                "actor": self.user.ap_id,
+                "object": "https://rbq.localdomain/objects/%d" % i,
+                "to": [PUBLIC]}, recipients=[PUBLIC])
+        self.assertEqual(FeedItem.objects.filter(account=self.user).count(), 3)
+        with override_settings(RBQ_HOME_FEED_LENGTH=2):
+            self.assertEqual(feed_component.trim_feeds(), 1)
+        self.assertEqual(
+            [status["id"] for status in self.home().data],
+            [str(ASActivity.objects.get(ap_id="https://rbq.localdomain/activities/%d" % i).id)
+             for i in (2, 1)])
+
+    def test_003_replies_queries(self):
+        "Test whether a page of replies is read in the same number of queries as a shorter one."
+        account_component.local_follow_user(self.user, self.remote_user)
+        parent = ASActivity.objects.get(ap_id="https://misskey.localdomain/notes/before/activity")
+        for i in range(2):
+            self.create("reply%d" % i, [PUBLIC], in_reply_to=parent)
+        with CaptureQueriesContext(connection) as short_page:
+            response = self.home()
+        self.assertEqual(response.data[0]["in_reply_to_id"], str(parent.id))
+        self.assertEqual(response.data[0]["in_reply_to_account_id"], str(self.remote_user.id))
+        self.assertIsNone(response.data[-1]["in_reply_to_id"])
+        for i in range(2, 6):
+            self.create("reply%d" % i, [PUBLIC], in_reply_to=parent)
+        with CaptureQueriesContext(connection) as long_page:
+            response = self.home()
+        self.assertEqual(len(response.data), 7)
+        self.assertEqual(len(long_page), len(short_page))
+
+    def test_004_announces_left_out(self):
+        "Test whether Announces stay out of home timelines, as they can't be rendered as reblogs yet."
+        account_component.local_follow_user(self.user, self.remote_user)
+        self.saver.save({
+            "id": "https://misskey.localdomain/notes/before/announce",
+            "type": "Announce",
+            "actor": self.remote_user.ap_id,
+            "object": "https://misskey.localdomain/notes/before",
+            "to": [PUBLIC]}, self.remote_user)
+        self.assertEqual([status["uri"] for status in self.home().data],
+                         ["https://misskey.localdomain/notes/before"])
+
+    def test_005_authentication(self):
+        "Test whether the home timeline needs a logged in user."
+        response = self.client.get("/api/v1/timelines/home", HTTP_HOST="rbq.localdomain")
+        self.assertEqual(response.status_code, 401)
+
+
+class PublicTimelineTestCase(APITestCase):
+
+    def setUp(self):
+        Account.objects.create_user(username="chuukaku_may@rbq.localdomain")
+        self.user = Account.objects.get(username="chuukaku_may@rbq.localdomain")
+        self.remote_user, _data = helpers.create_remote_user("ai", "misskey.localdomain")
+        for actor, to in ((self.user, [PUBLIC]), (self.remote_user, [PUBLIC]),
+                          (self.remote_user, [self.remote_user.followers_uri])):
+            ASActivity.objects.create(actor=actor, data={
+                "id": "%s/activities/%d" % (actor.ap_id, ASActivity.objects.count()),
+                "type": "Create",
+                "actor": actor.ap_id,
+                "object": "%s/notes/%d" % (actor.ap_id, ASActivity.objects.count()),
+                "to": to})
+
+    def get(self, query=""):
+        response = self.client.get("/api/v1/timelines/public" + query, HTTP_HOST="rbq.localdomain")
+        self.assertEqual(response.status_code, 200)
+        return [(status["account"]["acct"], status["visibility"]) for status in response.data]
+
+    def test_000_public_timeline(self):
+        "Test whether public timelines list public statuses, optionally only the local ones."
+        self.assertEqual(self.get(), [
+            (self.remote_user.username, "public"), (self.user.username, "public")])
+        self.assertEqual(self.get("?local=true"), [(self.user.username, "public")])
+
+    def test_001_hidden_statuses(self):
+        "Test whether canceled Creates and Creates of deleted objects are left out."
+        for status in ("canceled", "deleted"):
+            ASActivity.objects.create(actor=self.remote_user, data={
+                "id": "%s/activities/%s" % (self.remote_user.ap_id, status),
+                "type": "Create",
+                "actor": self.remote_user.ap_id,
+                "object": "%s/notes/%s" % (self.remote_user.ap_id, status),
+                "to": [PUBLIC],
+                "rbqInternal": {"status": status}})
+        self.assertEqual(self.get(), [
+            (self.remote_user.username, "public"), (self.user.username, "public")])